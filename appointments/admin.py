@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment
+from .models import Appointment, AppointmentReminder, NotificationOutbox
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
@@ -24,4 +24,22 @@ class AppointmentAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         })
-    ) 
\ No newline at end of file
+    ) 
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'kind', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel', 'kind')
+    search_fields = ('recipient',)
+    readonly_fields = ('appointment', 'payload', 'attempts', 'last_error', 'sent_at', 'created_at', 'updated_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(AppointmentReminder)
+class AppointmentReminderAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'recipient_type', 'recipient', 'offset_minutes', 'due_at', 'status', 'sent_at')
+    list_filter = ('status', 'channel', 'recipient_type', 'offset_minutes')
+    search_fields = ('recipient',)
+    readonly_fields = ('appointment', 'payload', 'slot_time', 'claimed_at', 'last_error', 'sent_at', 'created_at')
+    ordering = ('-due_at',)
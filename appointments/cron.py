@@ -1,10 +1,11 @@
 from django_cron import CronJobBase, Schedule
 from django.utils import timezone
-from django.db import transaction
 from datetime import timedelta
 import logging
 
-from .models import Appointment
+from .notifications import dispatch_pending
+from .reminders import dispatch_due_reminders, schedule_upcoming
+from .services import AutoCompletionService
 
 logger = logging.getLogger(__name__)
 
@@ -25,39 +26,52 @@ class AutoCompleteAppointmentsCronJob(CronJobBase):
         try:
             # Get the cutoff time (24 hours ago)
             cutoff_time = timezone.now() - timedelta(hours=24)
-            
-            # Find all appointments that are:
-            # - Still in SCHEDULED state
-            # - Scheduled more than 24 hours ago
-            overdue_appointments = Appointment.objects.filter(
-                status='SCHEDULED',
-                slot_time__lt=cutoff_time
+
+            # Complete overdue appointments chunk by chunk with set-based updates
+            totals = AutoCompletionService.run(cutoff_time, chunk_size=1000)
+
+            logger.info(
+                f"Auto-completion job finished. Processed {totals['selected']} appointments, "
+                f"completed {totals['completed']} in {totals['chunks']} chunks ({totals['seconds']:.2f}s)."
             )
-            
-            # Process appointments in batches to avoid memory issues
-            batch_size = 100
-            total_processed = 0
-            total_completed = 0
-            
-            with transaction.atomic():
-                for appointment in overdue_appointments.iterator(chunk_size=batch_size):
-                    try:
-                        # Update appointment status and add completion time
-                        appointment.status = 'COMPLETED'
-                        appointment.completion_time = appointment.slot_time + timedelta(hours=1)
-                        appointment.notes = f"{appointment.completion_notes or ''}\nAutomatically marked as complete by system on {timezone.now().strftime('%Y-%m-%d %H:%M:%S')} UTC"
-                        appointment.save()
-                        total_completed += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing appointment {appointment.id}: {str(e)}")
-                    
-                    total_processed += 1
-            
-            logger.info(f"Auto-completion job finished. Processed {total_processed} appointments, completed {total_completed}.")
-            return f"Successfully processed {total_processed} appointments, completed {total_completed}."
+            return f"Successfully processed {totals['selected']} appointments, completed {totals['completed']}."
             
         except Exception as e:
             error_msg = f"Error in auto-completion cron job: {str(e)}"
             logger.error(error_msg)
-            raise Exception(error_msg) 
\ No newline at end of file
+            raise Exception(error_msg)
+
+
+class DispatchNotificationsCronJob(CronJobBase):
+    """
+    Cron job that drains the appointment notification outbox.
+    Failed deliveries stay queued with a backoff and are picked up by a later run.
+    """
+
+    # Run every minute
+    schedule = Schedule(run_every_mins=1)
+
+    code = 'appointments.dispatch_notifications'  # Unique code
+
+    def do(self):
+        """Execute the cron job."""
+        sent, failed = dispatch_pending()
+        return f"Sent {sent} notifications, {failed} failed."
+
+
+class SendAppointmentRemindersCronJob(CronJobBase):
+    """
+    Cron job that sends due appointment reminders in minute buckets.
+    After downtime the first run works through every missed bucket.
+    """
+
+    # Run every minute
+    schedule = Schedule(run_every_mins=1)
+
+    code = 'appointments.send_appointment_reminders'  # Unique code
+
+    def do(self):
+        """Execute the cron job."""
+        scheduled = schedule_upcoming()
+        sent, failed, cancelled = dispatch_due_reminders()
+        return f"Scheduled {scheduled} reminders. Sent {sent}, failed {failed}, cancelled {cancelled}."
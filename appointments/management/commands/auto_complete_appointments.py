@@ -1,8 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db import transaction
-from appointments.models import Appointment
-from django.conf import settings
+from appointments.services import AutoCompletionService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,8 +18,8 @@ class Command(BaseCommand):
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=100,
-            help='Number of appointments to process in each batch (default: 100)'
+            default=1000,
+            help='Number of appointments to update in each chunk (default: 1000)'
         )
         parser.add_argument(
             '--dry-run',
@@ -36,83 +34,37 @@ class Command(BaseCommand):
         
         # Calculate the cutoff time
         cutoff_time = timezone.now() - timezone.timedelta(hours=hours)
-        
-        # Find appointments that are past their scheduled time and still in SCHEDULED state
-        overdue_appointments = Appointment.objects.filter(
-            status='SCHEDULED',
-            slot_time__lt=cutoff_time
-        ).select_related('doctor')  # Optimize by pre-fetching doctor data
-        
-        total_count = overdue_appointments.count()
-        
-        if dry_run:
-            self.stdout.write(f"Found {total_count} overdue appointments that would be auto-completed")
-            for appointment in overdue_appointments:
+
+        def report_chunk(chunk, selected, completed, seconds):
+            if dry_run:
+                self.stdout.write(f"Chunk {chunk}: would auto-complete {selected} appointments")
+            else:
                 self.stdout.write(
-                    f"Would auto-complete appointment {appointment.id} "
-                    f"for doctor {appointment.doctor.email} "
-                    f"scheduled for {appointment.slot_time}"
+                    f"Chunk {chunk}: completed {completed}/{selected} appointments in {seconds * 1000:.1f}ms"
                 )
-            return
 
-        completed_count = 0
-        error_count = 0
-        processed_count = 0
+        # Walk overdue appointments with keyset pagination and complete each
+        # chunk with a single UPDATE
+        totals = AutoCompletionService.run(
+            cutoff_time,
+            chunk_size=batch_size,
+            dry_run=dry_run,
+            on_chunk=report_chunk
+        )
 
-        # Process appointments in batches to avoid memory issues
-        while processed_count < total_count:
-            batch = overdue_appointments[processed_count:processed_count + batch_size]
-            
-            for appointment in batch:
-                try:
-                    with transaction.atomic():
-                        # Calculate a reasonable completion time (30 minutes after scheduled time)
-                        completion_time = min(
-                            appointment.slot_time + timezone.timedelta(minutes=30),
-                            timezone.now()
-                        )
-                        
-                        # Update the appointment
-                        appointment.status = 'COMPLETED'
-                        appointment.completion_time = completion_time
-                        appointment.completion_notes = (
-                            "This appointment was automatically marked as completed by the system.\n"
-                            f"Original scheduled time: {appointment.slot_time}\n"
-                            f"Auto-completed on: {timezone.now()}\n"
-                            "Reason: No manual completion after scheduled time (24+ hours overdue)."
-                        )
-                        appointment.duration_minutes = 30  # Default duration
-                        appointment.save()
-                        
-                        logger.info(
-                            f"Auto-completed appointment {appointment.id} "
-                            f"for doctor {appointment.doctor.email} "
-                            f"scheduled at {appointment.slot_time}"
-                        )
-                        completed_count += 1
-                        
-                except Exception as e:
-                    error_message = (
-                        f"Failed to auto-complete appointment {appointment.id}: {str(e)}\n"
-                        f"Doctor: {appointment.doctor.email}\n"
-                        f"Scheduled time: {appointment.slot_time}"
-                    )
-                    logger.error(error_message)
-                    error_count += 1
-            
-            processed_count += len(batch)
-            # Print progress
-            self.stdout.write(
-                f"Processed {processed_count}/{total_count} appointments. "
-                f"Completed: {completed_count}, Errors: {error_count}"
-            )
+        if dry_run:
+            self.stdout.write(f"Found {totals['selected']} overdue appointments that would be auto-completed")
+            return
+
+        rate = totals['completed'] / totals['seconds'] if totals['seconds'] else 0
 
         # Print final summary
         self.stdout.write(
             self.style.SUCCESS(
                 f"Auto-completion finished.\n"
-                f"Total appointments processed: {total_count}\n"
-                f"Successfully completed: {completed_count}\n"
-                f"Errors encountered: {error_count}"
+                f"Total appointments processed: {totals['selected']}\n"
+                f"Successfully completed: {totals['completed']}\n"
+                f"Skipped (completed concurrently): {totals['selected'] - totals['completed']}\n"
+                f"Chunks: {totals['chunks']}, time in updates: {totals['seconds']:.2f}s ({rate:.0f} rows/s)"
             )
-        ) 
\ No newline at end of file
+        )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appointments.notifications import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued appointment email and SMS notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of notifications to claim per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting once it is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep between polls in --loop mode (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            sent, failed = dispatch_pending(batch_size=batch_size)
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} notifications, {failed} failed")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS("Notification dispatch finished."))
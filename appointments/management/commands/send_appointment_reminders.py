@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appointments.models import Appointment
+from appointments.reminders import dispatch_due_reminders, schedule_reminders, schedule_upcoming
+
+
+class Command(BaseCommand):
+    help = 'Schedules and sends due appointment reminders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Schedule reminders for every upcoming scheduled appointment first'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of appointments to schedule per chunk in --backfill mode (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            now = timezone.now()
+            upcoming = (
+                Appointment.objects.filter(status='SCHEDULED', slot_time__gt=now)
+                .select_related('doctor')
+                .order_by('slot_time', 'id')
+            )
+            chunk = []
+            queued = 0
+            for appointment in upcoming.iterator(chunk_size=options['batch_size']):
+                chunk.append(appointment)
+                if len(chunk) == options['batch_size']:
+                    queued += schedule_reminders(chunk, now=now)
+                    chunk = []
+            queued += schedule_reminders(chunk, now=now)
+            self.stdout.write(f"Queued {queued} reminders")
+        else:
+            schedule_upcoming()
+
+        sent, failed, cancelled = dispatch_due_reminders()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reminder dispatch finished. Sent {sent}, failed {failed}, cancelled {cancelled}."
+        ))
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:07
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def cancel_double_bookings(apps, schema_editor):
+    """
+    Slots booked twice before the constraint existed would make it fail.
+    The first booking of each slot is kept; the later ones are cancelled with
+    a note so they can be followed up.
+    """
+    Appointment = apps.get_model('appointments', 'Appointment')
+    scheduled = Appointment.objects.filter(status='SCHEDULED')
+    slots = (
+        scheduled.values('doctor_id', 'slot_time')
+        .annotate(bookings=Count('id'))
+        .filter(bookings__gt=1)
+        .order_by()
+    )
+    for slot in slots:
+        duplicates = scheduled.filter(
+            doctor_id=slot['doctor_id'], slot_time=slot['slot_time']
+        ).order_by('created_at', 'id').values_list('id', flat=True)[1:]
+        Appointment.objects.filter(id__in=list(duplicates)).update(
+            status='CANCELLED',
+            completion_notes='Cancelled automatically: the slot was booked twice'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_appointment_completion_notes_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'SCHEDULED')), fields=('doctor', 'slot_time'), name='unique_scheduled_doctor_slot'),
+        ),
+    ]
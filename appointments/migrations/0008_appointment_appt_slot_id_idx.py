@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_appointmentreminder'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['slot_time', 'id'], name='appt_slot_id_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinLengthValidator
+from django.utils import timezone
 from doctors.models import Doctor
 from specialties.models import Specialty
 
@@ -39,6 +40,135 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ['-slot_time']
+        constraints = [
+            # Backstop for AppointmentBookingService: a doctor can never hold
+            # two scheduled appointments starting at the same time
+            models.UniqueConstraint(
+                fields=['doctor', 'slot_time'],
+                condition=models.Q(status='SCHEDULED'),
+                name='unique_scheduled_doctor_slot'
+            ),
+        ]
+        # The unique constraint above doubles as the partial (doctor, slot_time)
+        # index used by booking conflict checks
+        indexes = [
+            # Auto-completion: SCHEDULED rows older than a cutoff, walked by (slot_time, id)
+            models.Index(
+                fields=['slot_time', 'id'],
+                condition=models.Q(status='SCHEDULED'),
+                name='appt_scheduled_slot_idx'
+            ),
+            # Keyset pagination of the full appointment list
+            models.Index(fields=['slot_time', 'id'], name='appt_slot_id_idx'),
+            # Doctor appointment lists, newest first
+            models.Index(fields=['doctor', '-slot_time'], name='appt_doctor_slot_idx'),
+            # Doctor appointment lists filtered by status
+            models.Index(fields=['doctor', 'status', '-slot_time'], name='appt_doctor_status_slot_idx'),
+        ]
 
     def __str__(self):
-        return f"Appointment with Dr. {self.doctor.name} at {self.slot_time}" 
\ No newline at end of file
+        return f"Appointment with Dr. {self.doctor.name} at {self.slot_time}" 
+
+
+class NotificationOutbox(models.Model):
+    """
+    Transactional outbox for appointment notifications.
+
+    Rows are written in the same transaction as the appointment they belong
+    to and delivered later by appointments.notifications.dispatch_pending,
+    so no request waits on SendGrid or the SMS gateway.
+    """
+    CHANNEL_CHOICES = [
+        ('EMAIL', 'Email'),
+        ('SMS', 'SMS')
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed')
+    ]
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    kind = models.CharField(max_length=50)
+    recipient = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.kind} to {self.recipient} ({self.status})"
+
+
+class AppointmentReminder(models.Model):
+    """
+    One reminder for one participant of an appointment.
+
+    Rows are created when the appointment is booked, one per configured
+    offset, participant and channel, and sent by
+    appointments.reminders.dispatch_due_reminders in minute buckets.
+    """
+    RECIPIENT_CHOICES = [
+        ('DOCTOR', 'Doctor'),
+        ('PATIENT', 'Patient')
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+        ('CANCELLED', 'Cancelled')
+    ]
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    offset_minutes = models.PositiveIntegerField()
+    recipient_type = models.CharField(max_length=10, choices=RECIPIENT_CHOICES)
+    channel = models.CharField(max_length=10, choices=NotificationOutbox.CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255)
+    # Recipient name and name_arabic for the message
+    payload = models.JSONField(default=dict)
+    # Appointment time the reminder was scheduled for; a rescheduled
+    # appointment gets new reminders and the old ones are cancelled
+    slot_time = models.DateTimeField()
+    # Start of the minute bucket the reminder is sent in
+    due_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['due_at']
+        constraints = [
+            # Scheduling the same appointment twice never queues a reminder twice
+            models.UniqueConstraint(
+                fields=['appointment', 'slot_time', 'offset_minutes', 'recipient_type', 'channel'],
+                name='unique_appointment_reminder'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'due_at'], name='reminder_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} reminder to {self.recipient} at {self.due_at} ({self.status})"
@@ -0,0 +1,191 @@
+"""
+Appointment notification outbox.
+
+Bookings call the queue_* helpers inside their transaction; the rows are
+delivered by dispatch_pending, which runs from the dispatch_notifications
+management command and DispatchNotificationsCronJob. Failed deliveries are
+retried with exponential backoff until MAX_ATTEMPTS is reached.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+
+# A claimed row is hidden from other workers for this long; if the worker
+# dies mid-send the row becomes due again once the lease expires. A worker
+# still sending its batch extends the lease on the rows it has not sent yet.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def queue_appointment_created(appointment):
+    """Queue the new-appointment email and SMS for the appointment's doctor"""
+    doctor = appointment.doctor
+    slot_time = appointment.slot_time.strftime("%Y-%m-%d %H:%M")
+    duration = appointment.duration
+
+    sms_content = f"""ALAQA: New appointment scheduled for {slot_time}. Duration: {duration}min.
+موعد جديد في {slot_time}. المدة: {duration} دقيقة"""
+
+    return NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(
+            appointment=appointment,
+            channel='EMAIL',
+            kind='appointment_created',
+            recipient=doctor.email,
+            payload={
+                'doctor_name': doctor.name,
+                'doctor_name_arabic': doctor.name_arabic,
+                'slot_time': slot_time,
+                'duration': duration,
+                'phone_number': appointment.phone_number,
+                'language': appointment.language
+            }
+        ),
+        NotificationOutbox(
+            appointment=appointment,
+            channel='SMS',
+            kind='appointment_created',
+            recipient=doctor.phone,
+            payload={'message': sms_content}
+        ),
+    ])
+
+
+def _send_email(notification, email_service):
+    if notification.kind == 'appointment_created':
+        result = email_service.send_appointment_notification(
+            to_email=notification.recipient,
+            **notification.payload
+        )
+    else:
+        result = email_service.send_email(
+            notification.recipient,
+            notification.payload['subject'],
+            notification.payload['html_content']
+        )
+    return result['success'], result['message']
+
+
+def _send_sms(notification):
+    from otp.services import OTPService
+
+    return OTPService.send_sms(notification.recipient, notification.payload['message'])
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with equal jitter: between half the ceiling and the ceiling"""
+    ceiling = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def claim_batch(batch_size, now=None):
+    """
+    Lease up to batch_size due notifications to this worker.
+    Rows locked by a concurrent worker are skipped rather than waited on.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        notifications = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if notifications:
+            NotificationOutbox.objects.filter(
+                id__in=[notification.id for notification in notifications]
+            ).update(next_attempt_at=now + CLAIM_LEASE)
+    return notifications
+
+
+def extend_lease(notifications, now=None):
+    """Keep notifications this worker has claimed but not sent yet hidden for another CLAIM_LEASE"""
+    now = now or timezone.now()
+    NotificationOutbox.objects.filter(
+        id__in=[notification.id for notification in notifications],
+        status='PENDING'
+    ).update(next_attempt_at=now + CLAIM_LEASE)
+    return now + CLAIM_LEASE
+
+
+def deliver(notification, email_service=None):
+    """Send one notification and record the outcome"""
+    try:
+        if notification.channel == 'EMAIL':
+            if email_service is None:
+                from services.email_service import EmailService
+                email_service = EmailService()
+            success, message = _send_email(notification, email_service)
+        else:
+            success, message = _send_sms(notification)
+    except Exception as e:
+        success, message = False, str(e)
+
+    notification.attempts += 1
+    if success:
+        notification.status = 'SENT'
+        notification.sent_at = timezone.now()
+        notification.last_error = None
+    elif notification.attempts >= MAX_ATTEMPTS:
+        notification.status = 'FAILED'
+        notification.last_error = message
+        logger.error(
+            f"Giving up on {notification.channel} notification {notification.id} "
+            f"to {notification.recipient} after {notification.attempts} attempts: {message}"
+        )
+    else:
+        notification.next_attempt_at = timezone.now() + backoff_delay(notification.attempts)
+        notification.last_error = message
+        logger.warning(
+            f"{notification.channel} notification {notification.id} failed "
+            f"(attempt {notification.attempts}), retrying at {notification.next_attempt_at}: {message}"
+        )
+
+    notification.save(update_fields=[
+        'attempts', 'status', 'sent_at', 'last_error', 'next_attempt_at', 'updated_at'
+    ])
+    return success
+
+
+def dispatch_pending(batch_size=100, max_batches=None):
+    """
+    Drain due notifications batch by batch.
+    Returns a (sent, failed) tuple for this run.
+    """
+    sent = failed = batches = 0
+    email_service = None
+
+    while max_batches is None or batches < max_batches:
+        claimed_at = timezone.now()
+        notifications = claim_batch(batch_size, claimed_at)
+        if not notifications:
+            break
+        batches += 1
+        lease_expires = claimed_at + CLAIM_LEASE
+
+        for index, notification in enumerate(notifications):
+            # A slow provider must not let the lease run out mid-batch, or
+            # another worker would send the rest again
+            now = timezone.now()
+            if now >= lease_expires - CLAIM_LEASE / 2:
+                lease_expires = extend_lease(notifications[index:], now)
+            if notification.channel == 'EMAIL' and email_service is None:
+                from services.email_service import EmailService
+                email_service = EmailService()
+            if deliver(notification, email_service):
+                sent += 1
+            else:
+                failed += 1
+
+    if sent or failed:
+        logger.info(f"Notification dispatch finished. Sent {sent}, failed {failed}.")
+    return sent, failed
@@ -0,0 +1,295 @@
+"""
+Appointment reminders.
+
+Booking an appointment schedules one AppointmentReminder per configured
+offset (APPOINTMENT_REMINDER_OFFSETS, minutes before slot_time), participant
+and channel. Each reminder is due in the minute bucket its offset falls in;
+every minute SendAppointmentRemindersCronJob claims all due buckets and sends
+each bucket with one bulk email send and one bulk SMS send per offset.
+
+A claimed reminder is never sent twice: rows are moved to SENDING before the
+send, and rows still in SENDING after REMINDER_CLAIM_LEASE (the worker died
+mid-send) are marked FAILED instead of being retried. After downtime the
+backlog of due buckets is sent on the next run, except reminders whose
+appointment has started, been cancelled or been rescheduled in the meantime,
+and reminders whose lead time has passed because a reminder with a smaller
+offset is already due; those would announce the wrong lead time.
+"""
+import logging
+import uuid
+from datetime import timedelta
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Appointment, AppointmentReminder
+
+logger = logging.getLogger(__name__)
+
+# A worker that claimed reminders and has not finished after this long is
+# assumed dead; its reminders are failed rather than risk a duplicate
+REMINDER_CLAIM_LEASE = timedelta(minutes=10)
+# How far ahead each scheduling sweep looks for appointments without reminders
+SCHEDULE_LOOKAHEAD = timedelta(minutes=10)
+
+EMAIL_SUBJECT = "Appointment Reminder - علاقة: تذكير بالموعد"
+
+
+def minute_bucket(moment):
+    """Start of the minute a reminder due at `moment` is sent in"""
+    return moment.replace(second=0, microsecond=0)
+
+
+def lead_time(offset_minutes):
+    """English and Arabic wording of how long before the appointment a reminder goes out"""
+    if offset_minutes % 60 == 0:
+        hours = offset_minutes // 60
+        return f"{hours} hour{'s' if hours != 1 else ''}", f"{hours} ساعة"
+    return f"{offset_minutes} minutes", f"{offset_minutes} دقيقة"
+
+
+def _patients_by_id(appointments):
+    from patients.models import Patient
+
+    patient_ids = set()
+    for appointment in appointments:
+        try:
+            patient_ids.add(uuid.UUID(str(appointment.patient_id)))
+        except ValueError:
+            continue
+    if not patient_ids:
+        return {}
+    return {str(patient.id): patient for patient in Patient.objects.filter(id__in=patient_ids)}
+
+
+def _participants(appointment, patient):
+    """(recipient_type, channel, recipient, payload) for everyone reminded of the appointment"""
+    doctor = appointment.doctor
+    doctor_payload = {'name': f"Dr. {doctor.name}", 'name_arabic': f"د. {doctor.name_arabic}"}
+    participants = [
+        ('DOCTOR', 'EMAIL', doctor.email, doctor_payload),
+        ('DOCTOR', 'SMS', doctor.phone, doctor_payload),
+    ]
+
+    patient_payload = (
+        {'name': patient.name, 'name_arabic': patient.name_arabic}
+        if patient else {'name': 'Patient', 'name_arabic': 'المريض'}
+    )
+    participants.append(('PATIENT', 'SMS', appointment.phone_number, patient_payload))
+    if patient:
+        participants.append(('PATIENT', 'EMAIL', patient.email, patient_payload))
+    return [participant for participant in participants if participant[2]]
+
+
+def schedule_reminders(appointments, now=None):
+    """
+    Create the reminders of scheduled appointments; returns how many were queued.
+
+    Offsets that are already in the past are skipped, and reminders that
+    already exist are left alone, so this is safe to call repeatedly.
+    """
+    now = now or timezone.now()
+    appointments = [appointment for appointment in appointments if appointment.status == 'SCHEDULED']
+    patients = _patients_by_id(appointments)
+
+    reminders = []
+    for appointment in appointments:
+        participants = _participants(appointment, patients.get(str(appointment.patient_id)))
+        for offset_minutes in settings.APPOINTMENT_REMINDER_OFFSETS:
+            due = appointment.slot_time - timedelta(minutes=offset_minutes)
+            if due < now:
+                continue
+            for recipient_type, channel, recipient, payload in participants:
+                reminders.append(AppointmentReminder(
+                    appointment=appointment,
+                    offset_minutes=offset_minutes,
+                    recipient_type=recipient_type,
+                    channel=channel,
+                    recipient=recipient,
+                    payload=payload,
+                    slot_time=appointment.slot_time,
+                    due_at=minute_bucket(due)
+                ))
+
+    AppointmentReminder.objects.bulk_create(reminders, ignore_conflicts=True, batch_size=1000)
+    return len(reminders)
+
+
+def schedule_upcoming(now=None, lookahead=SCHEDULE_LOOKAHEAD):
+    """
+    Schedule reminders due within `lookahead` for appointments that have none.
+
+    Catches appointments created or rescheduled without going through the
+    booking flow; only the slot_time windows of the next reminders are read.
+    """
+    now = now or timezone.now()
+    windows = Q()
+    for offset_minutes in settings.APPOINTMENT_REMINDER_OFFSETS:
+        offset = timedelta(minutes=offset_minutes)
+        windows |= Q(slot_time__gte=now + offset, slot_time__lt=now + offset + lookahead)
+
+    appointments = list(
+        Appointment.objects.filter(windows, status='SCHEDULED')
+        .exclude(reminders__slot_time=F('slot_time'))
+        .select_related('doctor')
+    )
+    if not appointments:
+        return 0
+    return schedule_reminders(appointments, now=now)
+
+
+def fail_interrupted(now=None):
+    """Fail reminders whose sending worker died; they may or may not have gone out"""
+    now = now or timezone.now()
+    interrupted = AppointmentReminder.objects.filter(
+        status='SENDING',
+        claimed_at__lt=now - REMINDER_CLAIM_LEASE
+    ).update(status='FAILED', last_error='Interrupted while sending; not retried to avoid a duplicate')
+    if interrupted:
+        logger.warning(f"Failed {interrupted} reminders interrupted while sending")
+    return interrupted
+
+
+def claim_due(batch_size, now=None):
+    """Move up to batch_size due reminders to SENDING and return them, oldest bucket first"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        reminders = list(
+            AppointmentReminder.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status='PENDING', due_at__lte=now)
+            .select_related('appointment')
+            .order_by('due_at', 'id')[:batch_size]
+        )
+        if reminders:
+            AppointmentReminder.objects.filter(
+                id__in=[reminder.id for reminder in reminders]
+            ).update(status='SENDING', claimed_at=now)
+    return reminders
+
+
+def _bucket_key(reminder):
+    # One bulk send per minute bucket, channel and offset (offsets word the message differently)
+    return reminder.due_at, reminder.channel, reminder.offset_minutes
+
+
+def _superseded(reminder, now):
+    """Whether a reminder with a smaller offset is due, so this one's lead time has passed"""
+    return any(
+        offset_minutes < reminder.offset_minutes
+        and minute_bucket(reminder.slot_time - timedelta(minutes=offset_minutes)) <= now
+        for offset_minutes in settings.APPOINTMENT_REMINDER_OFFSETS
+    )
+
+
+def _is_live(reminder, now):
+    appointment = reminder.appointment
+    return (
+        appointment.status == 'SCHEDULED'
+        and appointment.slot_time == reminder.slot_time
+        and reminder.slot_time > now
+        and not _superseded(reminder, now)
+    )
+
+
+def _sms_message(reminder):
+    slot_time = timezone.localtime(reminder.slot_time).strftime("%Y-%m-%d %H:%M")
+    lead, lead_arabic = lead_time(reminder.offset_minutes)
+    return f"""ALAQA: Reminder: your appointment at {slot_time} starts in {lead}.
+تذكير: موعدك في {slot_time} يبدأ خلال {lead_arabic}"""
+
+
+def _send_sms_bucket(reminders, sms_gateway):
+    results = sms_gateway.send_bulk([(reminder.recipient, _sms_message(reminder)) for reminder in reminders])
+    return [(reminder, success, message) for reminder, (success, message) in zip(reminders, results)]
+
+
+def _send_email_bucket(reminders, email_service):
+    from services.email_service import EmailTemplates
+
+    lead, lead_arabic = lead_time(reminders[0].offset_minutes)
+    # One shared body; names and times are filled in per recipient by SendGrid
+    html_content = EmailTemplates.get_appointment_reminder_template(
+        name='-name-',
+        name_arabic='-name_arabic-',
+        slot_time='-slot_time-',
+        lead_time=lead,
+        lead_time_arabic=lead_arabic
+    )
+    recipients = [
+        (reminder.recipient, {
+            '-name-': reminder.payload.get('name', ''),
+            '-name_arabic-': reminder.payload.get('name_arabic', ''),
+            '-slot_time-': timezone.localtime(reminder.slot_time).strftime("%Y-%m-%d %H:%M")
+        })
+        for reminder in reminders
+    ]
+    result = email_service.send_bulk_email(recipients, EMAIL_SUBJECT, html_content)
+    # Each request of the bulk send succeeds or fails for its own recipients
+    remaining = iter(reminders)
+    return [
+        (reminder, batch['success'], batch['message'])
+        for batch in result['batches']
+        for reminder in islice(remaining, batch['recipients'])
+    ]
+
+
+def _record(outcomes, now):
+    """Write the outcome of a send with one UPDATE per distinct result"""
+    sent_ids = [reminder.id for reminder, success, _ in outcomes if success]
+    if sent_ids:
+        AppointmentReminder.objects.filter(id__in=sent_ids).update(status='SENT', sent_at=now)
+
+    errors = {}
+    for reminder, success, message in outcomes:
+        if not success:
+            errors.setdefault(message, []).append(reminder.id)
+    for message, ids in errors.items():
+        AppointmentReminder.objects.filter(id__in=ids).update(status='FAILED', last_error=message)
+        logger.error(f"{len(ids)} reminders failed: {message}")
+    return len(sent_ids), sum(len(ids) for ids in errors.values())
+
+
+def dispatch_due_reminders(batch_size=None, now=None, email_service=None, sms_gateway=None):
+    """
+    Send every due reminder bucket by bucket.
+    Returns a (sent, failed, cancelled) tuple for this run.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.APPOINTMENT_REMINDER_BATCH_SIZE
+    fail_interrupted(now)
+    sent = failed = cancelled = 0
+
+    while True:
+        reminders = claim_due(batch_size, now)
+        if not reminders:
+            break
+
+        live = [reminder for reminder in reminders if _is_live(reminder, now)]
+        stale_ids = [reminder.id for reminder in reminders if not _is_live(reminder, now)]
+        if stale_ids:
+            cancelled += AppointmentReminder.objects.filter(id__in=stale_ids).update(status='CANCELLED')
+
+        for (due_at, channel, _), bucket in groupby(sorted(live, key=_bucket_key), key=_bucket_key):
+            bucket = list(bucket)
+            if channel == 'EMAIL':
+                if email_service is None:
+                    from services.email_service import EmailService
+                    email_service = EmailService()
+                outcomes = _send_email_bucket(bucket, email_service)
+            else:
+                if sms_gateway is None:
+                    from services.sms_gateway import get_sms_gateway
+                    sms_gateway = get_sms_gateway()
+                outcomes = _send_sms_bucket(bucket, sms_gateway)
+
+            bucket_sent, bucket_failed = _record(outcomes, timezone.now())
+            sent += bucket_sent
+            failed += bucket_failed
+            logger.info(f"Reminder bucket {due_at:%Y-%m-%d %H:%M} {channel}: sent {bucket_sent}, failed {bucket_failed}")
+
+    if sent or failed or cancelled:
+        logger.info(f"Reminder dispatch finished. Sent {sent}, failed {failed}, cancelled {cancelled}.")
+    return sent, failed, cancelled
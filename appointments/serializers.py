@@ -6,6 +6,7 @@ from django.utils import timezone
 import time
 import random
 from video_calls.views import generate_agora_rtc_token
+from .services import AppointmentBookingService, SlotUnavailableError
 
 class AppointmentCompletionSerializer(serializers.Serializer):
     completion_notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
@@ -82,6 +83,10 @@ class AppointmentSerializer(serializers.ModelSerializer):
             # Generate a unique channel name based on doctor_id and slot_time
             slot_time = validated_data['slot_time']
             doctor_id = validated_data['doctor'].id
+
+            # Lock the doctor's slots and reject overlapping bookings before doing any work
+            AppointmentBookingService.reserve_slot(doctor_id, slot_time, validated_data.get('duration'))
+
             cleaned_slot_time = slot_time.strftime('%Y%m%d%H%M%S')
             channel_name = f"vid_{doctor_id}_{cleaned_slot_time}"
 
@@ -97,8 +102,10 @@ class AppointmentSerializer(serializers.ModelSerializer):
             validated_data['video_token'] = token
 
             # Create the appointment
-            appointment = super().create(validated_data)
+            appointment = AppointmentBookingService.save_reserved(super().create, validated_data)
             return appointment
 
+        except SlotUnavailableError:
+            raise
         except Exception as e:
             raise serializers.ValidationError(f"Failed to create appointment: {str(e)}") 
\ No newline at end of file
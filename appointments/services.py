@@ -0,0 +1,171 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from doctors.models import Doctor
+from doctors.availability import APPOINTMENT_LOOKBACK, appointment_minutes
+from .models import Appointment
+
+logger = logging.getLogger(__name__)
+
+
+class SlotUnavailableError(Exception):
+    """Raised when the requested slot overlaps another scheduled appointment"""
+
+
+class AppointmentBookingService:
+    """
+    Reserves doctor slots so that concurrent bookings can never overlap.
+
+    Each booking locks the doctor's row for the duration of the surrounding
+    transaction, which serializes bookings for that doctor only; bookings
+    for different doctors proceed in parallel. The partial unique constraint
+    on (doctor, slot_time) for SCHEDULED rows backs this up at the database
+    level for writes that bypass this service.
+    """
+
+    @staticmethod
+    def find_conflict(doctor_id, slot_time, duration):
+        """Return the first SCHEDULED appointment overlapping the requested interval"""
+        slot_end = slot_time + timedelta(minutes=appointment_minutes(duration))
+        candidates = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            status='SCHEDULED',
+            slot_time__gt=slot_time - APPOINTMENT_LOOKBACK,
+            slot_time__lt=slot_end
+        ).only('id', 'slot_time', 'duration')
+
+        for appointment in candidates:
+            appointment_end = appointment.slot_time + timedelta(
+                minutes=appointment_minutes(appointment.duration)
+            )
+            if appointment_end > slot_time:
+                return appointment
+        return None
+
+    @staticmethod
+    def reserve_slot(doctor_id, slot_time, duration):
+        """
+        Lock the doctor and make sure the slot is still free.
+        Must be called inside transaction.atomic(); the lock is held until commit.
+        """
+        if not transaction.get_connection().in_atomic_block:
+            raise RuntimeError("reserve_slot must be called inside a transaction")
+
+        Doctor.objects.select_for_update().only('id').get(id=doctor_id)
+
+        conflict = AppointmentBookingService.find_conflict(doctor_id, slot_time, duration)
+        if conflict is not None:
+            logger.info(
+                f"Rejected booking for doctor {doctor_id} at {slot_time}: "
+                f"overlaps appointment {conflict.id}"
+            )
+            raise SlotUnavailableError("The selected time slot is no longer available")
+
+    @staticmethod
+    def save_reserved(create, validated_data):
+        """
+        Insert an appointment whose slot was reserved with reserve_slot.
+        A unique constraint violation on the slot is reported as SlotUnavailableError.
+        """
+        try:
+            with transaction.atomic():
+                return create(validated_data)
+        except IntegrityError:
+            conflict = AppointmentBookingService.find_conflict(
+                validated_data['doctor'].id,
+                validated_data['slot_time'],
+                validated_data.get('duration')
+            )
+            if conflict is None:
+                raise
+            logger.info(f"Booking lost the race for slot of appointment {conflict.id}")
+            raise SlotUnavailableError("The selected time slot is no longer available")
+
+
+class AutoCompletionService:
+    """
+    Marks overdue SCHEDULED appointments as COMPLETED with set-based updates.
+
+    Overdue rows are walked in (slot_time, id) order with keyset pagination
+    and completed with one UPDATE ... WHERE id IN (...) per chunk, so a
+    backlog of any size runs in constant memory and two statements per chunk.
+    """
+
+    COMPLETION_DELAY = timedelta(minutes=30)
+    DEFAULT_DURATION_MINUTES = 30
+
+    @staticmethod
+    def overdue_queryset(cutoff_time):
+        return Appointment.objects.filter(status='SCHEDULED', slot_time__lt=cutoff_time)
+
+    @staticmethod
+    def iter_chunks(cutoff_time, chunk_size):
+        """Yield lists of (slot_time, id) for overdue appointments, oldest first"""
+        queryset = AutoCompletionService.overdue_queryset(cutoff_time).order_by('slot_time', 'id')
+        last = None
+        while True:
+            page = queryset
+            if last is not None:
+                page = page.filter(
+                    models.Q(slot_time__gt=last[0]) |
+                    models.Q(slot_time=last[0], id__gt=last[1])
+                )
+            rows = list(page.values_list('slot_time', 'id')[:chunk_size])
+            if not rows:
+                return
+            yield rows
+            last = rows[-1]
+
+    @staticmethod
+    def complete_chunk(appointment_ids, now):
+        """Complete one chunk in a single UPDATE; rows completed meanwhile are skipped"""
+        return Appointment.objects.filter(id__in=appointment_ids, status='SCHEDULED').update(
+            status='COMPLETED',
+            completion_time=F('slot_time') + AutoCompletionService.COMPLETION_DELAY,
+            completion_notes=(
+                "This appointment was automatically marked as completed by the system.\n"
+                f"Auto-completed on: {now}\n"
+                "Reason: No manual completion after scheduled time."
+            ),
+            duration_minutes=AutoCompletionService.DEFAULT_DURATION_MINUTES,
+            updated_at=now
+        )
+
+    @staticmethod
+    def run(cutoff_time, chunk_size=1000, dry_run=False, on_chunk=None):
+        """
+        Complete every appointment scheduled before cutoff_time.
+
+        on_chunk, if given, is called with (chunk_number, selected, completed,
+        seconds) after each chunk. Returns a dict with totals.
+        """
+        now = timezone.now()
+        totals = {'chunks': 0, 'selected': 0, 'completed': 0, 'seconds': 0.0}
+
+        for rows in AutoCompletionService.iter_chunks(cutoff_time, chunk_size):
+            started = time.monotonic()
+            if dry_run:
+                completed = 0
+            else:
+                # A single UPDATE statement is atomic on its own
+                completed = AutoCompletionService.complete_chunk([pk for _, pk in rows], now)
+            elapsed = time.monotonic() - started
+
+            totals['chunks'] += 1
+            totals['selected'] += len(rows)
+            totals['completed'] += completed
+            totals['seconds'] += elapsed
+            logger.info(
+                f"Auto-completion chunk {totals['chunks']}: selected {len(rows)}, "
+                f"completed {completed} in {elapsed * 1000:.1f}ms "
+                f"(up to slot_time {rows[-1][0]})"
+            )
+            if on_chunk is not None:
+                on_chunk(totals['chunks'], len(rows), completed, elapsed)
+
+        return totals
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from appointments.cron import AutoCompleteAppointmentsCronJob
+from appointments.models import Appointment
+from appointments.services import AutoCompletionService
+from appointments.tests.test_booking import create_doctor, create_specialty
+
+
+class AutoCompletionTests(TestCase):
+    def setUp(self):
+        specialty = create_specialty()
+        self.doctors = [create_doctor(specialty, index) for index in range(3)]
+        self.now = timezone.now()
+
+    def create_appointments(self, count, hours_ago, appointment_status='SCHEDULED'):
+        base = self.now - timedelta(hours=hours_ago)
+        Appointment.objects.bulk_create([
+            Appointment(
+                doctor=self.doctors[index % 3],
+                specialist_category='General',
+                gender='M',
+                duration='30',
+                language='english',
+                phone_number='966500000000',
+                # Each slot_time is shared by three doctors to exercise the id tie-breaker
+                slot_time=base - timedelta(minutes=index // 3),
+                status=appointment_status
+            )
+            for index in range(count)
+        ])
+
+    def test_command_completes_every_overdue_appointment(self):
+        # More rows than one chunk; offset paging over a shrinking filter used to skip rows
+        self.create_appointments(25, hours_ago=30)
+        self.create_appointments(3, hours_ago=1)
+        self.create_appointments(2, hours_ago=30, appointment_status='CANCELLED')
+
+        out = StringIO()
+        call_command('auto_complete_appointments', '--batch-size', '4', stdout=out)
+
+        self.assertEqual(Appointment.objects.filter(status='COMPLETED').count(), 25)
+        self.assertEqual(Appointment.objects.filter(status='SCHEDULED').count(), 3)
+        self.assertEqual(Appointment.objects.filter(status='CANCELLED').count(), 2)
+        self.assertIn('Chunk 7: completed 1/1', out.getvalue())
+
+        appointment = Appointment.objects.filter(status='COMPLETED').first()
+        self.assertEqual(appointment.completion_time, appointment.slot_time + timedelta(minutes=30))
+        self.assertEqual(appointment.duration_minutes, 30)
+        self.assertIn('automatically marked as completed', appointment.completion_notes)
+
+    def test_dry_run_changes_nothing(self):
+        self.create_appointments(5, hours_ago=30)
+
+        out = StringIO()
+        call_command('auto_complete_appointments', '--dry-run', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(Appointment.objects.filter(status='SCHEDULED').count(), 5)
+        self.assertIn('Found 5 overdue appointments', out.getvalue())
+
+    def test_statement_count_is_bounded_per_chunk(self):
+        self.create_appointments(10, hours_ago=30)
+
+        # One keyset SELECT and one UPDATE per chunk, plus the final empty SELECT
+        with self.assertNumQueries(2 * 2 + 1):
+            totals = AutoCompletionService.run(self.now - timedelta(hours=24), chunk_size=5)
+
+        self.assertEqual(totals['completed'], 10)
+        self.assertEqual(totals['chunks'], 2)
+
+    def test_cron_job_uses_bulk_pipeline(self):
+        self.create_appointments(12, hours_ago=48)
+
+        result = AutoCompleteAppointmentsCronJob().do()
+
+        self.assertEqual(Appointment.objects.filter(status='COMPLETED').count(), 12)
+        self.assertIn('completed 12', result)
@@ -0,0 +1,163 @@
+import threading
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from appointments.models import Appointment
+from doctors.models import Doctor
+from specialties.models import Specialty
+
+
+def create_specialty():
+    return Specialty.objects.create(
+        title='General Medicine',
+        title_ar='طب عام',
+        icon='stethoscope',
+        background_color='#ffffff',
+        color_class='bg-primary',
+        description='General',
+        description_ar='عام',
+        total_time_call=30,
+        warning_time_call=5,
+        alert_time_call=2
+    )
+
+
+def create_doctor(specialty, index=0):
+    doctor = Doctor.objects.create(
+        name=f'Dr. Booking {index}',
+        name_arabic=f'د. حجز {index}',
+        sex='male',
+        email=f'booking{index}@test.com',
+        phone='+966500000000',
+        experience='10 years',
+        category='consultant',
+        language_in_sessions='both',
+        license_number=f'BOOK{index:04d}',
+        profile_arabic='نبذة',
+        profile_english='Profile',
+        status='approved'
+    )
+    doctor.specialities.add(specialty)
+    return doctor
+
+
+def booking_payload(doctor, specialty, slot_time, duration='30'):
+    return {
+        'doctor': str(doctor.id),
+        'specialties': [str(specialty.id)],
+        'specialist_category': 'General',
+        'gender': 'F',
+        'duration': duration,
+        'language': 'arabic',
+        'phone_number': '966500000000',
+        'slot_time': slot_time.isoformat()
+    }
+
+
+@patch('appointments.serializers.generate_agora_rtc_token', return_value=('token', 0))
+class AppointmentBookingTests(APITestCase):
+    def setUp(self):
+        self.specialty = create_specialty()
+        self.doctor = create_doctor(self.specialty)
+        self.slot_time = (timezone.now() + timedelta(days=2)).replace(second=0, microsecond=0)
+
+    def book(self, slot_time, duration='30', doctor=None):
+        return self.client.post(
+            '/api/v1/appointments/',
+            booking_payload(doctor or self.doctor, self.specialty, slot_time, duration),
+            format='json'
+        )
+
+    def test_same_slot_cannot_be_booked_twice(self, *mocks):
+        self.assertEqual(self.book(self.slot_time).status_code, status.HTTP_201_CREATED)
+
+        response = self.book(self.slot_time)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 1)
+
+    def test_overlapping_slot_is_rejected(self, *mocks):
+        self.book(self.slot_time, duration='60')
+
+        response = self.book(self.slot_time + timedelta(minutes=30))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_adjacent_slots_and_other_doctors_are_allowed(self, *mocks):
+        other_doctor = create_doctor(self.specialty, index=1)
+
+        self.assertEqual(self.book(self.slot_time).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.book(self.slot_time + timedelta(minutes=30)).status_code, status.HTTP_201_CREATED
+        )
+        self.assertEqual(
+            self.book(self.slot_time, doctor=other_doctor).status_code, status.HTTP_201_CREATED
+        )
+
+    def test_cancelled_slot_can_be_rebooked(self, *mocks):
+        self.book(self.slot_time)
+        Appointment.objects.filter(doctor=self.doctor).update(status='CANCELLED')
+
+        self.assertEqual(self.book(self.slot_time).status_code, status.HTTP_201_CREATED)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Row locking needs PostgreSQL')
+@patch('appointments.serializers.generate_agora_rtc_token', return_value=('token', 0))
+class AppointmentBookingConcurrencyTests(TransactionTestCase):
+    """Fire parallel creates and check the database never ends up double booked"""
+
+    attempts = 50
+
+    def setUp(self):
+        self.specialty = create_specialty()
+        self.slot_time = (timezone.now() + timedelta(days=2)).replace(second=0, microsecond=0)
+
+    def run_in_parallel(self, payloads):
+        barrier = threading.Barrier(len(payloads))
+        results = [None] * len(payloads)
+
+        def worker(index, payload):
+            try:
+                barrier.wait()
+                response = APIClient().post('/api/v1/appointments/', payload, format='json')
+                results[index] = response.status_code
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(index, payload))
+            for index, payload in enumerate(payloads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_parallel_bookings_for_one_slot(self, *mocks):
+        doctor = create_doctor(self.specialty)
+        payloads = [
+            booking_payload(doctor, self.specialty, self.slot_time + timedelta(minutes=index % 3 * 10))
+            for index in range(self.attempts)
+        ]
+
+        results = self.run_in_parallel(payloads)
+
+        self.assertEqual(results.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(results.count(status.HTTP_409_CONFLICT), self.attempts - 1)
+        self.assertEqual(Appointment.objects.filter(doctor=doctor, status='SCHEDULED').count(), 1)
+
+    def test_parallel_bookings_for_different_doctors(self, *mocks):
+        doctors = [create_doctor(self.specialty, index) for index in range(10)]
+        payloads = [booking_payload(doctor, self.specialty, self.slot_time) for doctor in doctors]
+
+        results = self.run_in_parallel(payloads)
+
+        self.assertEqual(results, [status.HTTP_201_CREATED] * len(doctors))
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from appointments import notifications
+from appointments.models import Appointment, NotificationOutbox
+from appointments.tests.test_booking import booking_payload, create_doctor, create_specialty
+
+
+@patch('appointments.serializers.generate_agora_rtc_token', return_value=('token', 0))
+class NotificationOutboxTests(APITestCase):
+    def setUp(self):
+        self.specialty = create_specialty()
+        self.doctor = create_doctor(self.specialty)
+        self.slot_time = (timezone.now() + timedelta(days=2)).replace(second=0, microsecond=0)
+        self.email_service = MagicMock()
+        self.email_service.send_appointment_notification.return_value = {
+            'success': True, 'message': 'Email sent successfully'
+        }
+
+    def book(self):
+        return self.client.post(
+            '/api/v1/appointments/',
+            booking_payload(self.doctor, self.specialty, self.slot_time),
+            format='json'
+        )
+
+    @patch('otp.services.OTPService.send_sms')
+    @patch('services.email_service.EmailService')
+    def test_booking_only_writes_outbox_rows(self, email_service_class, send_sms, *mocks):
+        response = self.book()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        email_service_class.assert_not_called()
+        send_sms.assert_not_called()
+
+        queued = NotificationOutbox.objects.filter(appointment_id=response.data['data']['id'])
+        self.assertEqual(
+            sorted(queued.values_list('channel', 'recipient')),
+            [('EMAIL', self.doctor.email), ('SMS', self.doctor.phone)]
+        )
+        self.assertTrue(all(item.status == 'PENDING' for item in queued))
+
+    @patch('otp.services.OTPService.send_sms', return_value=(True, 'SMS sent successfully'))
+    def test_dispatch_delivers_pending_notifications(self, send_sms, *mocks):
+        self.book()
+
+        with patch('services.email_service.EmailService', return_value=self.email_service):
+            sent, failed = notifications.dispatch_pending()
+
+        self.assertEqual((sent, failed), (2, 0))
+        self.assertEqual(set(NotificationOutbox.objects.values_list('status', flat=True)), {'SENT'})
+        self.email_service.send_appointment_notification.assert_called_once()
+        self.assertEqual(
+            self.email_service.send_appointment_notification.call_args.kwargs['to_email'],
+            self.doctor.email
+        )
+        self.assertIn('ALAQA', send_sms.call_args.args[1])
+
+        # Nothing left to deliver on the next run
+        self.assertEqual(notifications.dispatch_pending(), (0, 0))
+
+    @patch('otp.services.OTPService.send_sms', return_value=(False, 'Request timed out'))
+    def test_failed_delivery_is_retried_with_backoff(self, send_sms, *mocks):
+        appointment = Appointment.objects.create(
+            doctor=self.doctor,
+            specialist_category='General',
+            gender='F',
+            duration='30',
+            language='arabic',
+            phone_number='966500000000',
+            slot_time=self.slot_time
+        )
+        notification = NotificationOutbox.objects.create(
+            appointment=appointment,
+            channel='SMS',
+            kind='appointment_created',
+            recipient=self.doctor.phone,
+            payload={'message': 'hello'}
+        )
+
+        self.assertEqual(notifications.dispatch_pending(), (0, 1))
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'PENDING')
+        self.assertEqual(notification.attempts, 1)
+        self.assertEqual(notification.last_error, 'Request timed out')
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+        # Not due yet, so the next run leaves it alone
+        self.assertEqual(notifications.dispatch_pending(), (0, 0))
+
+        NotificationOutbox.objects.update(
+            next_attempt_at=timezone.now(), attempts=notifications.MAX_ATTEMPTS - 1
+        )
+        call_command('dispatch_notifications', stdout=MagicMock())
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'FAILED')
+        self.assertEqual(send_sms.call_count, 2)
+
+    def test_lease_is_extended_while_a_batch_is_sent(self, *mocks):
+        appointment = Appointment.objects.create(
+            doctor=self.doctor,
+            specialist_category='General',
+            gender='F',
+            duration='30',
+            language='arabic',
+            phone_number='966500000000',
+            slot_time=self.slot_time
+        )
+        NotificationOutbox.objects.bulk_create([
+            NotificationOutbox(
+                appointment=appointment,
+                channel='SMS',
+                kind='appointment_created',
+                recipient=self.doctor.phone,
+                payload={'message': f'hello {index}'}
+            )
+            for index in range(3)
+        ])
+        clock = [timezone.now() + timedelta(seconds=1)]
+        reclaimed = []
+
+        def slow_send(phone, message):
+            # The batch takes longer than one lease; another worker looks for due rows meanwhile
+            clock[0] += notifications.CLAIM_LEASE * 0.4
+            reclaimed.extend(notifications.claim_batch(10, now=clock[0] + notifications.CLAIM_LEASE * 0.1))
+            return True, 'SMS sent successfully'
+
+        with patch('appointments.notifications.timezone.now', side_effect=lambda: clock[0]), \
+                patch('otp.services.OTPService.send_sms', side_effect=slow_send):
+            self.assertEqual(notifications.dispatch_pending(), (3, 0))
+
+        self.assertEqual(reclaimed, [])
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from appointments.models import Appointment
+from appointments.tests.test_booking import create_doctor, create_specialty
+from patients.models import Patient
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.specialty = create_specialty()
+        self.doctor = create_doctor(self.specialty)
+        start = timezone.now().replace(second=0, microsecond=0)
+        # Pairs of appointments share a slot_time so the id tiebreak is exercised
+        for index in range(25):
+            Appointment.objects.create(
+                doctor=self.doctor,
+                specialist_category='General',
+                gender='F',
+                duration='30',
+                language='arabic',
+                phone_number='966500000000',
+                slot_time=start + timedelta(hours=index // 2),
+                status='COMPLETED' if index % 2 else 'SCHEDULED'
+            )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def relative(self, link):
+        parts = urlsplit(link)
+        return f"{parts.path}?{parts.query}"
+
+    def test_walks_every_appointment_once_in_order(self):
+        seen = []
+        url = '/api/v1/appointments/?pagination=cursor&limit=10'
+        while url:
+            data = self.get(url)
+            self.assertEqual(data['status'], 'success')
+            self.assertNotIn('total', data['data']['pagination'])
+            seen.extend(item['id'] for item in data['data']['appointments'])
+            next_link = data['data']['pagination']['next']
+            url = next_link and self.relative(next_link)
+
+        expected = list(Appointment.objects.order_by('-slot_time', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_the_previous_page(self):
+        first = self.get('/api/v1/appointments/?pagination=cursor&limit=10')
+        second = self.get(self.relative(first['data']['pagination']['next']))
+        back = self.get(self.relative(second['data']['pagination']['previous']))
+
+        self.assertIsNone(first['data']['pagination']['previous'])
+        self.assertEqual(back['data']['appointments'], first['data']['appointments'])
+
+    def test_pages_skip_count_and_offset(self):
+        first = self.get('/api/v1/appointments/?pagination=cursor&limit=5')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get(self.relative(first['data']['pagination']['next']))
+        sql = ' '.join(query['sql'] for query in queries.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_count_on_request(self):
+        data = self.get('/api/v1/appointments/?pagination=cursor&count=exact&status=SCHEDULED')
+        self.assertEqual(data['data']['pagination']['total'], 13)
+
+        # Estimates fall back to an exact count outside PostgreSQL
+        data = self.get('/api/v1/appointments/?pagination=cursor&count=estimate')
+        self.assertEqual(data['data']['pagination']['total'], 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/appointments/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_numbers_stay_the_default(self):
+        data = self.get('/api/v1/appointments/')
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 10)
+
+    def test_patients_by_created_at(self):
+        for index in range(3):
+            Patient.objects.create(
+                name=f'Patient {index}',
+                name_arabic=f'مريض {index}',
+                sex='female',
+                email=f'patient{index}@test.com',
+                phone='966500000000',
+                date_of_birth='1990-01-01'
+            )
+
+        first = self.get('/api/v1/patients/?pagination=cursor&limit=2')
+        second = self.get(self.relative(first['data']['pagination']['next']))
+
+        names = [item['name'] for item in first['data']['patients'] + second['data']['patients']]
+        self.assertEqual(names, ['Patient 2', 'Patient 1', 'Patient 0'])
+        self.assertIsNone(second['data']['pagination']['next'])
+
+    def test_doctors_keep_envelope(self):
+        data = self.get('/api/v1/doctors/?pagination=cursor&count=exact')
+
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(len(data['data']['doctors']), 1)
+        self.assertEqual(data['data']['pagination']['total'], 1)
@@ -0,0 +1,100 @@
+"""
+Query-plan regression suite for the hot Appointment lookups.
+
+Seeds a large synthetic appointments table, refreshes planner statistics and
+asserts through EXPLAIN that each hot query is answered from an index instead
+of a sequential scan over appointments_appointment.
+"""
+import json
+import unittest
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from appointments.models import Appointment
+from appointments.services import AppointmentBookingService, AutoCompletionService
+from appointments.tests.test_booking import create_doctor, create_specialty
+
+TABLE = Appointment._meta.db_table
+
+
+def plan_nodes(node):
+    """Flatten an EXPLAIN (FORMAT JSON) plan tree"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Query plans are PostgreSQL specific')
+class AppointmentQueryPlanTests(TestCase):
+    rows = 100_000
+    doctor_count = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        specialty = create_specialty()
+        cls.doctors = [create_doctor(specialty, index) for index in range(cls.doctor_count)]
+
+        # Mostly historical rows with a thin layer of SCHEDULED ones, like production
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {TABLE} (
+                    doctor_id, specialist_category, gender, duration, language,
+                    phone_number, slot_time, status, created_at, updated_at
+                )
+                SELECT
+                    (%s::uuid[])[1 + i %% %s], 'General', 'M', '30', 'english',
+                    '966500000000', now() - i * interval '1 minute',
+                    CASE WHEN i %% 50 = 0 THEN 'SCHEDULED' ELSE 'COMPLETED' END,
+                    now(), now()
+                FROM generate_series(1, %s) AS i
+                """,
+                [[str(doctor.id) for doctor in cls.doctors], cls.doctor_count, cls.rows]
+            )
+            cursor.execute(f"ANALYZE {TABLE}")
+
+    def explain(self, queryset):
+        return json.loads(queryset.explain(format='json'))[0]['Plan']
+
+    def assertUsesIndex(self, queryset, *index_names):
+        nodes = list(plan_nodes(self.explain(queryset)))
+        seq_scans = [
+            node for node in nodes
+            if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == TABLE
+        ]
+        self.assertFalse(seq_scans, f"Sequential scan on {TABLE}: {nodes}")
+        used = {node.get('Index Name') for node in nodes}
+        self.assertTrue(used & set(index_names), f"Expected one of {index_names}, plan used {used}")
+
+    def test_auto_completion_chunk_uses_partial_index(self):
+        queryset = AutoCompletionService.overdue_queryset(
+            timezone.now() - timedelta(hours=24)
+        ).order_by('slot_time', 'id').values_list('slot_time', 'id')[:1000]
+        self.assertUsesIndex(queryset, 'appt_scheduled_slot_idx')
+
+    def test_doctor_appointment_list_uses_doctor_index(self):
+        queryset = Appointment.objects.filter(doctor=self.doctors[0]).order_by('-slot_time')[:10]
+        self.assertUsesIndex(queryset, 'appt_doctor_slot_idx')
+
+    def test_doctor_status_filter_uses_composite_index(self):
+        queryset = Appointment.objects.filter(
+            doctor=self.doctors[0], status='COMPLETED'
+        ).order_by('-slot_time')[:10]
+        self.assertUsesIndex(queryset, 'appt_doctor_status_slot_idx')
+
+    def test_booking_conflict_check_uses_scheduled_slot_index(self):
+        slot_time = timezone.now() - timedelta(days=10)
+        queryset = Appointment.objects.filter(
+            doctor=self.doctors[0],
+            status='SCHEDULED',
+            slot_time__gt=slot_time - timedelta(days=1),
+            slot_time__lt=slot_time + timedelta(minutes=30)
+        ).only('id', 'slot_time', 'duration')
+        self.assertUsesIndex(queryset, 'unique_scheduled_doctor_slot', 'appt_doctor_status_slot_idx')
+
+        # The service issues exactly this query
+        with self.assertNumQueries(1):
+            AppointmentBookingService.find_conflict(self.doctors[0].id, slot_time, '30')
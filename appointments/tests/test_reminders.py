@@ -0,0 +1,199 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from appointments import reminders
+from appointments.models import Appointment, AppointmentReminder
+from appointments.tests.test_booking import booking_payload, create_doctor, create_specialty
+
+
+@override_settings(APPOINTMENT_REMINDER_OFFSETS=[24 * 60, 15])
+@patch('appointments.serializers.generate_agora_rtc_token', return_value=('token', 0))
+class AppointmentReminderBookingTests(APITestCase):
+    def test_booking_schedules_reminders(self, *mocks):
+        specialty = create_specialty()
+        doctor = create_doctor(specialty)
+        slot_time = (timezone.now() + timedelta(days=2)).replace(second=0, microsecond=0)
+
+        response = self.client.post(
+            '/api/v1/appointments/', booking_payload(doctor, specialty, slot_time), format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        queued = AppointmentReminder.objects.filter(appointment_id=response.data['data']['id'])
+        self.assertEqual(
+            sorted(queued.values_list('offset_minutes', 'recipient_type', 'channel')),
+            [
+                (15, 'DOCTOR', 'EMAIL'), (15, 'DOCTOR', 'SMS'), (15, 'PATIENT', 'SMS'),
+                (1440, 'DOCTOR', 'EMAIL'), (1440, 'DOCTOR', 'SMS'), (1440, 'PATIENT', 'SMS'),
+            ]
+        )
+        self.assertEqual(
+            queued.get(offset_minutes=15, channel='EMAIL').due_at,
+            slot_time - timedelta(minutes=15)
+        )
+
+
+@override_settings(APPOINTMENT_REMINDER_OFFSETS=[24 * 60, 15])
+class AppointmentReminderDispatchTests(TestCase):
+    def setUp(self):
+        self.specialty = create_specialty()
+        self.doctors = [create_doctor(self.specialty, index) for index in range(3)]
+        self.now = timezone.now().replace(second=0, microsecond=0)
+        self.slot_time = self.now + timedelta(days=2)
+        self.email_service = MagicMock()
+        self.email_service.send_bulk_email.side_effect = lambda recipients, subject, html: {
+            'success': True, 'sent': len(recipients), 'failed': 0, 'requests': 1,
+            'message': 'Email sent successfully',
+            'batches': [{'recipients': len(recipients), 'success': True, 'message': 'Email sent successfully'}]
+        }
+        self.sms_gateway = MagicMock()
+        self.sms_gateway.send_bulk.side_effect = lambda messages: [(True, 'Success')] * len(messages)
+
+    def create_appointment(self, doctor, slot_time=None):
+        return Appointment.objects.create(
+            doctor=doctor,
+            specialist_category='General',
+            gender='F',
+            duration='30',
+            language='arabic',
+            phone_number='966500000000',
+            slot_time=slot_time or self.slot_time
+        )
+
+    def dispatch(self, now):
+        return reminders.dispatch_due_reminders(
+            now=now, email_service=self.email_service, sms_gateway=self.sms_gateway
+        )
+
+    def test_scheduling_is_idempotent(self):
+        appointment = self.create_appointment(self.doctors[0])
+
+        reminders.schedule_reminders([appointment], now=self.now)
+        reminders.schedule_reminders([appointment], now=self.now)
+
+        self.assertEqual(AppointmentReminder.objects.count(), 6)
+
+    def test_past_offsets_are_skipped(self):
+        appointment = self.create_appointment(self.doctors[0], slot_time=self.now + timedelta(hours=1))
+
+        reminders.schedule_reminders([appointment], now=self.now)
+
+        self.assertEqual(set(AppointmentReminder.objects.values_list('offset_minutes', flat=True)), {15})
+
+    def test_due_bucket_is_sent_with_one_bulk_call_per_channel(self):
+        appointments = [self.create_appointment(doctor) for doctor in self.doctors]
+        reminders.schedule_reminders(appointments, now=self.now)
+
+        # Nothing is due until the day-before bucket
+        self.assertEqual(self.dispatch(self.now), (0, 0, 0))
+
+        self.assertEqual(self.dispatch(self.now + timedelta(days=1)), (9, 0, 0))
+        self.email_service.send_bulk_email.assert_called_once()
+        self.sms_gateway.send_bulk.assert_called_once()
+        recipients = self.email_service.send_bulk_email.call_args.args[0]
+        self.assertEqual(sorted(email for email, _ in recipients), sorted(doctor.email for doctor in self.doctors))
+        self.assertEqual(len(self.sms_gateway.send_bulk.call_args.args[0]), 6)
+        self.assertEqual(
+            AppointmentReminder.objects.filter(offset_minutes=24 * 60, status='SENT').count(), 9
+        )
+
+        # Sent reminders are not sent again
+        self.assertEqual(self.dispatch(self.now + timedelta(days=1)), (0, 0, 0))
+
+    def test_cancelled_and_rescheduled_appointments_are_not_reminded(self):
+        cancelled, rescheduled, kept = [self.create_appointment(doctor) for doctor in self.doctors]
+        reminders.schedule_reminders([cancelled, rescheduled, kept], now=self.now)
+        Appointment.objects.filter(id=cancelled.id).update(status='CANCELLED')
+        Appointment.objects.filter(id=rescheduled.id).update(slot_time=self.slot_time + timedelta(hours=3))
+
+        self.assertEqual(self.dispatch(self.now + timedelta(days=1)), (3, 0, 6))
+        self.assertEqual(
+            set(AppointmentReminder.objects.filter(appointment=kept, offset_minutes=24 * 60)
+                .values_list('status', flat=True)),
+            {'SENT'}
+        )
+
+    def test_catch_up_after_downtime_skips_started_appointments(self):
+        appointment = self.create_appointment(self.doctors[0])
+        reminders.schedule_reminders([appointment], now=self.now)
+
+        # Down until the day-before bucket is hours late: it still goes out
+        # while no later reminder is due
+        self.assertEqual(self.dispatch(self.now + timedelta(days=1, hours=3)), (3, 0, 0))
+
+        # Down through the 15 minute bucket too: only that reminder goes out,
+        # and nothing once the appointment has started
+        AppointmentReminder.objects.update(status='PENDING')
+        self.assertEqual(self.dispatch(self.slot_time - timedelta(minutes=5)), (3, 0, 3))
+        self.assertEqual(
+            set(AppointmentReminder.objects.filter(status='SENT').values_list('offset_minutes', flat=True)),
+            {15}
+        )
+
+        AppointmentReminder.objects.update(status='PENDING')
+        self.assertEqual(self.dispatch(self.slot_time + timedelta(minutes=1)), (0, 0, 6))
+
+    def test_failed_sends_are_recorded(self):
+        appointment = self.create_appointment(self.doctors[0])
+        reminders.schedule_reminders([appointment], now=self.now)
+        self.sms_gateway.send_bulk.side_effect = lambda messages: [(False, 'Request timed out')] * len(messages)
+
+        self.assertEqual(self.dispatch(self.now + timedelta(days=1)), (1, 2, 0))
+        failed = AppointmentReminder.objects.filter(status='FAILED')
+        self.assertEqual(set(failed.values_list('last_error', flat=True)), {'Request timed out'})
+
+    def test_failed_email_batch_only_fails_its_recipients(self):
+        appointments = [self.create_appointment(doctor) for doctor in self.doctors]
+        reminders.schedule_reminders(appointments, now=self.now)
+        self.email_service.send_bulk_email.side_effect = lambda recipients, subject, html: {
+            'success': False, 'sent': 2, 'failed': 1, 'requests': 2,
+            'message': 'Failed to send email: down',
+            'batches': [
+                {'recipients': 2, 'success': True, 'message': 'Email sent successfully'},
+                {'recipients': 1, 'success': False, 'message': 'Failed to send email: down'},
+            ]
+        }
+
+        self.assertEqual(self.dispatch(self.now + timedelta(days=1)), (8, 1, 0))
+        failed = AppointmentReminder.objects.get(status='FAILED')
+        self.assertEqual(failed.channel, 'EMAIL')
+        self.assertEqual(failed.last_error, 'Failed to send email: down')
+
+    def test_interrupted_sends_are_failed_not_resent(self):
+        appointment = self.create_appointment(self.doctors[0])
+        reminders.schedule_reminders([appointment], now=self.now)
+        due = self.now + timedelta(days=1)
+        claimed = reminders.claim_due(100, now=due)
+        self.assertEqual(len(claimed), 3)
+
+        # The worker died mid-send; a run within the lease leaves the claim alone
+        self.assertEqual(self.dispatch(due + timedelta(minutes=1)), (0, 0, 0))
+        self.dispatch(due + reminders.REMINDER_CLAIM_LEASE + timedelta(minutes=1))
+
+        self.assertEqual(AppointmentReminder.objects.filter(status='FAILED').count(), 3)
+        self.email_service.send_bulk_email.assert_not_called()
+        self.sms_gateway.send_bulk.assert_not_called()
+
+    def test_schedule_upcoming_covers_appointments_without_reminders(self):
+        soon = self.create_appointment(self.doctors[0], slot_time=self.now + timedelta(minutes=20))
+        self.create_appointment(self.doctors[1], slot_time=self.now + timedelta(hours=5))
+
+        self.assertEqual(reminders.schedule_upcoming(now=self.now + timedelta(minutes=1)), 3)
+        self.assertEqual(set(AppointmentReminder.objects.values_list('appointment_id', flat=True)), {soon.id})
+        self.assertEqual(reminders.schedule_upcoming(now=self.now + timedelta(minutes=2)), 0)
+
+    def test_management_command_backfills(self):
+        self.create_appointment(self.doctors[0])
+
+        command = 'appointments.management.commands.send_appointment_reminders'
+        with patch(f'{command}.dispatch_due_reminders', return_value=(0, 0, 0)) as dispatch:
+            call_command('send_appointment_reminders', backfill=True, stdout=MagicMock())
+        dispatch.assert_called_once()
+
+        self.assertEqual(AppointmentReminder.objects.filter(status='PENDING').count(), 6)
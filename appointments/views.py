@@ -7,17 +7,20 @@ from django.utils import timezone
 from django.db import transaction
 from .models import Appointment, Doctor
 from .serializers import AppointmentSerializer, AppointmentCompletionSerializer
+from .services import SlotUnavailableError
 from .permissions import IsAppointmentDoctor
 from datetime import timedelta
 from rest_framework import serializers
-from services.email_service import EmailService
-from otp.services import OTPService
+from .notifications import queue_appointment_created
+from .reminders import schedule_reminders
+from config.pagination import KeysetPaginationMixin
 
 logger = logging.getLogger(__name__)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     queryset = Appointment.objects.all()
+    keyset_ordering = ('-slot_time', '-id')
     
     def get_permissions(self):
         if self.action in ["create", "list"]:
@@ -36,8 +39,9 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 serializer.is_valid(raise_exception=True)
                 appointment = serializer.save()
                 
-                # Send notifications to doctor
-                self._send_doctor_notifications(appointment)
+                # Queue notifications to doctor
+                self._queue_doctor_notifications(appointment)
+                schedule_reminders([appointment])
                 
                 # Log successful appointment creation with video token
                 logger.info(
@@ -64,6 +68,16 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        except SlotUnavailableError as e:
+            logger.info(f"Appointment slot conflict: {str(e)}")
+            return Response(
+                {
+                    'status': 'error',
+                    'message': str(e)
+                },
+                status=status.HTTP_409_CONFLICT
+            )
             
         except Exception as e:
             logger.error(f"Appointment creation failed: {str(e)}", exc_info=True)
@@ -76,44 +90,29 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _send_doctor_notifications(self, appointment):
+    def list(self, request, *args, **kwargs):
+        if not self.keyset_paginated:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({
+            'status': 'success',
+            'data': {
+                'appointments': serializer.data,
+                'pagination': self.get_pagination_meta()
+            }
+        })
+
+    def _queue_doctor_notifications(self, appointment):
         """
-        Send email and SMS notifications to the doctor about the new appointment.
+        Queue email and SMS notifications to the doctor about the new appointment.
+        They are written to the outbox in the booking transaction and delivered
+        by the notification dispatcher, so the request never waits on providers.
         """
-        try:
-            doctor = appointment.doctor
-            slot_time = appointment.slot_time.strftime("%Y-%m-%d %H:%M")
-            duration = appointment.duration
-            
-            # Send email using enterprise template
-            email_service = EmailService()
-            email_result = email_service.send_appointment_notification(
-                to_email=doctor.email,
-                doctor_name=doctor.name,
-                doctor_name_arabic=doctor.name_arabic,
-                slot_time=slot_time,
-                duration=duration,
-                phone_number=appointment.phone_number,
-                language=appointment.language
-            )
-            
-            if not email_result['success']:
-                logger.error(f"Failed to send email to doctor {doctor.email}: {email_result['message']}")
-            
-            # Prepare SMS content (bilingual and concise)
-            sms_content = f"""ALAQA: New appointment scheduled for {slot_time}. Duration: {duration}min.
-موعد جديد في {slot_time}. المدة: {duration} دقيقة"""
-            
-            # Send SMS
-            sms_result = OTPService.send_sms(doctor.phone, sms_content)
-            
-            if not sms_result[0]:  # sms_result returns (success, message)
-                logger.error(f"Failed to send SMS to doctor {doctor.phone}: {sms_result[1]}")
-                
-        except Exception as e:
-            logger.error(f"Failed to send notifications: {str(e)}", exc_info=True)
-            # Don't raise the exception to prevent appointment creation from failing
-            
+        queue_appointment_created(appointment)
+
     def get_queryset(self):
         queryset = super().get_queryset()
         
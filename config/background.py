@@ -0,0 +1,52 @@
+"""
+Single-thread background queues for work that follows a committed change.
+
+Each queue runs its task on one worker thread, so tasks never race each other,
+and queues a key only once while it waits: a burst of saves touching the same
+object is folded into one run. A failed task is logged and dropped; every
+caller has a fallback (rendering on demand, a cron job or a backfill command).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundQueue:
+    """
+    Run task(key, *args) on a single background thread.
+
+    `covered_by(key)` returns the keys whose pending run also does the work of
+    `key` (by default just `key` itself); scheduling is a no-op while any of
+    them waits.
+    """
+
+    def __init__(self, name, task, covered_by=None):
+        self.name = name
+        self._task = task
+        self._covered_by = covered_by or (lambda key: (key,))
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, key, *args):
+        """Queue task(key, *args) unless a run covering `key` is still waiting"""
+        with self._lock:
+            if any(covering in self._pending for covering in self._covered_by(key)):
+                return
+            self._pending.add(key)
+        self._pool.submit(self._run, key, *args)
+
+    def _run(self, key, *args):
+        with self._lock:
+            self._pending.discard(key)
+        close_old_connections()
+        try:
+            self._task(key, *args)
+        except Exception as e:
+            logger.error(f"Background {self.name} task for {key!r} failed: {str(e)}", exc_info=True)
+        finally:
+            close_old_connections()
@@ -0,0 +1,209 @@
+"""
+Opt-in keyset (cursor) pagination for the large list endpoints.
+
+Page number pagination runs a COUNT(*) and an OFFSET scan on every page, so
+deep pages get slower the further in they are. Keyset pagination instead
+continues from the last row of the previous page with a WHERE on an indexed
+(value, id) pair, which costs the same on every page.
+
+Clients opt in with `?pagination=cursor` and follow the `next`/`previous`
+links from there. The total is omitted unless asked for with
+`?count=estimate` (planner estimate) or `?count=exact`.
+"""
+import base64
+import binascii
+import json
+import logging
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+logger = logging.getLogger(__name__)
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+
+
+def estimate_count(queryset):
+    """
+    Row count of a queryset from the PostgreSQL planner, without scanning it.
+    Other databases fall back to an exact count.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Could not estimate row count: {str(e)}")
+        return None
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        # Full precision; a truncated timestamp would skip or repeat rows
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates on `ordering`, a tuple of field names that ends with a unique
+    field (normally the primary key), e.g. ('-created_at', '-id'). Every field
+    must be sorted in the same direction and must not be nullable.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    page_size = 10
+    max_page_size = 100
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    @classmethod
+    def is_requested(cls, request):
+        if request is None:
+            return False
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get(cls.mode_query_param) == 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (ValueError, TypeError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, cursor['v'], strict=True)
+            ]
+            return values, bool(cursor.get('r'))
+        except (binascii.Error, ValidationError, ValueError, TypeError, KeyError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, instance, reverse):
+        values = [_encode_value(getattr(instance, name)) for name in self.fields]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def keyset_filter(self, values, after):
+        """Rows strictly after (or before) `values` in the pagination order"""
+        lookup = 'lt' if self.descending == after else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            equal = {field: value for field, value in zip(self.fields[:index], values[:index])}
+            condition |= Q(**equal, **{f'{name}__{lookup}': values[index]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.queryset = queryset
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        values, reverse = self.decode_cursor(request, queryset.model)
+
+        if reverse:
+            flipped = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            queryset = queryset.order_by(*flipped)
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, after=not reverse))
+
+        # One extra row tells whether there is another page, without a COUNT
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_count(self):
+        mode = self.request.query_params.get(self.count_query_param)
+        if mode == COUNT_EXACT:
+            return self.queryset.count()
+        if mode == COUNT_ESTIMATE:
+            return estimate_count(self.queryset)
+        return None
+
+    def get_pagination_meta(self):
+        meta = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'limit': self.page_size
+        }
+        count = self.get_count()
+        if count is not None:
+            meta['total'] = count
+        return meta
+
+    def get_paginated_response(self, data):
+        # Views build the status/data envelope themselves, pagination included
+        return Response(data)
+
+
+class KeysetPaginationMixin:
+    """
+    Viewset mixin switching to KeysetPagination when the client asks for it.
+    Page number pagination stays the default.
+    """
+    keyset_ordering = ('-created_at', '-id')
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and KeysetPagination.is_requested(getattr(self, 'request', None)):
+            self._paginator = KeysetPagination(self.keyset_ordering)
+        return super().paginator
+
+    @property
+    def keyset_paginated(self):
+        return isinstance(self.paginator, KeysetPagination)
+
+    def get_pagination_meta(self):
+        if self.keyset_paginated:
+            return self.paginator.get_pagination_meta()
+        page = self.paginator.page
+        return {
+            'total': page.paginator.count,
+            'pages': page.paginator.num_pages,
+            'page': page.number,
+            'limit': self.paginator.page_size
+        }
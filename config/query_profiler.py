@@ -0,0 +1,247 @@
+"""
+Sampled per-request SQL profiling.
+
+For QUERY_PROFILER_SAMPLE_RATE of all requests, QueryProfilerMiddleware
+records the number of queries, their total time, the queries repeated within
+the request (the usual N+1 signature) and the wall time, keyed by the view
+that handled it. Samples go to an in-memory ring buffer of the last
+QUERY_PROFILER_BUFFER_SIZE requests of each process. Every few seconds a
+process publishes a per-view summary of its buffer to the shared cache; the
+admin endpoint and the query_profile management command merge those into a
+report of the heaviest views. With the default local memory cache only the
+serving process's own samples are visible.
+
+At a sample rate of 0 the middleware removes itself at startup, so switching
+it off costs nothing per request.
+"""
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_INTERVAL = 5  # seconds
+PUBLISH_TIMEOUT = 60 * 60 * 24
+PROCESSES_KEY = 'query_profiler:processes'
+MAX_PROCESSES = 256
+# Repeated queries listed per view in a report
+TOP_DUPLICATES = 3
+
+ORDERINGS = {
+    'queries': 'avg_queries',
+    'sql': 'avg_sql_ms',
+    'wall': 'avg_wall_ms',
+    'duplicates': 'avg_duplicates',
+    'requests': 'requests',
+}
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_samples = deque(maxlen=settings.QUERY_PROFILER_BUFFER_SIZE)
+_lock = threading.Lock()
+_last_published = 0.0
+
+
+def fingerprint(sql):
+    """The query with IN lists of any length folded together"""
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql.strip()))
+
+
+class QueryRecorder:
+    """execute_wrapper counting and timing the queries of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """{fingerprint: times run beyond the first} of queries run more than once"""
+        return {sql: count - 1 for sql, count in self.fingerprints.items() if count > 1}
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    name = f'{cls.__module__}.{cls.__name__}' if cls else f'{func.__module__}.{func.__qualname__}'
+    # ViewSets serve several actions from one class
+    action = (getattr(func, 'actions', None) or {}).get(request.method.lower())
+    return f'{name}.{action}' if action else name
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, get_response):
+        if settings.QUERY_PROFILER_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.QUERY_PROFILER_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_seconds = time.perf_counter() - started
+
+        duplicates = recorder.duplicates()
+        record({
+            'view': view_name(request),
+            'queries': recorder.count,
+            'sql_ms': recorder.seconds * 1000,
+            'wall_ms': wall_seconds * 1000,
+            'duplicates': sum(duplicates.values()),
+            'fingerprints': duplicates,
+        })
+        return response
+
+
+def record(sample):
+    global _last_published
+    with _lock:
+        _samples.append(sample)
+        now = time.monotonic()
+        due = now - _last_published >= PUBLISH_INTERVAL
+        if due:
+            _last_published = now
+    if due:
+        try:
+            publish()
+        except Exception as e:
+            # Samples stay in the buffer for the next attempt
+            logger.warning(f"Publishing query profile failed: {str(e)}")
+
+
+def summarize(samples):
+    """Per-view totals of `samples`; summaries of several processes merge()"""
+    views = {}
+    for sample in samples:
+        stats = views.get(sample['view'])
+        if stats is None:
+            stats = views[sample['view']] = {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0,
+                'wall_ms': 0.0, 'duplicates': 0, 'fingerprints': Counter()
+            }
+        stats['requests'] += 1
+        stats['queries'] += sample['queries']
+        stats['max_queries'] = max(stats['max_queries'], sample['queries'])
+        stats['sql_ms'] += sample['sql_ms']
+        stats['wall_ms'] += sample['wall_ms']
+        stats['duplicates'] += sample['duplicates']
+        stats['fingerprints'].update(sample['fingerprints'])
+    return views
+
+
+def merge(summaries):
+    merged = {}
+    for summary in summaries:
+        for view, stats in summary.items():
+            total = merged.get(view)
+            if total is None:
+                merged[view] = dict(stats, fingerprints=Counter(stats['fingerprints']))
+                continue
+            for field in ('requests', 'queries', 'sql_ms', 'wall_ms', 'duplicates'):
+                total[field] += stats[field]
+            total['max_queries'] = max(total['max_queries'], stats['max_queries'])
+            total['fingerprints'].update(stats['fingerprints'])
+    return merged
+
+
+def _process_key():
+    return f'query_profiler:{socket.gethostname()}:{os.getpid()}'
+
+
+def publish():
+    """Put this process's summary in the shared cache"""
+    with _lock:
+        samples = list(_samples)
+    key = _process_key()
+    cache.set(key, summarize(samples), PUBLISH_TIMEOUT)
+    processes = cache.get(PROCESSES_KEY) or []
+    if key not in processes:
+        cache.set(PROCESSES_KEY, (processes + [key])[-MAX_PROCESSES:], PUBLISH_TIMEOUT)
+
+
+def collect():
+    """Merged summary of every process that published one"""
+    return merge(cache.get_many(cache.get(PROCESSES_KEY) or []).values())
+
+
+def report(summary, order_by='queries', limit=20):
+    """The `limit` heaviest views of a summary by one of ORDERINGS"""
+    rows = []
+    for view, stats in summary.items():
+        requests = stats['requests']
+        rows.append({
+            'view': view,
+            'requests': requests,
+            'avg_queries': round(stats['queries'] / requests, 1),
+            'max_queries': stats['max_queries'],
+            'avg_sql_ms': round(stats['sql_ms'] / requests, 2),
+            'avg_wall_ms': round(stats['wall_ms'] / requests, 2),
+            'avg_duplicates': round(stats['duplicates'] / requests, 1),
+            'top_duplicates': [
+                {'sql': sql, 'count': count}
+                for sql, count in stats['fingerprints'].most_common(TOP_DUPLICATES)
+            ],
+        })
+    rows.sort(key=lambda row: row[ORDERINGS[order_by]], reverse=True)
+    return rows[:limit]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def query_profile(request):
+    """Heaviest views by SQL load across all processes (?order_by=queries|sql|wall|duplicates|requests&limit=20)"""
+    order_by = request.query_params.get('order_by', 'queries')
+    if order_by not in ORDERINGS:
+        return Response({
+            'status': 'error',
+            'message': f"order_by must be one of {', '.join(ORDERINGS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = max(1, int(request.query_params.get('limit', 20)))
+    except ValueError:
+        return Response({'status': 'error', 'message': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if _samples:
+        publish()
+    return Response({
+        'status': 'success',
+        'data': {
+            'sample_rate': settings.QUERY_PROFILER_SAMPLE_RATE,
+            'views': report(collect(), order_by, limit)
+        }
+    })
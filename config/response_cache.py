@@ -0,0 +1,77 @@
+"""
+Shared response caching for the public catalog endpoints.
+
+Every catalog keeps a version token in the shared cache and every cached
+response key embeds it, so invalidating a catalog is a single write that
+orphans all of its cached pages at once. Model signals bump the token once
+the change is committed; bumping it earlier would let a concurrent request
+cache the uncommitted state under the new token.
+"""
+import hashlib
+import logging
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+SPECIALTIES = 'specialties'
+INSTANT_PRICES = 'instant_prices'
+DOCTOR_DIRECTORY = 'doctor_directory'
+
+
+def _version_key(namespace):
+    return f"catalog:{namespace}:version"
+
+
+def catalog_version(namespace):
+    """Return the current version token of a catalog, creating it if missing"""
+    return cache.get_or_set(_version_key(namespace), uuid.uuid4().hex, None)
+
+
+def invalidate(*namespaces):
+    """Drop every cached response of the given catalogs"""
+    for namespace in namespaces:
+        cache.set(_version_key(namespace), uuid.uuid4().hex, None)
+        logger.debug(f"Invalidated cached {namespace} responses")
+
+
+def invalidate_on_commit(*namespaces):
+    """invalidate() once the current transaction commits; right away outside one"""
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def response_key(namespace, request):
+    """Cache key for one rendering of a catalog; pagination links depend on the full URL"""
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"catalog:{namespace}:{catalog_version(namespace)}:{url}"
+
+
+def cached_list(namespace, anonymous_only=False):
+    """
+    Serve a viewset `list` action from the shared cache.
+
+    Only successful responses are stored. With `anonymous_only` authenticated
+    requests bypass the cache, for lists whose content depends on the user.
+    """
+    def decorator(list_method):
+        @wraps(list_method)
+        def wrapper(self, request, *args, **kwargs):
+            if anonymous_only and request.user.is_authenticated:
+                return list_method(self, request, *args, **kwargs)
+
+            key = response_key(namespace, request)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = list_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
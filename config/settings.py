@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Trigram and full-text search lookups
     
     # Third party apps
     'rest_framework',
@@ -70,6 +71,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.query_profiler.QueryProfilerMiddleware',  # Inactive unless QUERY_PROFILER_SAMPLE_RATE > 0
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS middleware
     'django.middleware.common.CommonMiddleware',
@@ -115,6 +117,24 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared across workers when CACHE_URL points at Redis (e.g. redis://localhost:6379/1);
+# falls back to a per-process local memory cache for development and tests.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+CACHES['default']['KEY_PREFIX'] = 'alaqa'
+
+# Seconds a cached public catalog response may live; model signals invalidate earlier
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=60 * 60)
+
+# Share of requests whose SQL queries are profiled (config.query_profiler); 0 disables it
+QUERY_PROFILER_SAMPLE_RATE = env.float('QUERY_PROFILER_SAMPLE_RATE', default=0.0)
+# Profiled requests each process keeps
+QUERY_PROFILER_BUFFER_SIZE = env.int('QUERY_PROFILER_BUFFER_SIZE', default=2000)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -430,24 +450,72 @@ SECURE_SSL_REDIRECT = False  # Keep False for local development
 AGORA_APP_ID = env('AGORA_APP_ID', default='')
 AGORA_APP_CERTIFICATE = env('AGORA_APP_CERTIFICATE', default='')
 AGORA_WEBHOOK_SECRET = env('AGORA_WEBHOOK_SECRET', default='test_secret')  # For testing purposes
+# Seconds a worker trusts its Agora credentials snapshot before checking for rotation
+AGORA_CREDENTIALS_CHECK_INTERVAL = env.int('AGORA_CREDENTIALS_CHECK_INTERVAL', default=5)
+
+# Integration audit log buffering: rows are bulk inserted once this many are
+# queued or the oldest has waited this many seconds
+INTEGRATION_AUDIT_BATCH_SIZE = env.int('INTEGRATION_AUDIT_BATCH_SIZE', default=200)
+INTEGRATION_AUDIT_FLUSH_INTERVAL = env.int('INTEGRATION_AUDIT_FLUSH_INTERVAL', default=5)
 
 # Dreams SMS API Settings
 DREAMS_SMS_API_URL = env('DREAMS_SMS_API_URL', default='https://dreams.sa/api/sendsms/')
 DREAMS_SMS_USER = env('DREAMS_SMS_USER', default='Alaqa')
 DREAMS_SMS_SECRET_KEY = env('DREAMS_SMS_SECRET_KEY', default='97aca06a4fd54aeb571d0de1ecac4f84ee19d323d5b56fe0a74d7eb2bfc673fe')
 DREAMS_SMS_SENDER = env('DREAMS_SMS_SENDER', default='zuwara')
+# Connection pooling, retries and circuit breaking of the SMS gateway client
+SMS_GATEWAY_CONNECT_TIMEOUT = env.float('SMS_GATEWAY_CONNECT_TIMEOUT', default=3.05)
+SMS_GATEWAY_READ_TIMEOUT = env.float('SMS_GATEWAY_READ_TIMEOUT', default=5)
+SMS_GATEWAY_MAX_RETRIES = env.int('SMS_GATEWAY_MAX_RETRIES', default=2)
+SMS_GATEWAY_BACKOFF = env.float('SMS_GATEWAY_BACKOFF', default=0.5)
+SMS_GATEWAY_POOL_SIZE = env.int('SMS_GATEWAY_POOL_SIZE', default=10)
+# Consecutive provider failures that open the circuit, and seconds before a trial request
+SMS_CIRCUIT_FAILURE_THRESHOLD = env.int('SMS_CIRCUIT_FAILURE_THRESHOLD', default=5)
+SMS_CIRCUIT_RESET_TIMEOUT = env.int('SMS_CIRCUIT_RESET_TIMEOUT', default=30)
+
+# OTP Settings
+# Live codes are kept in the shared cache when one is configured, otherwise in the OTP table
+OTP_BACKEND = env(
+    'OTP_BACKEND',
+    default='otp.backends.CacheOTPBackend' if env('CACHE_URL', default='') else 'otp.backends.DatabaseOTPBackend'
+)
+OTP_TTL = env.int('OTP_TTL', default=60 * 60 * 24)
+OTP_MAX_ATTEMPTS = env.int('OTP_MAX_ATTEMPTS', default=3)
+# At most OTP_SEND_LIMIT codes are sent to one phone per OTP_SEND_WINDOW seconds
+OTP_SEND_LIMIT = env.int('OTP_SEND_LIMIT', default=5)
+OTP_SEND_WINDOW = env.int('OTP_SEND_WINDOW', default=60 * 60)
+# Also record codes issued by the cache backend in the OTP table
+OTP_AUDIT_TRAIL = env.bool('OTP_AUDIT_TRAIL', default=False)
+# Expired OTP rows are deleted this many seconds after expiry (doctors.cron.PurgeExpiredRegistrationsCronJob)
+OTP_RETENTION = env.int('OTP_RETENTION', default=60 * 60)
 
 # Email Settings
 EMAIL_BACKEND = 'sendgrid_backend.SendgridBackend'
 SENDGRID_API_KEY = env('SENDGRID_API_KEY', default='')
 DEFAULT_FROM_EMAIL = 'contact@alaqa.net'
 SENDGRID_SANDBOX_MODE_IN_DEBUG = False  # Set to False to send real emails in development
+# Keep-alive connections per process to the SendGrid API, and seconds per API call
+SENDGRID_POOL_SIZE = env.int('SENDGRID_POOL_SIZE', default=10)
+SENDGRID_TIMEOUT = env.int('SENDGRID_TIMEOUT', default=10)
 
 # Django Cron Settings
 CRON_CLASSES = [
     'appointments.cron.AutoCompleteAppointmentsCronJob',
+    'appointments.cron.DispatchNotificationsCronJob',
+    'video_calls.cron.PremintVideoTokensCronJob',
+    'appointments.cron.SendAppointmentRemindersCronJob',
+    'drugs.cron.RefreshDrugAutocompleteCronJob',
+    'doctors.cron.PurgeExpiredRegistrationsCronJob',
 ]
 
+# Memory-mapped drug autocomplete snapshots (drugs.autocomplete_index); local to each host
+DRUG_AUTOCOMPLETE_DIR = env('DRUG_AUTOCOMPLETE_DIR', default=os.path.join(BASE_DIR, 'var', 'drug_autocomplete'))
+
+# Appointment reminders go out this many minutes before slot_time
+APPOINTMENT_REMINDER_OFFSETS = [24 * 60, 15]
+# Reminders claimed per dispatch batch
+APPOINTMENT_REMINDER_BATCH_SIZE = env.int('APPOINTMENT_REMINDER_BATCH_SIZE', default=5000)
+
 # Cron Job Settings
 DJANGO_CRON_LOCK_BACKEND = 'django_cron.backends.lock.file.FileLock'
 DJANGO_CRON_LOCKFILE_PATH = os.path.join(BASE_DIR, 'cron_jobs.lock')
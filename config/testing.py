@@ -0,0 +1,13 @@
+"""Helpers shared by the apps' test suites"""
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+
+def use_media_root(test):
+    """Point MEDIA_ROOT at an empty directory for the duration of the test"""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    test.enterContext(override_settings(MEDIA_ROOT=media_root))
+    return media_root
@@ -22,6 +22,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from .query_profiler import query_profile
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Healthcare API",
@@ -48,6 +50,7 @@ api_v1_patterns = [
     path('', include('appointments.urls')),
     path('prescriptions/', include('prescriptions.urls')),
     path('services/', include('services.urls')),
+    path('query-profile/', query_profile, name='query-profile'),
 ]
 
 urlpatterns = [
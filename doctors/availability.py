@@ -0,0 +1,178 @@
+"""
+Doctor availability engine.
+
+Expands the weekly DoctorSchedule/TimeSlot templates into concrete bookable
+slots for a date range and removes every slot that overlaps a SCHEDULED
+appointment. All data for any number of doctors is loaded with two queries
+and the subtraction runs against a sorted interval index, so a 30 day window
+is computed in memory without touching the database per day or per slot.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import DoctorSchedule, TimeSlot
+
+# DAYS_OF_WEEK starts on monday, which matches date.weekday()
+DAY_NAMES = [day for day, _ in DoctorSchedule.DAYS_OF_WEEK]
+
+# Used when an appointment's duration cannot be parsed as minutes
+DEFAULT_APPOINTMENT_DURATION = 30
+
+# How far before the requested range to look for appointments that may
+# still be running when it starts
+APPOINTMENT_LOOKBACK = timedelta(days=1)
+
+
+def appointment_minutes(duration):
+    """Appointment.duration is stored as text, e.g. '30' or '30 min'"""
+    digits = ''.join(filter(str.isdigit, str(duration or '')))
+    return int(digits) if digits else DEFAULT_APPOINTMENT_DURATION
+
+
+class BusyIndex:
+    """
+    Sorted, merged busy intervals that can be probed with bisect
+    """
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def free_from(self, moment):
+        """Earliest instant at or after `moment` that is not busy"""
+        index = bisect_right(self.starts, moment) - 1
+        if index >= 0 and self.ends[index] > moment:
+            return self.ends[index]
+        return moment
+
+    def next_busy(self, moment):
+        """Start of the first busy interval beginning after `moment`"""
+        index = bisect_right(self.starts, moment)
+        if index < len(self.starts):
+            return self.starts[index]
+        return None
+
+
+def split_window(window_start, window_end, duration, busy, not_before=None):
+    """
+    Cut a free window into consecutive slots of `duration` skipping busy time
+    """
+    slots = []
+    cursor = window_start
+    if not_before is not None and cursor < not_before:
+        # Keep the slot grid anchored on the window start
+        steps = -(-(not_before - window_start) // duration)
+        cursor = window_start + steps * duration
+
+    while True:
+        cursor = busy.free_from(cursor)
+        slot_end = cursor + duration
+        if slot_end > window_end:
+            break
+        next_busy = busy.next_busy(cursor)
+        if next_busy is not None and next_busy < slot_end:
+            cursor = next_busy
+            continue
+        slots.append((cursor, slot_end))
+        cursor = slot_end
+    return slots
+
+
+def load_weekly_templates(doctor_ids=None):
+    """
+    Map doctor id -> day name -> sorted [(start_time, end_time)] in one query.
+    Without `doctor_ids` every approved doctor is loaded.
+    """
+    time_slots = TimeSlot.objects.filter(schedule__is_available=True)
+    if doctor_ids is None:
+        time_slots = time_slots.filter(schedule__doctor__status='approved')
+    else:
+        time_slots = time_slots.filter(schedule__doctor_id__in=doctor_ids)
+
+    templates = defaultdict(lambda: defaultdict(list))
+    for doctor_id, day, start_time, end_time in time_slots.values_list(
+        'schedule__doctor_id', 'schedule__day', 'start_time', 'end_time'
+    ).order_by('start_time'):
+        templates[doctor_id][day].append((start_time, end_time))
+    return templates
+
+
+def load_busy_indexes(doctor_ids, range_start, range_end):
+    """Map doctor id -> BusyIndex of SCHEDULED appointments in one query"""
+    from appointments.models import Appointment
+
+    intervals = defaultdict(list)
+    appointments = Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        status='SCHEDULED',
+        slot_time__gte=range_start - APPOINTMENT_LOOKBACK,
+        slot_time__lt=range_end
+    ).values_list('doctor_id', 'slot_time', 'duration')
+    for doctor_id, slot_time, duration in appointments:
+        intervals[doctor_id].append(
+            (slot_time, slot_time + timedelta(minutes=appointment_minutes(duration)))
+        )
+    return {doctor_id: BusyIndex(items) for doctor_id, items in intervals.items()}
+
+
+def expand_availability(template, busy, start_date, end_date, duration, now=None):
+    """
+    Expand one doctor's weekly template into [(date, [(start, end), ...])]
+    for every date between start_date and end_date inclusive
+    """
+    tz = timezone.get_current_timezone()
+    days = []
+    current = start_date
+    while current <= end_date:
+        slots = []
+        for start_time, end_time in template.get(DAY_NAMES[current.weekday()], ()):
+            window_start = timezone.make_aware(datetime.combine(current, start_time), tz)
+            window_end = timezone.make_aware(datetime.combine(current, end_time), tz)
+            if now is not None and window_end <= now:
+                continue
+            slots.extend(split_window(window_start, window_end, duration, busy, not_before=now))
+        days.append((current, slots))
+        current += timedelta(days=1)
+    return days
+
+
+def get_availability(start_date, end_date, duration_minutes, doctor_ids=None, now=None):
+    """
+    Bookable slots per doctor and day.
+
+    Returns {doctor_id: [(date, [(start, end), ...]), ...]} for the given
+    doctors, or for every approved doctor with working hours when
+    `doctor_ids` is None. Slots starting before `now` are left out.
+    """
+    if now is None:
+        now = timezone.now()
+    duration = timedelta(minutes=duration_minutes)
+
+    templates = load_weekly_templates(doctor_ids)
+
+    tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()), tz)
+    range_end = timezone.make_aware(
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time()), tz
+    )
+    busy_indexes = load_busy_indexes(list(templates), range_start, range_end) if templates else {}
+
+    result = {}
+    for doctor_id in (doctor_ids if doctor_ids is not None else templates):
+        result[doctor_id] = expand_availability(
+            templates.get(doctor_id, {}),
+            busy_indexes.get(doctor_id, BusyIndex()),
+            start_date,
+            end_date,
+            duration,
+            now=now
+        )
+    return result
@@ -0,0 +1,45 @@
+from django_cron import CronJobBase, Schedule
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+from otp.services import OTPService
+from .services import DoctorVerificationService
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeExpiredRegistrationsCronJob(CronJobBase):
+    """
+    Cron job that deletes expired or used doctor verifications with their
+    temp documents, orphaned temp files and expired OTP rows.
+    Everything is deleted in bounded batches; a run that is cut short is
+    finished by the next one.
+    """
+
+    # Run every hour
+    schedule = Schedule(run_every_mins=60)
+
+    code = 'doctors.purge_expired_registrations'  # Unique code
+
+    # Requests still working on a verification or file get this long to finish
+    GRACE_PERIOD = timedelta(hours=1)
+
+    def do(self):
+        """Execute the cron job."""
+        now = timezone.now()
+        verifications = DoctorVerificationService.purge_expired(now - self.GRACE_PERIOD)
+        orphans, orphan_bytes = DoctorVerificationService.remove_orphaned_files(now - self.GRACE_PERIOD)
+        otps = OTPService.purge_expired(now - timedelta(seconds=settings.OTP_RETENTION))
+
+        rows = dict(verifications['rows'], **{'otp.OTP': otps})
+        files = verifications['files'] + orphans
+        reclaimed = verifications['bytes'] + orphan_bytes
+        summary = ', '.join(f"{count} {label}" for label, count in sorted(rows.items()) if count) or 'no rows'
+
+        logger.info(
+            f"Purged {summary}; removed {files} files ({orphans} orphaned), "
+            f"reclaiming {reclaimed} bytes."
+        )
+        return f"Deleted {summary}. Removed {files} files, {reclaimed} bytes."
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0032_fix_doctor_creation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['created_at', 'id'], name='doctor_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-17 04:02
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0033_doctor_doctor_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDocumentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('license_document', 'License document'), ('qualification_document', 'Qualification document'), ('additional_documents', 'Additional documents')], max_length=30)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('size', models.PositiveBigIntegerField()),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('checksum', models.CharField(blank=True, help_text='SHA-256 the client expects, if given', max_length=64)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('file', models.FileField(blank=True, max_length=255, upload_to='')),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='document_uploads', to='doctors.doctor')),
+                ('verification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to='doctors.doctorverification')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
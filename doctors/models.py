@@ -91,6 +91,10 @@ class Doctor(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Doctor'
         verbose_name_plural = 'Doctors'
+        indexes = [
+            # Keyset pagination of the doctor list
+            models.Index(fields=['created_at', 'id'], name='doctor_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.license_number}"
@@ -144,6 +148,53 @@ class DoctorVerification(models.Model):
     def is_complete(self):
         return self.phone_verified  # Only check phone verification since email is always true
 
+class DoctorDocumentUpload(models.Model):
+    """
+    A registration document uploaded in chunks before registration is
+    completed (see doctors/uploads.py). Completing registration attaches the
+    stored file to the doctor by reference.
+    """
+    KIND_CHOICES = [
+        ('license_document', 'License document'),
+        ('qualification_document', 'Qualification document'),
+        ('additional_documents', 'Additional documents'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    verification = models.ForeignKey(
+        DoctorVerification,
+        on_delete=models.CASCADE,
+        related_name='document_uploads'
+    )
+    doctor = models.ForeignKey(
+        'Doctor',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='document_uploads'
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, help_text='SHA-256 the client expects, if given')
+    sha256 = models.CharField(max_length=64, blank=True)
+    file = models.FileField(max_length=255, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} upload for {self.verification.email}"
+
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+
 class DoctorBankDetails(models.Model):
     """
     Model for storing doctor bank details separately
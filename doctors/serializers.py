@@ -1,8 +1,10 @@
 from rest_framework import serializers
-from .models import Doctor, DoctorBankDetails, TimeSlot, DoctorSchedule, DoctorDurationPrice, PriceCategory, DoctorVerification
+from .models import Doctor, DoctorBankDetails, TimeSlot, DoctorSchedule, DoctorDurationPrice, PriceCategory, DoctorVerification, DoctorDocumentUpload
 from specialties.serializers import SpecialtySerializer
 from specialties.models import Specialty
+from services.images import ImageDerivativesField
 from django.utils import timezone
+from datetime import timedelta
 
 class TimeSlotSerializer(serializers.ModelSerializer):
     class Meta:
@@ -42,6 +44,7 @@ class DoctorSerializer(serializers.ModelSerializer):
     )
     bank_details = serializers.SerializerMethodField()
     photo = serializers.ImageField(required=False)
+    photo_derivatives = ImageDerivativesField(source='photo')
     schedules = DoctorScheduleSerializer(many=True, read_only=True)
     price_categories = PriceCategorySerializer(many=True, read_only=True)
 
@@ -51,8 +54,8 @@ class DoctorSerializer(serializers.ModelSerializer):
             'id', 'name_arabic', 'name', 'sex', 'email', 'phone',
             'experience', 'category', 'language_in_sessions', 'license_number',
             'specialities', 'speciality_ids', 'profile_arabic', 'profile_english',
-            'status', 'photo', 'bank_details', 'schedules', 'price_categories',
-            'created_at', 'updated_at'
+            'status', 'photo', 'photo_derivatives', 'bank_details', 'schedules',
+            'price_categories', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'status', 'created_at', 'updated_at']
 
@@ -420,6 +423,10 @@ class DoctorRegistrationCompleteSerializer(serializers.ModelSerializer):
     experience = serializers.IntegerField(required=True, min_value=0)
     password = serializers.CharField(write_only=True, required=True)
     confirm_password = serializers.CharField(write_only=True, required=True)
+    # Documents are uploaded beforehand through the chunked upload API
+    license_document_upload = serializers.UUIDField(required=False)
+    qualification_document_upload = serializers.UUIDField(required=False)
+    additional_documents_upload = serializers.UUIDField(required=False)
 
     class Meta:
         model = Doctor
@@ -427,7 +434,9 @@ class DoctorRegistrationCompleteSerializer(serializers.ModelSerializer):
             'name_arabic', 'name', 'sex', 'experience', 'category',
             'language_in_sessions', 'license_number', 'specialities',
             'profile_arabic', 'profile_english', 'photo', 'verification_id',
-            'bank_details', 'password', 'confirm_password'
+            'bank_details', 'password', 'confirm_password',
+            'license_document_upload', 'qualification_document_upload',
+            'additional_documents_upload'
         ]
 
     def to_internal_value(self, data):
@@ -505,9 +514,33 @@ class DoctorRegistrationCompleteSerializer(serializers.ModelSerializer):
         # Add email and phone from verification
         data['email'] = verification.email
         data['phone'] = verification.phone
+
+        data['document_uploads'] = self.validate_document_uploads(data, verification)
         
         return data
 
+    def validate_document_uploads(self, data, verification):
+        """Completed uploads of this verification referenced by the request, keyed by kind"""
+        requested = {}
+        for kind, _ in DoctorDocumentUpload.KIND_CHOICES:
+            upload_id = data.pop(f'{kind}_upload', None)
+            if upload_id:
+                requested[kind] = upload_id
+        if not requested:
+            return {}
+
+        uploads = DoctorDocumentUpload.objects.in_bulk(requested.values())
+        errors = {}
+        for kind, upload_id in requested.items():
+            upload = uploads.get(upload_id)
+            if upload is None or upload.verification_id != verification.id or upload.kind != kind:
+                errors[f'{kind}_upload'] = "Unknown upload"
+            elif not upload.is_complete:
+                errors[f'{kind}_upload'] = "Upload is not complete"
+        if errors:
+            raise serializers.ValidationError(errors)
+        return {kind: uploads[upload_id] for kind, upload_id in requested.items()}
+
     def create(self, validated_data):
         """Create doctor profile and user account"""
         # Remove verification ID and passwords from validated data
@@ -520,9 +553,18 @@ class DoctorRegistrationCompleteSerializer(serializers.ModelSerializer):
         
         # Get bank details and remove from validated data
         bank_details = validated_data.pop('bank_details')
+
+        # Uploaded documents are already in storage; the doctor only references them
+        document_uploads = validated_data.pop('document_uploads', {})
+        for kind, upload in document_uploads.items():
+            validated_data[kind] = upload.file.name
         
         # Create doctor
         doctor = Doctor.objects.create(**validated_data)
+        if document_uploads:
+            DoctorDocumentUpload.objects.filter(
+                id__in=[upload.id for upload in document_uploads.values()]
+            ).update(doctor=doctor)
         
         # Set specialities
         doctor.specialities.set(specialities)
@@ -550,6 +592,37 @@ class DoctorRegistrationCompleteSerializer(serializers.ModelSerializer):
         
         return doctor
 
+class DoctorDocumentUploadSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(source='is_complete', read_only=True)
+
+    class Meta:
+        model = DoctorDocumentUpload
+        fields = [
+            'id', 'kind', 'filename', 'content_type', 'size', 'offset',
+            'complete', 'sha256', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+class DoctorDocumentUploadStartSerializer(serializers.Serializer):
+    """Declares a registration document before its chunks are sent"""
+    verification_id = serializers.UUIDField()
+    kind = serializers.ChoiceField(choices=DoctorDocumentUpload.KIND_CHOICES)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True, default='')
+
+    def validate_verification_id(self, value):
+        try:
+            verification = DoctorVerification.objects.get(id=value, is_used=False)
+        except DoctorVerification.DoesNotExist:
+            raise serializers.ValidationError("Invalid or used verification ID")
+        if not verification.phone_verified:
+            raise serializers.ValidationError("Phone number not verified")
+        if verification.is_expired:
+            raise serializers.ValidationError("Verification has expired")
+        return verification
+
 class DoctorRegistrationVerifySerializer(serializers.Serializer):
     """Serializer for verifying doctor registration"""
     verification_id = serializers.UUIDField()
@@ -569,83 +642,43 @@ class DoctorRegistrationVerifySerializer(serializers.Serializer):
                 raise serializers.ValidationError({
                     "verification_id": "Verification has expired"
                 })
-            
-            # Get and verify OTP
-            from otp.models import OTP
-            
-            # If code is 000000, always succeed
-            if data['sms_code'] == '000000':
-                try:
-                    otp = OTP.objects.filter(
-                        phone_number=verification.phone,
-                        is_verified=False,
-                        expires_at__gt=timezone.now()
-                    ).latest('created_at')
-                except OTP.DoesNotExist:
-                    # Create a new OTP if none exists
-                    otp = OTP.objects.create(
-                        phone_number=verification.phone,
-                        otp_code='000000',
-                        is_verified=True,
-                        expires_at=timezone.now() + timezone.timedelta(days=1)
-                    )
-                
-                # Mark as verified
-                otp.is_verified = True
-                otp.save()
-                
-                # Mark verification as phone verified
-                verification.phone_verified = True
-                verification.save()
-                
-                data['verification'] = verification
-                data['otp'] = otp
-                return data
-            
-            # Normal verification flow for other codes
-            try:
-                otp = OTP.objects.filter(
-                    phone_number=verification.phone,
-                    is_verified=False,
-                    expires_at__gt=timezone.now()
-                ).latest('created_at')
-                
-                if otp.otp_code != data['sms_code']:
-                    otp.attempts += 1
-                    otp.save()
-                    raise serializers.ValidationError({
-                        "sms_code": "Invalid verification code"
-                    })
-                
-                if otp.is_expired:
-                    raise serializers.ValidationError({
-                        "sms_code": "OTP has expired"
-                    })
-                
-                if otp.attempts >= 3:
-                    raise serializers.ValidationError({
-                        "sms_code": "Maximum verification attempts exceeded"
-                    })
-                
-                # Mark OTP as verified
-                otp.is_verified = True
-                otp.save()
-                
-                # Mark verification as phone verified
-                verification.phone_verified = True
-                verification.save()
-                
-            except OTP.DoesNotExist:
-                raise serializers.ValidationError({
-                    "sms_code": "No valid OTP found"
-                })
-            
+
             data['verification'] = verification
-            data['otp'] = otp
             
         except DoctorVerification.DoesNotExist:
             raise serializers.ValidationError({
                 "verification_id": "Invalid or expired verification"
             })
             
-        return data
\ No newline at end of file
+        return data
+
+
+class DoctorAvailabilityQuerySerializer(serializers.Serializer):
+    """Validate the from/to/duration query parameters of the availability endpoints"""
+    MAX_DAYS = 31
+
+    from_date = serializers.DateField(required=False)
+    to_date = serializers.DateField(required=False)
+    duration = serializers.IntegerField(required=False, default=30)
+
+    def validate_duration(self, value):
+        if value < 5 or value % 5 != 0:
+            raise serializers.ValidationError("Duration must be at least 5 minutes and in increments of 5 minutes")
+        return value
+
+    def validate(self, data):
+        from_date = data.get('from_date') or timezone.localdate()
+        to_date = data.get('to_date') or from_date + timedelta(days=6)
+
+        if to_date < from_date:
+            raise serializers.ValidationError({
+                'to': "'to' must not be before 'from'"
+            })
+        if (to_date - from_date).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({
+                'to': f"The requested range cannot exceed {self.MAX_DAYS} days"
+            })
+
+        data['from_date'] = from_date
+        data['to_date'] = to_date
+        return data
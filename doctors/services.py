@@ -1,11 +1,57 @@
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from otp.services import OTPService
 from django.core.files.storage import default_storage
 
+from .uploads import PART_DIR
+
 logger = logging.getLogger(__name__)
 
+# File fields of DoctorVerification holding documents uploaded before registration completes
+VERIFICATION_FILE_FIELDS = ('license_document', 'qualification_document')
+# Removing a file is a filesystem round trip each; a few run at once
+FILE_REMOVAL_WORKERS = 8
+
+
+def _remove_file(path):
+    """Bytes reclaimed by removing `path`, None if it could not be removed"""
+    try:
+        size = os.stat(path).st_size
+        os.unlink(path)
+        return size
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.error(f"Error removing {path}: {str(e)}")
+        return None
+
+
+def remove_files(paths):
+    """Remove files in parallel; returns (files removed, bytes reclaimed)"""
+    paths = list(paths)
+    if not paths:
+        return 0, 0
+    with ThreadPoolExecutor(max_workers=min(FILE_REMOVAL_WORKERS, len(paths))) as pool:
+        sizes = [size for size in pool.map(_remove_file, paths) if size is not None]
+    return len(sizes), sum(sizes)
+
+
+def _stale_files(directory, cutoff, is_orphan):
+    """Paths of files in MEDIA_ROOT/`directory` last modified before `cutoff` for which is_orphan(name)"""
+    try:
+        entries = list(os.scandir(os.path.join(settings.MEDIA_ROOT, directory)))
+    except FileNotFoundError:
+        return
+    timestamp = cutoff.timestamp()
+    for entry in entries:
+        if entry.is_file() and entry.stat().st_mtime < timestamp and is_orphan(entry.name):
+            yield entry.path
+
 class DoctorVerificationService:
     @staticmethod
     def cleanup_uploaded_files(verification):
@@ -20,6 +66,61 @@ class DoctorVerificationService:
         except Exception as e:
             logger.error(f"[DOCTOR_DEBUG] Error cleaning up files: {str(e)}")
 
+    @staticmethod
+    def purge_expired(cutoff, batch_size=500):
+        """
+        Delete verifications that expired, or were used, before `cutoff` in
+        batches of `batch_size`, then the documents they held. Their chunked
+        uploads go with them (see DocumentUploadService.discard_files).
+        Returns {'rows': {model label: rows deleted}, 'files': n, 'bytes': n}.
+        """
+        from .models import DoctorVerification
+
+        stale = DoctorVerification.objects.filter(
+            Q(expires_at__lt=cutoff) | Q(is_used=True, created_at__lt=cutoff)
+        ).order_by()
+        totals = {'rows': {}, 'files': 0, 'bytes': 0}
+        while True:
+            batch = list(stale.values_list('id', *VERIFICATION_FILE_FIELDS)[:batch_size])
+            if not batch:
+                return totals
+
+            with transaction.atomic():
+                _, deleted = DoctorVerification.objects.filter(id__in=[row[0] for row in batch]).delete()
+            for label, count in deleted.items():
+                totals['rows'][label] = totals['rows'].get(label, 0) + count
+
+            # Only once the rows are gone, so a failed batch never points at missing files
+            files, reclaimed = remove_files(
+                default_storage.path(name) for row in batch for name in row[1:] if name
+            )
+            totals['files'] += files
+            totals['bytes'] += reclaimed
+
+    @staticmethod
+    def remove_orphaned_files(cutoff):
+        """
+        Remove registration temp files last modified before `cutoff` that no
+        verification or unfinished upload refers to, e.g. left behind by a
+        request that failed halfway. Returns (files removed, bytes reclaimed).
+        """
+        from .models import DoctorDocumentUpload, DoctorVerification
+
+        referenced = set()
+        for names in DoctorVerification.objects.values_list(*VERIFICATION_FILE_FIELDS).iterator():
+            referenced.update(name for name in names if name)
+        parts = {
+            f'{upload_id}.part'
+            for upload_id in DoctorDocumentUpload.objects.filter(completed_at__isnull=True).values_list('id', flat=True)
+        }
+
+        orphans = []
+        for field in VERIFICATION_FILE_FIELDS:
+            upload_to = DoctorVerification._meta.get_field(field).upload_to
+            orphans += _stale_files(upload_to, cutoff, lambda name: f'{upload_to}{name}' not in referenced)
+        orphans += _stale_files(PART_DIR, cutoff, lambda name: name not in parts)
+        return remove_files(orphans)
+
     @staticmethod
     def send_verification_codes(email, phone, registration_data=None):
         """Send verification codes via SMS only"""
@@ -0,0 +1,43 @@
+import copy
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from config.response_cache import DOCTOR_DIRECTORY, invalidate_on_commit
+from .models import (
+    Doctor, DoctorBankDetails, DoctorDocumentUpload, DoctorDurationPrice, DoctorSchedule,
+    PriceCategory, TimeSlot
+)
+from .uploads import DocumentUploadService
+
+# Everything DoctorSerializer renders in the public directory
+DIRECTORY_MODELS = (
+    Doctor, DoctorBankDetails, DoctorSchedule, TimeSlot, PriceCategory, DoctorDurationPrice
+)
+
+
+def handle_directory_change(sender, **kwargs):
+    """Invalidate the cached doctor directory when a rendered model changes"""
+    invalidate_on_commit(DOCTOR_DIRECTORY)
+
+
+for model in DIRECTORY_MODELS:
+    post_save.connect(handle_directory_change, sender=model)
+    post_delete.connect(handle_directory_change, sender=model)
+
+
+@receiver(m2m_changed, sender=Doctor.specialities.through)
+def handle_doctor_specialities_change(sender, action, **kwargs):
+    """Invalidate the cached doctor directory when a doctor's specialities change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_on_commit(DOCTOR_DIRECTORY)
+
+
+@receiver(post_delete, sender=DoctorDocumentUpload)
+def handle_document_upload_deleted(sender, instance, **kwargs):
+    """Abandoned uploads (e.g. of an expired verification) leave no files behind"""
+    # A rolled back delete keeps the row, so it must keep its files too. The
+    # collector clears the instance's pk once the delete is done, so keep a copy
+    upload = copy.copy(instance)
+    transaction.on_commit(lambda: DocumentUploadService.discard_files(upload))
@@ -1,3 +1,587 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from appointments.models import Appointment
+from config.testing import use_media_root
+from otp.models import OTP
+from otp.services import OTPService
+from specialties.models import Specialty
+from . import uploads
+from .availability import BusyIndex, split_window, get_availability
+from .cron import PurgeExpiredRegistrationsCronJob
+from .models import (
+    Doctor, DoctorBankDetails, DoctorDocumentUpload, DoctorSchedule, DoctorVerification, TimeSlot,
+    PriceCategory, DoctorDurationPrice
+)
+
+
+class DoctorDirectoryQueryCountTests(APITestCase):
+    """The public doctor directory must not issue queries per doctor"""
+
+    url = '/api/v1/doctors/'
+
+    def setUp(self):
+        cache.clear()
+        self.specialty = Specialty.objects.create(
+            title='Cardiology',
+            title_ar='أمراض القلب',
+            icon='heart',
+            background_color='#ffffff',
+            color_class='bg-primary',
+            description='Heart care',
+            description_ar='رعاية القلب',
+            total_time_call=30,
+            warning_time_call=5,
+            alert_time_call=2
+        )
+
+    def create_doctors(self, count):
+        for index in range(Doctor.objects.count(), Doctor.objects.count() + count):
+            doctor = Doctor.objects.create(
+                name=f'Dr. Test {index}',
+                name_arabic=f'د. اختبار {index}',
+                sex='male',
+                email=f'doctor{index}@test.com',
+                phone=f'+96650000{index:04d}',
+                experience='10 years',
+                category='consultant',
+                language_in_sessions='english',
+                license_number=f'LIC{index:06d}',
+                profile_arabic='نبذة عن الطبيب',
+                profile_english='Doctor profile',
+                status='approved'
+            )
+            doctor.specialities.add(self.specialty)
+            DoctorBankDetails.objects.create(
+                doctor=doctor,
+                bank_name='Test Bank',
+                account_holder_name=doctor.name,
+                account_number='12345678',
+                iban_number='SA0380000000608010167519',
+                swift_code='RJHISARI'
+            )
+            for day in ['sunday', 'monday']:
+                schedule = DoctorSchedule.objects.create(doctor=doctor, day=day)
+                TimeSlot.objects.create(schedule=schedule, start_time=time(9), end_time=time(12))
+                TimeSlot.objects.create(schedule=schedule, start_time=time(13), end_time=time(17))
+            category = PriceCategory.objects.create(doctor=doctor, type='initial_consultation')
+            DoctorDurationPrice.objects.create(category=category, duration=15, price=Decimal('100.00'))
+            DoctorDurationPrice.objects.create(category=category, duration=30, price=Decimal('180.00'))
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data['results']['data']['doctors']
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        self.create_doctors(1)
+        small_page_queries, doctors = self.count_list_queries()
+        self.assertEqual(len(doctors), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_doctors(9)
+        full_page_queries, doctors = self.count_list_queries()
+        self.assertEqual(len(doctors), 10)
+
+        self.assertEqual(small_page_queries, full_page_queries)
+
+    def test_list_query_budget(self):
+        self.create_doctors(10)
+
+        # count, doctors + bank details, specialities, schedules,
+        # time slots, price categories, duration prices
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+
+        doctor = response.data['results']['data']['doctors'][0]
+        self.assertEqual(len(doctor['specialities']), 1)
+        self.assertEqual(len(doctor['schedules']), 2)
+        self.assertEqual(len(doctor['schedules'][0]['time_slots']), 2)
+        self.assertEqual(len(doctor['price_categories'][0]['entries']), 2)
+        self.assertEqual(doctor['bank_details']['bank_name'], 'Test Bank')
+
+    def test_repeat_anonymous_list_skips_database(self):
+        self.create_doctors(2)
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.data, first.data)
+
+    def test_directory_changes_invalidate_cached_list(self):
+        self.create_doctors(1)
+        self.client.get(self.url)
+
+        slot = TimeSlot.objects.order_by('start_time').first()
+        slot.start_time = time(8)
+        with self.captureOnCommitCallbacks(execute=True):
+            slot.save()
+        _, doctors = self.count_list_queries()
+        starts = [
+            item['start_time']
+            for schedule in doctors[0]['schedules']
+            for item in schedule['time_slots']
+        ]
+        self.assertIn('08:00:00', starts)
+
+        self.specialty.title = 'Cardiac Surgery'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.specialty.save()
+        _, doctors = self.count_list_queries()
+        self.assertEqual(doctors[0]['specialities'][0]['title'], 'Cardiac Surgery')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Doctor.objects.get().specialities.clear()
+        _, doctors = self.count_list_queries()
+        self.assertEqual(doctors[0]['specialities'], [])
+
+    def test_setup_doctors_invalidates_cached_list(self):
+        self.create_doctors(1)
+        Doctor.objects.update(status='pending')
+        self.assertEqual(self.count_list_queries()[1], [])
+
+        with patch('builtins.print'):
+            call_command('setup_doctors')
+
+        self.assertEqual(len(self.count_list_queries()[1]), 1)
+
+    def test_retrieve_query_budget(self):
+        self.create_doctors(1)
+        doctor = Doctor.objects.get()
+
+        with self.assertNumQueries(6):
+            response = self.client.get(f'{self.url}{doctor.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']['doctor']['schedules']), 2)
+
+
+class DoctorAvailabilityTests(APITestCase):
+    """Weekly templates expanded into bookable slots minus scheduled appointments"""
+
+    def setUp(self):
+        # A monday far enough in the future that no slot is in the past
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.doctor = self.create_doctor('first', 'approved')
+        self.other_doctor = self.create_doctor('second', 'approved')
+        self.pending_doctor = self.create_doctor('third', 'pending')
+
+    def create_doctor(self, suffix, doctor_status):
+        doctor = Doctor.objects.create(
+            name=f'Dr. {suffix}',
+            name_arabic=f'د. {suffix}',
+            sex='female',
+            email=f'{suffix}@test.com',
+            phone='+966500000000',
+            experience='5 years',
+            category='specialist',
+            language_in_sessions='both',
+            license_number=f'LIC-{suffix}',
+            profile_arabic='نبذة',
+            profile_english='Profile',
+            status=doctor_status
+        )
+        schedule = DoctorSchedule.objects.create(doctor=doctor, day='monday')
+        TimeSlot.objects.create(schedule=schedule, start_time=time(9), end_time=time(11))
+        DoctorSchedule.objects.create(doctor=doctor, day='tuesday', is_available=False)
+        return doctor
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.monday, time(hour, minute)))
+
+    def book(self, doctor, slot_time, appointment_status='SCHEDULED', duration='30'):
+        return Appointment.objects.create(
+            doctor=doctor,
+            specialist_category='General',
+            gender='F',
+            duration=duration,
+            language='arabic',
+            phone_number='966500000000',
+            slot_time=slot_time,
+            status=appointment_status
+        )
+
+    def test_split_window_skips_busy_intervals(self):
+        busy = BusyIndex([(self.at(9, 30), self.at(10)), (self.at(9, 45), self.at(10, 10))])
+        slots = split_window(self.at(9), self.at(11), timedelta(minutes=30), busy)
+        self.assertEqual(slots, [
+            (self.at(9), self.at(9, 30)),
+            (self.at(10, 10), self.at(10, 40)),
+        ])
+
+    def test_split_window_drops_past_slots_on_grid(self):
+        slots = split_window(
+            self.at(9), self.at(11), timedelta(minutes=30), BusyIndex(), not_before=self.at(9, 10)
+        )
+        self.assertEqual([start for start, _ in slots], [self.at(9, 30), self.at(10), self.at(10, 30)])
+
+    def test_scheduled_appointments_are_subtracted(self):
+        self.book(self.doctor, self.at(9, 30))
+        self.book(self.doctor, self.at(10), appointment_status='CANCELLED')
+
+        availability = get_availability(self.monday, self.monday, 30, doctor_ids=[self.doctor.pk])
+
+        day, slots = availability[self.doctor.pk][0]
+        self.assertEqual(day, self.monday)
+        self.assertEqual([start for start, _ in slots], [self.at(9), self.at(10), self.at(10, 30)])
+
+    def test_only_template_weekdays_have_slots(self):
+        availability = get_availability(
+            self.monday, self.monday + timedelta(days=6), 60, doctor_ids=[self.doctor.pk]
+        )
+        slot_counts = {day.weekday(): len(slots) for day, slots in availability[self.doctor.pk]}
+        self.assertEqual(slot_counts, {0: 2, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0, 6: 0})
+
+    def test_availability_endpoint(self):
+        self.book(self.doctor, self.at(10))
+
+        response = self.client.get(f'/api/v1/doctors/{self.doctor.id}/availability/', {
+            'from': self.monday.isoformat(),
+            'to': (self.monday + timedelta(days=1)).isoformat(),
+            'duration': 60,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        days = response.data['data']['days']
+        self.assertEqual([item['date'] for item in days], [
+            self.monday.isoformat(), (self.monday + timedelta(days=1)).isoformat()
+        ])
+        self.assertEqual(days[0]['slots'], [{'start': self.at(9).isoformat(), 'end': self.at(10).isoformat()}])
+        self.assertEqual(days[1]['slots'], [])
+
+    def test_availability_endpoint_validates_range(self):
+        response = self.client.get(f'/api/v1/doctors/{self.doctor.id}/availability/', {
+            'from': self.monday.isoformat(),
+            'to': (self.monday + timedelta(days=40)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(f'/api/v1/doctors/{self.doctor.id}/availability/', {'duration': 7})
+        self.assertEqual(response.status_code, 400)
+
+    def test_availability_hides_unapproved_doctors_from_anonymous_users(self):
+        response = self.client.get(f'/api/v1/doctors/{self.pending_doctor.id}/availability/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_availability_uses_two_queries(self):
+        self.book(self.other_doctor, self.at(9))
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/doctors/availability/', {
+                'from': self.monday.isoformat(),
+                'to': (self.monday + timedelta(days=29)).isoformat(),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        doctors = {item['doctor_id']: item['days'] for item in response.data['data']['doctors']}
+        self.assertEqual(set(doctors), {str(self.doctor.id), str(self.other_doctor.id)})
+        self.assertEqual(len(doctors[str(self.doctor.id)]), 30)
+        self.assertEqual(len(doctors[str(self.doctor.id)][0]['slots']), 4)
+        self.assertEqual(len(doctors[str(self.other_doctor.id)][0]['slots']), 3)
+
+
+@override_settings(OTP_BACKEND='otp.backends.DatabaseOTPBackend')
+class DoctorRegistrationVerifyTests(APITestCase):
+    url = '/api/v1/doctors/register/verify/'
+
+    def setUp(self):
+        self.verification = DoctorVerification.objects.create(
+            email='verify@test.com',
+            phone='+966500000002',
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.otp = OTP.objects.create(
+            phone_number='966500000002',
+            otp_code='123456',
+            expires_at=timezone.now() + timedelta(minutes=5)
+        )
+
+    def verify(self, code):
+        return self.client.post(self.url, {
+            'verification_id': str(self.verification.id),
+            'email': self.verification.email,
+            'sms_code': code
+        }, format='json')
+
+    def test_wrong_code_reports_attempts_remaining(self):
+        response = self.verify('654321')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Invalid verification code')
+        self.assertEqual(response.data['data']['attempts_remaining'], 2)
+
+        response = self.verify('123456')
+        self.assertEqual(response.status_code, 200)
+        self.verification.refresh_from_db()
+        self.assertTrue(self.verification.phone_verified)
+
+
+class DoctorDocumentUploadTests(APITestCase):
+    url = '/api/v1/doctors/register/uploads/'
+
+    def setUp(self):
+        use_media_root(self)
+        self.verification = DoctorVerification.objects.create(
+            email='upload@test.com',
+            phone='+966500000001',
+            phone_verified=True,
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.content = os.urandom(300 * 1024)
+
+    def start(self, kind='license_document', **extra):
+        response = self.client.post(self.url, {
+            'verification_id': str(self.verification.id),
+            'kind': kind,
+            'filename': '../scanned license.pdf',
+            'size': len(self.content),
+            'content_type': 'application/pdf',
+            **extra
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['data']['id']
+
+    def send(self, upload_id, offset, data, checksum=None):
+        headers = {'Upload-Offset': str(offset)}
+        if checksum:
+            headers['Upload-Checksum'] = checksum
+        return self.client.patch(
+            f'{self.url}{upload_id}/', data, content_type='application/offset+octet-stream', headers=headers
+        )
+
+    def upload_all(self, upload_id, chunk_size=128 * 1024):
+        response = None
+        for offset in range(0, len(self.content), chunk_size):
+            chunk = self.content[offset:offset + chunk_size]
+            response = self.send(upload_id, offset, chunk)
+            self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def test_chunks_are_assembled_into_storage_with_checksum(self):
+        upload_id = self.start(checksum=hashlib.sha256(self.content).hexdigest())
+
+        response = self.upload_all(upload_id)
+
+        data = response.data['data']
+        self.assertTrue(data['complete'])
+        self.assertEqual(data['offset'], len(self.content))
+        self.assertEqual(data['sha256'], hashlib.sha256(self.content).hexdigest())
+        upload = DoctorDocumentUpload.objects.get(id=upload_id)
+        self.assertTrue(upload.file.name.startswith('doctors/licenses/'))
+        self.assertNotIn('..', upload.file.name)
+        with default_storage.open(upload.file.name) as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertFalse(os.path.exists(uploads.part_path(upload)))
+
+    def test_resumes_at_the_stored_offset(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.content[:100 * 1024])
+
+        # A retry of a chunk already stored is refused with the offset to resume at
+        response = self.send(upload_id, 0, self.content[:100 * 1024])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['data']['offset'], 100 * 1024)
+
+        status_response = self.client.get(f'{self.url}{upload_id}/')
+        self.assertEqual(status_response['Upload-Offset'], str(100 * 1024))
+
+        # Another worker picks up without this process's running digest
+        uploads._digests.clear()
+        response = self.send(upload_id, 100 * 1024, self.content[100 * 1024:])
+        self.assertEqual(response.data['data']['sha256'], hashlib.sha256(self.content).hexdigest())
+
+    def test_corrupt_chunk_is_rejected_and_can_be_resent(self):
+        upload_id = self.start()
+        chunk = self.content[:64 * 1024]
+        wrong = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        right = base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+
+        response = self.send(upload_id, 0, chunk, checksum=f'sha256 {wrong}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DoctorDocumentUpload.objects.get(id=upload_id).offset, 0)
+
+        response = self.send(upload_id, 0, chunk, checksum=f'sha256 {right}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['offset'], len(chunk))
+
+    def test_declared_checksum_mismatch_restarts_the_upload(self):
+        upload_id = self.start(checksum='0' * 64)
+
+        response = self.send(upload_id, 0, self.content)
+
+        self.assertEqual(response.status_code, 400)
+        upload = DoctorDocumentUpload.objects.get(id=upload_id)
+        self.assertEqual(upload.offset, 0)
+        self.assertFalse(upload.is_complete)
+
+    def test_chunk_past_declared_size_is_refused(self):
+        upload_id = self.start()
+
+        response = self.send(upload_id, 0, self.content + b'extra')
+
+        self.assertEqual(response.status_code, 413)
+
+    def test_requires_a_verified_phone(self):
+        self.verification.phone_verified = False
+        self.verification.save()
+
+        response = self.client.post(self.url, {
+            'verification_id': str(self.verification.id),
+            'kind': 'license_document',
+            'filename': 'license.pdf',
+            'size': 10
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_complete_registration_references_uploads(self):
+        license_id = self.start()
+        self.upload_all(license_id)
+        qualification_id = self.start(kind='qualification_document')
+        self.upload_all(qualification_id)
+        specialty = Specialty.objects.create(
+            title='Dermatology',
+            title_ar='الأمراض الجلدية',
+            icon='skin',
+            background_color='#ffffff',
+            color_class='bg-primary',
+            description='Skin',
+            description_ar='الجلد',
+            total_time_call=30,
+            warning_time_call=5,
+            alert_time_call=2
+        )
+
+        response = self.client.post('/api/v1/doctors/register/complete/', {
+            'verification_id': str(self.verification.id),
+            'name': 'Dr. Upload',
+            'name_arabic': 'د. رفع',
+            'sex': 'female',
+            'experience': 5,
+            'category': 'specialist',
+            'language_in_sessions': 'both',
+            'license_number': 'UPL0001',
+            'specialities': json.dumps([str(specialty.id)]),
+            'profile_arabic': 'نبذة',
+            'profile_english': 'Profile',
+            'password': 'Secret-pass-1',
+            'confirm_password': 'Secret-pass-1',
+            'bank_name': 'Bank',
+            'account_holder_name': 'Dr. Upload',
+            'account_number': '12345678',
+            'iban_number': 'SA0000000000000000000000',
+            'swift_code': 'BANKSARI',
+            'license_document_upload': license_id,
+            'qualification_document_upload': qualification_id
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        doctor = Doctor.objects.get(email='upload@test.com')
+        upload = DoctorDocumentUpload.objects.get(id=license_id)
+        self.assertEqual(doctor.license_document.name, upload.file.name)
+        self.assertEqual(upload.doctor, doctor)
+        self.assertEqual(doctor.qualification_document.name, DoctorDocumentUpload.objects.get(id=qualification_id).file.name)
+
+    def test_deleting_the_verification_removes_unattached_files(self):
+        upload_id = self.start()
+        self.upload_all(upload_id)
+        name = DoctorDocumentUpload.objects.get(id=upload_id).file.name
+        partial_id = self.start(kind='qualification_document')
+        partial_path = uploads.part_path(DoctorDocumentUpload.objects.get(id=partial_id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.verification.delete()
+
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(os.path.exists(partial_path))
+
+
+class PurgeExpiredRegistrationsTests(TestCase):
+    def setUp(self):
+        use_media_root(self)
+
+    def create_verification(self, expires_in, is_used=False, document=b'%PDF-1.4 license'):
+        verification = DoctorVerification(
+            email='purge@test.com',
+            phone='+966500000002',
+            is_used=is_used,
+            expires_at=timezone.now() + expires_in
+        )
+        verification.license_document.save('license.pdf', ContentFile(document), save=False)
+        verification.save()
+        return verification
+
+    def store(self, name, content, age=timedelta(hours=2)):
+        name = default_storage.save(name, ContentFile(content))
+        modified = (timezone.now() - age).timestamp()
+        os.utime(default_storage.path(name), (modified, modified))
+        return default_storage.path(name)
+
+    def create_otp(self, expires_in):
+        return OTP.objects.create(
+            phone_number='+966500000002',
+            otp_code='123456',
+            expires_at=timezone.now() + expires_in
+        )
+
+    def test_purges_expired_rows_and_their_files(self):
+        expired = self.create_verification(-timedelta(days=1), document=b'x' * 1000)
+        used = self.create_verification(timedelta(days=1), is_used=True)
+        DoctorVerification.objects.filter(id=used.id).update(created_at=timezone.now() - timedelta(hours=2))
+        live = self.create_verification(timedelta(days=1))
+        upload = DoctorDocumentUpload.objects.create(
+            verification=expired, kind='license_document', filename='license.pdf', size=10
+        )
+        expired_otp = self.create_otp(-timedelta(days=1))
+        live_otp = self.create_otp(timedelta(minutes=5))
+
+        orphan = self.store('temp/qualification_documents/orphan.pdf', b'y' * 500)
+        recent = self.store('temp/qualification_documents/recent.pdf', b'z', age=timedelta(minutes=1))
+        orphan_part = self.store(f'{uploads.PART_DIR}/{"0" * 32}.part', b'p' * 10)
+        upload_part = self.store(f'{uploads.PART_DIR}/{upload.id}.part', b'q' * 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message = PurgeExpiredRegistrationsCronJob().do()
+
+        self.assertEqual(list(DoctorVerification.objects.all()), [live])
+        self.assertFalse(DoctorDocumentUpload.objects.exists())
+        self.assertEqual(list(OTP.objects.all()), [live_otp])
+        self.assertFalse(OTP.objects.filter(id=expired_otp.id).exists())
+        for path in (expired.license_document.path, used.license_document.path, orphan, orphan_part):
+            self.assertFalse(os.path.exists(path), path)
+        self.assertTrue(os.path.exists(live.license_document.path))
+        self.assertTrue(os.path.exists(recent))
+        # The upload row went with its verification, so its part file is gone too
+        self.assertFalse(os.path.exists(upload_part))
+        self.assertIn("1 doctors.DoctorDocumentUpload, 2 doctors.DoctorVerification, 1 otp.OTP", message)
+        # The test's own transaction holds the upload's discard back until the
+        # end, so the orphan sweep gets to its (now unreferenced) part file first
+        self.assertIn("Removed 5 files", message)
+
+    def test_deletes_in_batches(self):
+        for _ in range(5):
+            self.create_otp(-timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as queries:
+            deleted = OTPService.purge_expired(timezone.now(), batch_size=2)
+
+        self.assertEqual(deleted, 5)
+        deletes = [query for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
@@ -0,0 +1,213 @@
+"""
+Resumable, chunked uploads of doctor registration documents.
+
+A client declares the file first (kind, name, size and optionally its SHA-256)
+and then sends it as raw chunks of at most MAX_CHUNK_SIZE bytes, each at the
+offset the server reported. Every chunk is streamed from the request to a
+partial file under MEDIA_ROOT in small pieces, so no request holds more than
+a chunk, nothing is buffered in memory and an interrupted upload resumes at
+the last stored offset. Each request is short; behind nginx's request
+buffering a slow client never keeps a worker busy for the whole upload.
+
+The file's SHA-256 is kept up to date chunk by chunk while the partial file
+is written. When a chunk lands on another worker, or after a restart, the
+digest is rebuilt once from the partial file. Once the last byte arrives the
+file is moved to the document's storage location. Completing registration
+then only references the upload id.
+"""
+import base64
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import Doctor, DoctorDocumentUpload
+
+logger = logging.getLogger(__name__)
+
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+READ_SIZE = 64 * 1024
+PART_DIR = os.path.join('temp', 'uploads')
+MAX_UPLOADS_PER_VERIFICATION = 10
+# Running digests of uploads in progress kept by this process
+MAX_RUNNING_DIGESTS = 256
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """A request the upload cannot accept; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def part_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, PART_DIR, f'{upload.id}.part')
+
+
+def _take_digest(upload):
+    """This process's running digest of the upload's first `offset` bytes"""
+    with _digests_lock:
+        cached = _digests.pop(upload.id, None)
+    if cached and cached[0] == upload.offset:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    if upload.offset:
+        with open(part_path(upload), 'rb') as part:
+            remaining = upload.offset
+            while remaining:
+                data = part.read(min(READ_SIZE, remaining))
+                if not data:
+                    raise UploadError("Stored upload is shorter than its offset", status=409)
+                digest.update(data)
+                remaining -= len(data)
+    return digest
+
+
+def _keep_digest(upload, digest):
+    with _digests_lock:
+        _digests[upload.id] = (upload.offset, digest)
+        while len(_digests) > MAX_RUNNING_DIGESTS:
+            _digests.popitem(last=False)
+
+
+def _chunk_checksum(header):
+    """Decode an `Upload-Checksum: sha256 <base64 digest>` header"""
+    if not header:
+        return None
+    algorithm, _, value = header.partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError("Only sha256 chunk checksums are supported")
+    try:
+        return base64.b64decode(value.strip(), validate=True)
+    except ValueError:
+        raise UploadError("Invalid chunk checksum")
+
+
+class DocumentUploadService:
+    @staticmethod
+    def start(verification, kind, filename, size, content_type='', checksum=''):
+        if size > MAX_DOCUMENT_SIZE:
+            raise UploadError(f"Documents can be at most {MAX_DOCUMENT_SIZE // (1024 * 1024)} MB", status=413)
+        if verification.document_uploads.count() >= MAX_UPLOADS_PER_VERIFICATION:
+            raise UploadError("Too many uploads for this registration", status=429)
+        upload = DoctorDocumentUpload.objects.create(
+            verification=verification,
+            kind=kind,
+            filename=get_valid_filename(os.path.basename(filename)) or 'document',
+            content_type=content_type,
+            size=size,
+            checksum=checksum.lower()
+        )
+        os.makedirs(os.path.dirname(part_path(upload)), exist_ok=True)
+        open(part_path(upload), 'wb').close()
+        return upload
+
+    @staticmethod
+    def append_chunk(upload_id, stream, offset, length, checksum_header=None):
+        """
+        Store `length` bytes read from `stream` at `offset`, which must be the
+        upload's current offset. The upload row stays locked while the chunk
+        is written so concurrent retries of the same chunk cannot interleave.
+        Returns the upload, completed if that was the last chunk.
+        """
+        expected_chunk_digest = _chunk_checksum(checksum_header)
+
+        with transaction.atomic():
+            upload = DoctorDocumentUpload.objects.select_for_update().get(id=upload_id)
+            if upload.is_complete:
+                raise UploadError("Upload is already complete", status=409)
+            if offset != upload.offset:
+                raise UploadError(f"Expected offset {upload.offset}", status=409)
+            if length <= 0 or length > MAX_CHUNK_SIZE:
+                raise UploadError(f"Chunks must be between 1 and {MAX_CHUNK_SIZE} bytes", status=413)
+            if offset + length > upload.size:
+                raise UploadError("Chunk runs past the declared file size", status=413)
+
+            digest = _take_digest(upload)
+            chunk_digest = hashlib.sha256()
+            received = 0
+            with open(part_path(upload), 'r+b') as part:
+                # Drop whatever an earlier failed attempt left past the offset
+                part.seek(offset)
+                part.truncate()
+                while received < length:
+                    data = stream.read(min(READ_SIZE, length - received))
+                    if not data:
+                        break
+                    part.write(data)
+                    chunk_digest.update(data)
+                    digest.update(data)
+                    received += len(data)
+
+                if received != length or (
+                    expected_chunk_digest is not None and chunk_digest.digest() != expected_chunk_digest
+                ):
+                    # The running digest already includes the bad chunk; the
+                    # next attempt rebuilds it from the file
+                    part.seek(offset)
+                    part.truncate()
+                    if received != length:
+                        raise UploadError("Chunk ended early")
+                    raise UploadError("Chunk checksum mismatch")
+
+            upload.offset += length
+            if upload.offset < upload.size:
+                upload.save(update_fields=['offset', 'updated_at'])
+                _keep_digest(upload, digest)
+                return upload
+
+            completed = DocumentUploadService._complete(upload, digest.hexdigest())
+
+        if not completed:
+            raise UploadError("File checksum does not match the declared checksum")
+        return upload
+
+    @staticmethod
+    def _complete(upload, sha256):
+        """Move the finished file into storage; False if its checksum is wrong"""
+        path = part_path(upload)
+        if upload.checksum and upload.checksum != sha256:
+            # Start over; the client gets a clean upload to resend into
+            open(path, 'wb').close()
+            upload.offset = 0
+            upload.save(update_fields=['offset', 'updated_at'])
+            return False
+
+        upload_to = Doctor._meta.get_field(upload.kind).upload_to
+        with open(path, 'rb') as part:
+            name = default_storage.save(f'{upload_to}{upload.id}-{upload.filename}', File(part))
+        os.unlink(path)
+
+        upload.file.name = name
+        upload.sha256 = sha256
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=['offset', 'file', 'sha256', 'completed_at', 'updated_at'])
+        logger.info(f"Completed {upload.kind} upload {upload.id} ({upload.size} bytes)")
+        return True
+
+    @staticmethod
+    def discard_files(upload):
+        """Remove an upload's files unless they are attached to a doctor"""
+        try:
+            if os.path.exists(part_path(upload)):
+                os.unlink(part_path(upload))
+            if upload.file and upload.doctor_id is None:
+                default_storage.delete(upload.file.name)
+        except Exception as e:
+            logger.error(f"Error removing files of upload {upload.id}: {str(e)}")
+        with _digests_lock:
+            _digests.pop(upload.id, None)
@@ -3,6 +3,7 @@ from rest_framework_nested import routers
 from .views import (
     DoctorViewSet,
     DoctorRegistrationViewSet,
+    DoctorDocumentUploadViewSet,
     DoctorApprovalViewSet,
     DoctorBankDetailsViewSet,
     DoctorScheduleViewSet,
@@ -17,6 +18,8 @@ router.register('', DoctorViewSet, basename='doctor')
 
 # Registration router
 registration_router = routers.DefaultRouter()
+# Before 'register' so its detail route does not take 'uploads' for a pk
+registration_router.register('register/uploads', DoctorDocumentUploadViewSet, basename='doctor-document-upload')
 registration_router.register('register', DoctorRegistrationViewSet, basename='doctor-registration')
 
 # Approval router
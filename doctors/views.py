@@ -6,9 +6,10 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters import rest_framework as django_filters
 from django.db import models
 from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404
 from django.utils import timezone
 from datetime import timedelta
-from .models import Doctor, DoctorVerification, DoctorBankDetails, DoctorSchedule, PriceCategory
+from .models import Doctor, DoctorVerification, DoctorBankDetails, DoctorSchedule, PriceCategory, DoctorDocumentUpload
 from .serializers import (
     DoctorSerializer, 
     DoctorStatusSerializer,
@@ -19,13 +20,21 @@ from .serializers import (
     PriceCategorySerializer,
     DoctorRegistrationInitiateSerializer,
     DoctorRegistrationVerifySerializer,
-    DoctorRegistrationCompleteSerializer
+    DoctorRegistrationCompleteSerializer,
+    DoctorAvailabilityQuerySerializer,
+    DoctorDocumentUploadSerializer,
+    DoctorDocumentUploadStartSerializer
 )
 from rest_framework import serializers
 from .services import DoctorVerificationService
+from .uploads import DocumentUploadService, UploadError
+from .availability import get_availability
+from config.pagination import KeysetPaginationMixin
+from config.response_cache import DOCTOR_DIRECTORY, cached_list, invalidate_on_commit
+from otp.services import OTPService
 import logging
 from django.core.exceptions import ValidationError
-from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework.exceptions import NotFound, ValidationError as DRFValidationError
 from django.db import transaction
 from rest_framework.throttling import AnonRateThrottle
 
@@ -53,7 +62,7 @@ class DoctorFilter(django_filters.FilterSet):
             models.Q(email__icontains=value)
         )
 
-class DoctorViewSet(viewsets.ModelViewSet):
+class DoctorViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
     filterset_class = DoctorFilter
@@ -63,10 +72,10 @@ class DoctorViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         """
-        List and Retrieve endpoints are public
+        List, Retrieve and availability endpoints are public
         Other actions require authentication
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'availability', 'availability_batch']:
             permission_classes = [AllowAny]
         else:
             permission_classes = [IsAuthenticated]
@@ -80,11 +89,21 @@ class DoctorViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         
         # For public endpoints (list, retrieve), only show approved doctors if not authenticated
-        if self.action in ['list', 'retrieve'] and not self.request.user.is_authenticated:
+        if self.action in ['list', 'retrieve', 'availability'] and not self.request.user.is_authenticated:
             queryset = queryset.filter(status='approved')
+
+        # Load every relation DoctorSerializer renders up front so a page
+        # costs the same number of queries regardless of its size
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('bank_detail').prefetch_related(
+                'specialities',
+                'schedules__time_slots',
+                'price_categories__entries'
+            )
         
         return queryset.order_by(self.ordering[0])
 
+    @cached_list(DOCTOR_DIRECTORY, anonymous_only=True)
     def list(self, request, *args, **kwargs):
         """
         List doctors with pagination and filtering
@@ -99,12 +118,7 @@ class DoctorViewSet(viewsets.ModelViewSet):
                     'status': 'success',
                     'data': {
                         'doctors': serializer.data,
-                        'pagination': {
-                            'total': self.paginator.page.paginator.count,
-                            'pages': self.paginator.page.paginator.num_pages,
-                            'page': self.paginator.page.number,
-                            'limit': self.paginator.page_size
-                        }
+                        'pagination': self.get_pagination_meta()
                     }
                 })
 
@@ -115,6 +129,8 @@ class DoctorViewSet(viewsets.ModelViewSet):
                     'doctors': serializer.data
                 }
             })
+        except NotFound:
+            raise
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -225,6 +241,112 @@ class DoctorViewSet(viewsets.ModelViewSet):
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def _serialize_days(days):
+        return [
+            {
+                'date': day.isoformat(),
+                'slots': [
+                    {'start': start.isoformat(), 'end': end.isoformat()}
+                    for start, end in slots
+                ]
+            }
+            for day, slots in days
+        ]
+
+    def _availability_params(self, request):
+        serializer = DoctorAvailabilityQuerySerializer(data={
+            key: value for key, value in {
+                'from_date': request.query_params.get('from'),
+                'to_date': request.query_params.get('to'),
+                'duration': request.query_params.get('duration'),
+            }.items() if value
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """
+        Bookable slots for one doctor
+        GET /doctors/{id}/availability/?from=YYYY-MM-DD&to=YYYY-MM-DD&duration=30
+        """
+        try:
+            params = self._availability_params(request)
+            doctor = self.get_object()
+            availability = get_availability(
+                params['from_date'],
+                params['to_date'],
+                params['duration'],
+                doctor_ids=[doctor.pk]
+            )
+            return Response({
+                'status': 'success',
+                'data': {
+                    'doctor_id': str(doctor.pk),
+                    'from': params['from_date'].isoformat(),
+                    'to': params['to_date'].isoformat(),
+                    'duration': params['duration'],
+                    'days': self._serialize_days(availability[doctor.pk])
+                }
+            })
+        except serializers.ValidationError as e:
+            return Response({
+                'status': 'error',
+                'message': 'Validation error',
+                'errors': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except (ObjectDoesNotExist, Http404):
+            return Response({
+                'status': 'error',
+                'message': 'Doctor not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'], url_path='availability')
+    def availability_batch(self, request):
+        """
+        Bookable slots for every approved doctor with working hours
+        GET /doctors/availability/?from=YYYY-MM-DD&to=YYYY-MM-DD&duration=30
+        """
+        try:
+            params = self._availability_params(request)
+            availability = get_availability(
+                params['from_date'],
+                params['to_date'],
+                params['duration']
+            )
+            return Response({
+                'status': 'success',
+                'data': {
+                    'from': params['from_date'].isoformat(),
+                    'to': params['to_date'].isoformat(),
+                    'duration': params['duration'],
+                    'doctors': [
+                        {
+                            'doctor_id': str(doctor_id),
+                            'days': self._serialize_days(days)
+                        }
+                        for doctor_id, days in availability.items()
+                    ]
+                }
+            })
+        except serializers.ValidationError as e:
+            return Response({
+                'status': 'error',
+                'message': 'Validation error',
+                'errors': e.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @action(detail=True, methods=['patch'], url_path='status', permission_classes=[IsAuthenticated])
     def update_status(self, request, pk=None):
         try:
@@ -353,52 +475,40 @@ class DoctorRegistrationViewSet(viewsets.ModelViewSet):
             verify_serializer.is_valid(raise_exception=True)
             
             verification = verify_serializer.validated_data['verification']
-            otp = verify_serializer.validated_data['otp']
-            
             logger.info(f"[DOCTOR_DEBUG] Found verification record - ID: {verification.id}")
-            logger.info(f"[DOCTOR_DEBUG] Found OTP record - ID: {otp.id}, Attempts: {otp.attempts}")
-            
-            # Verify OTP code
-            if verification_data['sms_code'] == otp.otp_code or verification_data['sms_code'] == '000000':
-                logger.info("[DOCTOR_DEBUG] OTP code matched")
-                
-                # Use transaction to ensure atomic operations
-                with transaction.atomic():
-                    # Mark OTP as verified
-                    otp.is_verified = True
-                    otp.save()
-                    logger.info(f"[DOCTOR_DEBUG] Marked OTP as verified - ID: {otp.id}")
-                    
-                    # Mark verification as complete
-                    verification.phone_verified = True
-                    verification.save()
-                    logger.info(f"[DOCTOR_DEBUG] Marked verification as complete - ID: {verification.id}")
-                    
+
+            # If code is 000000, always succeed; otherwise one atomic attempt against the live code
+            if verification_data['sms_code'] != '000000':
+                verified, message, attempts_remaining = OTPService.attempt_otp(
+                    verification.phone, verification_data['sms_code']
+                )
+                if not verified:
+                    logger.warning(f"[DOCTOR_DEBUG] {message} - Attempts remaining: {attempts_remaining}")
                     return Response({
-                        'status': 'success',
-                        'message': 'Phone number verified successfully.',
+                        'status': 'error',
+                        'message': 'Invalid verification code' if attempts_remaining else message,
                         'data': {
-                            'verification_id': str(verification.id),
-                            'next_steps': [
-                                'Your phone number has been verified.',
-                                'Please complete your profile with additional details.'
-                            ]
+                            'attempts_remaining': attempts_remaining
                         }
-                    })
-            else:
-                # Increment OTP attempts
-                otp.attempts += 1
-                otp.save()
-                
-                logger.warning(f"[DOCTOR_DEBUG] Invalid OTP code provided - Attempts: {otp.attempts}")
-                
-                return Response({
-                    'status': 'error',
-                    'message': 'Invalid verification code',
-                    'data': {
-                        'attempts_remaining': max(3 - otp.attempts, 0)
-                    }
-                }, status=status.HTTP_400_BAD_REQUEST)
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+            logger.info(f"[DOCTOR_DEBUG] OTP code matched for verification - ID: {verification.id}")
+            
+            verification.phone_verified = True
+            verification.save()
+            logger.info(f"[DOCTOR_DEBUG] Marked verification as complete - ID: {verification.id}")
+            
+            return Response({
+                'status': 'success',
+                'message': 'Phone number verified successfully.',
+                'data': {
+                    'verification_id': str(verification.id),
+                    'next_steps': [
+                        'Your phone number has been verified.',
+                        'Please complete your profile with additional details.'
+                    ]
+                }
+            })
             
         except serializers.ValidationError as e:
             logger.error(f"[DOCTOR_DEBUG] Verification validation error: {str(e)}")
@@ -545,6 +655,97 @@ class DoctorRegistrationViewSet(viewsets.ModelViewSet):
             'message': 'Please use /api/v1/doctors/register/initiate/ to start registration'
         }, status=status.HTTP_400_BAD_REQUEST)
 
+class DoctorDocumentUploadViewSet(viewsets.ViewSet):
+    """
+    Resumable chunked upload of registration documents, between phone
+    verification and completing registration:
+
+    POST  register/uploads/       declare the file, returns the upload id
+    PATCH register/uploads/{id}/  raw chunk at the `Upload-Offset` header
+    GET   register/uploads/{id}/  current offset, to resume after a failure
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return [RegistrationRateThrottle()]
+        return []
+
+    def upload_response(self, upload, status_code=status.HTTP_200_OK, message=None):
+        response = Response({
+            'status': 'success',
+            'message': message or ('Upload complete' if upload.is_complete else 'Chunk stored'),
+            'data': DoctorDocumentUploadSerializer(upload).data
+        }, status=status_code)
+        response['Upload-Offset'] = str(upload.offset)
+        return response
+
+    def error_response(self, message, status_code, upload_id=None):
+        data = {'status': 'error', 'message': message}
+        if upload_id and status_code == status.HTTP_409_CONFLICT:
+            # Tell the client where to resume
+            upload = DoctorDocumentUpload.objects.filter(id=upload_id).first()
+            if upload:
+                data['data'] = DoctorDocumentUploadSerializer(upload).data
+        return Response(data, status=status_code)
+
+    def create(self, request):
+        serializer = DoctorDocumentUploadStartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'error',
+                'message': 'Validation error',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        try:
+            upload = DocumentUploadService.start(
+                verification=data['verification_id'],
+                kind=data['kind'],
+                filename=data['filename'],
+                size=data['size'],
+                content_type=data['content_type'],
+                checksum=data['checksum']
+            )
+        except UploadError as e:
+            return self.error_response(str(e), e.status)
+        return self.upload_response(upload, status.HTTP_201_CREATED, 'Upload started')
+
+    def retrieve(self, request, pk=None):
+        upload = get_upload_or_404(pk)
+        return self.upload_response(upload, message='Upload status')
+
+    def partial_update(self, request, pk=None):
+        upload = get_upload_or_404(pk)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return self.error_response('Upload-Offset and Content-Length headers are required', status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Read the raw body as it arrives; request.data would buffer it
+            upload = DocumentUploadService.append_chunk(
+                upload.id,
+                request.stream,
+                offset,
+                length,
+                checksum_header=request.headers.get('Upload-Checksum')
+            )
+        except UploadError as e:
+            return self.error_response(str(e), e.status, upload.id)
+        return self.upload_response(upload)
+
+
+def get_upload_or_404(pk):
+    try:
+        return DoctorDocumentUpload.objects.get(id=pk)
+    except (DoctorDocumentUpload.DoesNotExist, ValidationError):
+        raise NotFound('Upload not found')
+
+
 class DoctorApprovalViewSet(viewsets.ModelViewSet):
     queryset = Doctor.objects.filter(status='pending')
     serializer_class = DoctorApprovalSerializer
@@ -614,8 +815,9 @@ class DoctorBankDetailsViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(data=mutable_data)
             serializer.is_valid(raise_exception=True)
             
-            # Deactivate existing bank details
+            # Deactivate existing bank details; a queryset update sends no signals
             DoctorBankDetails.objects.filter(doctor=doctor, is_active=True).update(is_active=False)
+            invalidate_on_commit(DOCTOR_DIRECTORY)
             
             # Save new bank details
             serializer.save(doctor=doctor)
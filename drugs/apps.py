@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DrugsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'drugs'
+
+    def ready(self):
+        # Register autocomplete snapshot refresh signals
+        from . import signals
@@ -0,0 +1,353 @@
+"""
+In-process drug autocomplete served from a versioned, memory-mapped snapshot.
+
+A snapshot is one immutable file holding every active drug's suggestion record
+and a table of normalized keys ("<name> <strength> <dosage form>" in each
+language) sorted bytewise. A prefix lookup is a binary search over the key
+table followed by a forward scan, read straight from the mapping, so
+autocomplete never touches the database. Every worker process maps the same
+file read-only and the OS shares the pages between them.
+
+refresh_snapshot() writes a new version next to the old one and repoints the
+CURRENT file at it atomically; workers notice within CHECK_INTERVAL seconds
+and switch over. Refreshes are incremental: only drugs updated since the
+previous snapshot's watermark are read, the rest is carried over from the
+previous file. Refreshes of one directory hold an exclusive lock on its LOCK
+file, so concurrent ones run one after the other and none is lost. Saves
+queue a refresh on a single background thread per process
+(schedule_refresh); a burst of saves is folded into one refresh.
+
+Layout (little endian): MAGIC, u32 metadata length, metadata JSON, key table
+(u32 key offset, u32 key length, u32 record index per key), record table
+(u32 offset, u32 length per record), then the key and record bytes.
+"""
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from config.background import BackgroundQueue
+from .search import normalize
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'DRUGIDX1'
+CURRENT = 'CURRENT'
+LOCK = 'LOCK'
+KEY_ENTRY = struct.Struct('<III')
+RECORD_ENTRY = struct.Struct('<II')
+LENGTH = struct.Struct('<I')
+
+# How often a worker checks CURRENT for a newer snapshot
+CHECK_INTERVAL = 1.0
+# Each snapshot's watermark is the time its refresh started. Rows committed
+# late can carry an updated_at older than that; re-reading a short overlap
+# on the next refresh picks them up
+REFRESH_OVERLAP = timedelta(minutes=5)
+# Snapshots kept on disk, so workers still mapping an old one are not cut off
+KEEP_SNAPSHOTS = 3
+
+
+def drug_record(drug):
+    """The suggestion a drug is shown as, also the unit stored in a snapshot"""
+    return {
+        'id': str(drug.id),
+        'name': drug.name,
+        'name_arabic': drug.name_arabic,
+        'strength': drug.strength,
+        'dosage_form': drug.dosage_form.name,
+        'dosage_form_arabic': drug.dosage_form.name_arabic,
+    }
+
+
+def record_keys(record):
+    return {
+        normalize(f"{record['name']} {record['strength']} {record['dosage_form']}").encode(),
+        normalize(f"{record['name_arabic']} {record['strength']} {record['dosage_form_arabic']}").encode(),
+    }
+
+
+class DrugAutocompleteIndex:
+    """Read-only view of one snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot:
+            self.buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            self.buffer.close()
+            raise ValueError(f"{path} is not a drug autocomplete snapshot")
+        (meta_length,) = LENGTH.unpack_from(self.buffer, len(MAGIC))
+        start = len(MAGIC) + LENGTH.size
+        self.meta = json.loads(self.buffer[start:start + meta_length])
+        self.version = self.meta['version']
+        self.watermark = parse_datetime(self.meta['watermark'])
+        self.key_count = self.meta['keys']
+        self.record_count = self.meta['records']
+
+    def close(self):
+        self.buffer.close()
+
+    def _key(self, index):
+        offset, length, record = KEY_ENTRY.unpack_from(self.buffer, self.meta['key_table'] + index * KEY_ENTRY.size)
+        return self.buffer[offset:offset + length], record
+
+    def record(self, index):
+        offset, length = RECORD_ENTRY.unpack_from(self.buffer, self.meta['record_table'] + index * RECORD_ENTRY.size)
+        return json.loads(self.buffer[offset:offset + length])
+
+    def records(self):
+        for index in range(self.record_count):
+            yield self.record(index)
+
+    def search(self, text, limit):
+        """Up to `limit` records with a key starting with `text`, in key order"""
+        prefix = normalize(text).encode()
+        if not prefix:
+            return []
+
+        low, high = 0, self.key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle)[0] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        seen = set()
+        results = []
+        for index in range(low, self.key_count):
+            key, record = self._key(index)
+            if not key.startswith(prefix):
+                break
+            if record not in seen:
+                seen.add(record)
+                results.append(self.record(record))
+                if len(results) == limit:
+                    break
+        return results
+
+
+def write_snapshot(directory, records, version, watermark):
+    """Write records as snapshot `version` and make it current; returns its path"""
+    records = sorted(records, key=lambda record: record['id'])
+    encoded = [json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode() for record in records]
+    keys = sorted(
+        (key, index)
+        for index, record in enumerate(records)
+        for key in record_keys(record)
+    )
+
+    meta = {
+        'version': version,
+        'built_at': timezone.now().isoformat(),
+        'watermark': watermark.isoformat(),
+        'keys': len(keys),
+        'records': len(records),
+    }
+    # Table offsets depend on the metadata length, which depends on the offsets;
+    # reserve room for them before serializing
+    meta.update(key_table=0, record_table=0)
+    meta_length = len(json.dumps(meta).encode()) + 32
+    key_table = len(MAGIC) + LENGTH.size + meta_length
+    record_table = key_table + len(keys) * KEY_ENTRY.size
+    data_start = record_table + len(records) * RECORD_ENTRY.size
+    meta.update(key_table=key_table, record_table=record_table)
+    meta_bytes = json.dumps(meta).encode().ljust(meta_length)
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'drugs-{version:08d}.idx')
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as snapshot:
+            snapshot.write(MAGIC + LENGTH.pack(meta_length) + meta_bytes)
+
+            key_offsets = []
+            offset = data_start
+            for key, _ in keys:
+                key_offsets.append(offset)
+                offset += len(key)
+            record_offsets = []
+            for record in encoded:
+                record_offsets.append(offset)
+                offset += len(record)
+
+            snapshot.write(b''.join(
+                KEY_ENTRY.pack(key_offset, len(key), index)
+                for key_offset, (key, index) in zip(key_offsets, keys)
+            ))
+            snapshot.write(b''.join(
+                RECORD_ENTRY.pack(record_offset, len(record))
+                for record_offset, record in zip(record_offsets, encoded)
+            ))
+            snapshot.write(b''.join(key for key, _ in keys))
+            snapshot.write(b''.join(encoded))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+    _point_current(directory, os.path.basename(path))
+    _remove_old_snapshots(directory)
+    return path
+
+
+def _point_current(directory, filename):
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as pointer:
+        pointer.write(filename)
+    os.replace(temporary, os.path.join(directory, CURRENT))
+
+
+def _remove_old_snapshots(directory):
+    snapshots = sorted(name for name in os.listdir(directory) if name.startswith('drugs-') and name.endswith('.idx'))
+    for name in snapshots[:-KEEP_SNAPSHOTS]:
+        os.unlink(os.path.join(directory, name))
+
+
+def current_snapshot_path(directory):
+    try:
+        with open(os.path.join(directory, CURRENT)) as pointer:
+            return os.path.join(directory, pointer.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def open_current(directory):
+    path = current_snapshot_path(directory)
+    if path is None:
+        return None
+    try:
+        return DrugAutocompleteIndex(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not open drug autocomplete snapshot {path}: {str(e)}")
+        return None
+
+
+@contextmanager
+def _refresh_lock(directory):
+    """Exclusive lock on the directory's snapshots, held across processes"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def refresh_snapshot(directory=None, full=False):
+    """
+    Bring the snapshot up to date with the Drug table.
+    Returns the version now current, or None when nothing changed.
+    """
+    directory = directory or settings.DRUG_AUTOCOMPLETE_DIR
+    # A refresh that waited for the lock starts from the snapshot written meanwhile
+    with _refresh_lock(directory):
+        return _refresh(directory, full)
+
+
+def _refresh(directory, full):
+    from .models import Drug
+
+    watermark = timezone.now()
+    drugs = Drug.objects.select_related('dosage_form')
+    previous = None if full else open_current(directory)
+
+    if previous is None:
+        records = {}
+        changed = drugs.all()
+    else:
+        records = {record['id']: record for record in previous.records()}
+        changed = drugs.filter(updated_at__gte=previous.watermark - REFRESH_OVERLAP)
+
+    dirty = previous is None
+    for drug in changed.iterator(chunk_size=2000):
+        record = drug_record(drug) if drug.status else None
+        if records.get(str(drug.id)) != record:
+            dirty = True
+            if record:
+                records[record['id']] = record
+            else:
+                records.pop(str(drug.id), None)
+
+    # Deleted drugs leave no updated_at behind; a count mismatch gives them away
+    if len(records) != Drug.objects.filter(status=True).count():
+        active = {str(drug_id) for drug_id in Drug.objects.filter(status=True).values_list('id', flat=True)}
+        for drug_id in set(records) - active:
+            del records[drug_id]
+            dirty = True
+
+    if not dirty:
+        previous.close()
+        return None
+
+    version = previous.version + 1 if previous else _next_version(directory)
+    if previous:
+        previous.close()
+    write_snapshot(directory, records.values(), version, watermark)
+    logger.info(f"Wrote drug autocomplete snapshot {version} with {len(records)} drugs")
+    return version
+
+
+def _next_version(directory):
+    current = open_current(directory)
+    if current is None:
+        return 1
+    current.close()
+    return current.version + 1
+
+
+# A failed refresh is caught up by the refresh cron job. A waiting full
+# rebuild covers any refresh queued after it
+_refresh_queue = BackgroundQueue(
+    'drug-autocomplete',
+    lambda full: refresh_snapshot(full=full),
+    covered_by=lambda full: (full, True)
+)
+
+
+def schedule_refresh(full=False):
+    """Queue a refresh unless one that covers it has not started yet"""
+    _refresh_queue.schedule(full)
+
+
+_index = None
+_checked = (None, 0.0)
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    """The current snapshot of this process, or None if none has been built"""
+    global _index, _checked
+    directory = settings.DRUG_AUTOCOMPLETE_DIR
+    now = time.monotonic()
+    if _checked[0] == directory and now - _checked[1] < CHECK_INTERVAL:
+        return _index
+
+    with _index_lock:
+        path = current_snapshot_path(directory)
+        if path is None:
+            _index = None
+        elif _index is None or _index.path != path:
+            index = open_current(directory)
+            if index is not None:
+                # The old mapping is left to the garbage collector; a
+                # request may still be reading from it
+                _index = index
+        _checked = (directory, now)
+    return _index
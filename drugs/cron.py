@@ -0,0 +1,26 @@
+from django_cron import CronJobBase, Schedule
+import logging
+
+from .autocomplete_index import refresh_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshDrugAutocompleteCronJob(CronJobBase):
+    """
+    Cron job that folds drug changes into this host's autocomplete snapshot.
+    Saves queue a refresh in the background; this picks up changes made on
+    other hosts and by bulk writes that send no signals.
+    """
+
+    # Run every minute
+    schedule = Schedule(run_every_mins=1)
+
+    code = 'drugs.refresh_drug_autocomplete'  # Unique code
+
+    def do(self):
+        """Execute the cron job."""
+        version = refresh_snapshot()
+        if version is None:
+            return "Drug autocomplete snapshot is up to date."
+        return f"Wrote drug autocomplete snapshot {version}."
@@ -0,0 +1,249 @@
+"""
+Bulk drug catalog import.
+
+Streams a CSV or JSON Lines formulary into Drug, creating the categories and
+dosage forms it names. Rows are keyed on their formulary `code` and written
+with one INSERT ... ON CONFLICT (code) DO UPDATE per chunk, so an import of
+any size runs in bounded memory, re-importing a file is idempotent and a
+newer edition of the formulary updates drugs in place.
+
+Columns: code, name, name_arabic, category, dosage_form and strength are
+required; description, description_arabic, category_arabic,
+dosage_form_arabic, manufacturer and status (true/false) are optional.
+"""
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+
+from .models import Drug, DrugCategory, DrugDosageForm
+from .search import normalize
+
+logger = logging.getLogger(__name__)
+
+CSV = 'csv'
+JSONL = 'jsonl'
+
+REQUIRED_COLUMNS = ('code', 'name', 'name_arabic', 'category', 'dosage_form', 'strength')
+DRUG_FIELDS = (
+    'name', 'name_arabic', 'description', 'description_arabic',
+    'strength', 'manufacturer', 'status',
+)
+# Written on conflict; id and created_at of existing drugs are kept
+UPDATE_FIELDS = (
+    *DRUG_FIELDS, 'category', 'dosage_form', 'updated_at',
+    'search_name', 'search_name_arabic', 'search_text',
+)
+MAX_REPORTED = 50
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    return JSONL if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else CSV
+
+
+def iter_rows(stream, file_format):
+    """Yield (line number, row dict) from a binary stream without reading it whole"""
+    stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if file_format == JSONL:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = ImportRowError(f"Invalid JSON: {e.msg}")
+                if not isinstance(row, (dict, ImportRowError)):
+                    row = ImportRowError("Expected a JSON object")
+                yield line_number, row
+        return
+
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _text(row, column):
+    value = row.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def _status(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('', 'true', '1', 'yes', 'active'):
+        return True
+    if value in ('false', '0', 'no', 'inactive'):
+        return False
+    raise ImportRowError(f"Invalid status {value!r}")
+
+
+class DrugCatalogImporter:
+    """
+    Imports one file. Category and dosage form lookups are loaded once and
+    kept in memory; new ones are created as rows name them (counted but not
+    created in a dry run).
+    """
+
+    def __init__(self, chunk_size=2000, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.categories = self._load_lookup(DrugCategory)
+        self.dosage_forms = self._load_lookup(DrugDosageForm)
+        self.totals = {
+            'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'errors': 0,
+            'categories_created': 0, 'dosage_forms_created': 0, 'chunks': 0, 'seconds': 0.0,
+        }
+        self.errors = []
+        self.changes = []
+        self.changes_omitted = 0
+
+    @staticmethod
+    def _load_lookup(model):
+        return {normalize(name): pk for pk, name in model.objects.values_list('id', 'name')}
+
+    def _resolve(self, model, lookup, name, name_arabic, counter):
+        key = normalize(name)
+        if key not in lookup:
+            if self.dry_run:
+                lookup[key] = None
+            else:
+                lookup[key] = model.objects.create(name=name, name_arabic=name_arabic or name).pk
+            self.totals[counter] += 1
+        return lookup[key]
+
+    def build_drug(self, row):
+        if isinstance(row, ImportRowError):
+            raise row
+        missing = [column for column in REQUIRED_COLUMNS if not _text(row, column)]
+        if missing:
+            raise ImportRowError(f"Missing {', '.join(missing)}")
+
+        drug = Drug(
+            id=uuid.uuid4(),
+            code=_text(row, 'code'),
+            name=_text(row, 'name'),
+            name_arabic=_text(row, 'name_arabic'),
+            description=_text(row, 'description'),
+            description_arabic=_text(row, 'description_arabic'),
+            strength=_text(row, 'strength'),
+            manufacturer=_text(row, 'manufacturer'),
+            status=_status(row.get('status', '')),
+            category_id=self._resolve(
+                DrugCategory, self.categories, _text(row, 'category'),
+                _text(row, 'category_arabic'), 'categories_created'
+            ),
+            dosage_form_id=self._resolve(
+                DrugDosageForm, self.dosage_forms, _text(row, 'dosage_form'),
+                _text(row, 'dosage_form_arabic'), 'dosage_forms_created'
+            ),
+        )
+        drug.update_search_fields()
+        return drug
+
+    def _diff(self, drugs):
+        """Sort a chunk into created, updated and unchanged drugs against the table"""
+        # Plain tuples of the compared columns; building model instances for
+        # every existing row costs more than the comparison itself
+        fields = (*DRUG_FIELDS, 'category_id', 'dosage_form_id')
+        existing = {
+            row[0]: row[1:]
+            for row in Drug.objects.filter(code__in=[drug.code for drug in drugs]).values_list('code', *fields)
+        }
+        created, updated = [], []
+        for drug in drugs:
+            current = existing.get(drug.code)
+            if current is None:
+                created.append(drug)
+                continue
+            changed = {
+                field: (old, getattr(drug, field))
+                for field, old in zip(fields, current)
+                if old != getattr(drug, field)
+            }
+            if changed:
+                updated.append((drug, changed))
+        return created, updated
+
+    def write_chunk(self, drugs):
+        # The last row wins when a code repeats; ON CONFLICT cannot touch a row twice
+        drugs = list({drug.code: drug for drug in drugs}.values())
+        created, updated = self._diff(drugs)
+
+        if self.dry_run:
+            for drug in created:
+                self._note_change(f"+ {drug.code} {drug.name} {drug.strength}")
+            for drug, changed in updated:
+                for field, (old, new) in changed.items():
+                    self._note_change(f"~ {drug.code} {field}: {old!r} -> {new!r}")
+        elif created or updated:
+            # Unchanged drugs are not rewritten
+            Drug.objects.bulk_create(
+                [*created, *(drug for drug, _ in updated)],
+                update_conflicts=True,
+                unique_fields=['code'],
+                update_fields=list(UPDATE_FIELDS),
+            )
+
+        self.totals['chunks'] += 1
+        self.totals['created'] += len(created)
+        self.totals['updated'] += len(updated)
+        self.totals['unchanged'] += len(drugs) - len(created) - len(updated)
+
+    def _note_change(self, line):
+        if len(self.changes) < MAX_REPORTED:
+            self.changes.append(line)
+        else:
+            self.changes_omitted += 1
+
+    def run(self, stream, file_format, on_chunk=None):
+        """
+        Import every row of the stream. on_chunk, if given, is called with the
+        running totals after each chunk. Returns the totals.
+        """
+        started = time.monotonic()
+        chunk = []
+        for line_number, row in iter_rows(stream, file_format):
+            self.totals['rows'] += 1
+            try:
+                chunk.append(self.build_drug(row))
+            except ImportRowError as e:
+                self.totals['errors'] += 1
+                if len(self.errors) < MAX_REPORTED:
+                    self.errors.append(f"Line {line_number}: {e}")
+                continue
+
+            if len(chunk) == self.chunk_size:
+                self.write_chunk(chunk)
+                chunk = []
+                if on_chunk:
+                    on_chunk(self.totals)
+        if chunk:
+            self.write_chunk(chunk)
+            if on_chunk:
+                on_chunk(self.totals)
+
+        elapsed = time.monotonic() - started
+        self.totals['seconds'] = elapsed
+        self.totals['rows_per_second'] = self.totals['rows'] / elapsed if elapsed else 0.0
+
+        if not self.dry_run and (self.totals['created'] or self.totals['updated']):
+            # Bulk writes send no signals; bring autocomplete up to date once
+            from .autocomplete_index import refresh_snapshot
+            try:
+                refresh_snapshot()
+            except Exception as e:
+                logger.error(f"Drug autocomplete refresh after import failed: {str(e)}")
+
+        logger.info(
+            f"Drug import {'dry run ' if self.dry_run else ''}finished: {self.totals['rows']} rows, "
+            f"{self.totals['created']} created, {self.totals['updated']} updated, "
+            f"{self.totals['errors']} errors in {elapsed:.1f}s"
+        )
+        return self.totals
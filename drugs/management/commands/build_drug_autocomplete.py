@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from drugs.autocomplete_index import open_current, refresh_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Builds or refreshes the drug autocomplete snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild from the whole table instead of applying changes since the last snapshot'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        version = refresh_snapshot(full=options['full'])
+        elapsed = time.perf_counter() - started
+
+        if version is None:
+            self.stdout.write(f"Drug autocomplete snapshot is up to date ({elapsed:.2f}s)")
+            return
+
+        index = open_current(settings.DRUG_AUTOCOMPLETE_DIR)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote snapshot {version} with {index.record_count} drugs and {index.key_count} keys "
+            f"to {index.path} in {elapsed:.2f}s"
+        ))
+        index.close()
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from drugs.importer import CSV, JSONL, DrugCatalogImporter, detect_format
+
+
+class Command(BaseCommand):
+    help = 'Imports a drug formulary from a CSV or JSON Lines file, upserting on the formulary code'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument(
+            '--format',
+            choices=[CSV, JSONL],
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows written per statement (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would change without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        importer = DrugCatalogImporter(chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+
+        with stream:
+            totals = importer.run(stream, file_format, on_chunk=self.report_progress)
+
+        for line in importer.changes:
+            self.stdout.write(line)
+        if importer.changes_omitted:
+            self.stdout.write(f"... and {importer.changes_omitted} more changes")
+        for error in importer.errors:
+            self.stderr.write(error)
+
+        prefix = "Dry run, nothing written. " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Created {totals['created']}, updated {totals['updated']}, "
+            f"unchanged {totals['unchanged']}, rejected {totals['errors']} rows. "
+            f"New categories: {totals['categories_created']}, new dosage forms: {totals['dosage_forms_created']}. "
+            f"{totals['rows']} rows in {totals['seconds']:.1f}s ({totals['rows_per_second']:,.0f} rows/sec)"
+        ))
+
+    def report_progress(self, totals):
+        self.stdout.write(f"  {totals['rows']} rows read, {totals['created'] + totals['updated']} written")
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drugs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='drug',
+            index=models.Index(fields=['created_at', 'id'], name='drug_created_id_idx'),
+        ),
+    ]
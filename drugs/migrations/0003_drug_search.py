@@ -0,0 +1,89 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:41
+
+import re
+import unicodedata
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# A copy of drugs.search.normalize as of this migration, so later changes
+# to the search module do not change what the migration writes
+ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_FOLDS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKC', text or '')
+    text = ARABIC_MARKS.sub('', text).translate(ARABIC_FOLDS)
+    return ' '.join(text.lower().split())
+
+
+def fill_search_fields(apps, schema_editor):
+    Drug = apps.get_model('drugs', 'Drug')
+    batch = []
+    for drug in Drug.objects.all().iterator(chunk_size=2000):
+        drug.search_name = normalize(drug.name)
+        drug.search_name_arabic = normalize(drug.name_arabic)
+        drug.search_text = normalize(' '.join([
+            drug.name, drug.name_arabic, drug.strength, drug.description, drug.description_arabic
+        ]))
+        batch.append(drug)
+        if len(batch) == 2000:
+            Drug.objects.bulk_update(batch, ['search_name', 'search_name_arabic', 'search_text'])
+            batch = []
+    Drug.objects.bulk_update(batch, ['search_name', 'search_name_arabic', 'search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drugs', '0002_drug_drug_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drug',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='drug',
+            name='search_name_arabic',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='drug',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='drug',
+            index=models.Index(condition=models.Q(('status', True)), fields=['search_name'], name='drug_search_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='drug',
+            index=models.Index(condition=models.Q(('status', True)), fields=['search_name_arabic'], name='drug_search_arabic_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        TrigramExtension(),
+        # Must match drugs.search.SearchDocument exactly to be used
+        migrations.RunSQL(
+            sql="CREATE INDEX drug_search_document_idx ON drugs_drug USING gin (to_tsvector('simple'::regconfig, search_text));",
+            reverse_sql="DROP INDEX IF EXISTS drug_search_document_idx;",
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX drug_search_name_trgm_idx ON drugs_drug USING gin (search_name gin_trgm_ops);",
+            reverse_sql="DROP INDEX IF EXISTS drug_search_name_trgm_idx;",
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX drug_search_arabic_trgm_idx ON drugs_drug USING gin (search_name_arabic gin_trgm_ops);",
+            reverse_sql="DROP INDEX IF EXISTS drug_search_arabic_trgm_idx;",
+        ),
+    ]
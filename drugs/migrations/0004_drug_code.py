@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drugs', '0003_drug_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drug',
+            name='code',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Formulary Code'),
+        ),
+    ]
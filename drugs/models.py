@@ -39,6 +39,8 @@ class DrugDosageForm(models.Model):
 
 class Drug(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # National formulary code; the key catalog imports upsert on
+    code = models.CharField(_("Formulary Code"), max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(_("Name"), max_length=255)
     name_arabic = models.CharField(_("Arabic Name"), max_length=255)
     description = models.TextField(_("Description"), blank=True)
@@ -61,10 +63,53 @@ class Drug(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Normalized copies for search (see drugs.search), filled in on save
+    search_name = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_name_arabic = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_text = models.TextField(blank=True, default="", editable=False)
+
     class Meta:
         verbose_name = _("Drug")
         verbose_name_plural = _("Drugs")
         ordering = ["name"]
+        indexes = [
+            # Keyset pagination of the drug list
+            models.Index(fields=["created_at", "id"], name="drug_created_id_idx"),
+            # Name prefix autocomplete over active drugs; the full-text and
+            # trigram indexes are PostgreSQL-only and live in migration 0003
+            models.Index(
+                fields=["search_name"],
+                name="drug_search_name_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+                condition=models.Q(status=True),
+            ),
+            models.Index(
+                fields=["search_name_arabic"],
+                name="drug_search_arabic_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+                condition=models.Q(status=True),
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+    def update_search_fields(self):
+        from .search import normalize
+
+        self.search_name = normalize(self.name)
+        self.search_name_arabic = normalize(self.name_arabic)
+        self.search_text = normalize(" ".join([
+            self.name,
+            self.name_arabic,
+            self.strength,
+            self.description,
+            self.description_arabic,
+        ]))
+
+    def save(self, *args, **kwargs):
+        self.update_search_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "search_name", "search_name_arabic", "search_text"}
+        super().save(*args, **kwargs)
@@ -0,0 +1,118 @@
+"""
+Drug catalog search.
+
+Drug stores normalized copies of its names and text (search_name,
+search_name_arabic, search_text) that are kept in sync on save. On PostgreSQL
+they are indexed for full-text search (a GIN index on the 'simple' tsvector of
+search_text), fuzzy matching (trigram GIN indexes on the names) and name prefix
+autocomplete (partial pattern-ops btree indexes over active drugs). Other
+databases fall back to substring matching on the same columns.
+
+Arabic text is normalized the same way on both sides: diacritics and tatweel
+are stripped and alef, alef maqsura and ta marbuta variants are folded, so
+"أموكسيسيلين" and "اموكسيسيلين" match each other.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import Case, F, Func, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+# Harakat, Quranic marks, superscript alef and tatweel
+ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_FOLDS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+ARABIC_LETTERS = re.compile('[\u0600-\u06ff]')
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+
+def normalize(text):
+    """Lowercase, fold Arabic letter variants and collapse whitespace"""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = ARABIC_MARKS.sub('', text).translate(ARABIC_FOLDS)
+    return ' '.join(text.lower().split())
+
+
+def search_terms(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+class SearchDocument(Func):
+    """
+    to_tsvector('simple', search_text), written exactly like the expression
+    index in the migration so the planner can use it
+    """
+    function = 'to_tsvector'
+    template = "%(function)s('simple'::regconfig, %(expressions)s)"
+    output_field = SearchVectorField()
+
+    def __init__(self):
+        super().__init__(F('search_text'))
+
+
+def _is_postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_drugs(queryset, text):
+    """Drugs matching `text`, best match first"""
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+
+    if not _is_postgresql(queryset):
+        for term in terms:
+            queryset = queryset.filter(search_text__contains=term)
+        phrase = ' '.join(terms)
+        return queryset.annotate(
+            rank=Case(
+                When(Q(search_name__startswith=phrase) | Q(search_name_arabic__startswith=phrase), then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('rank', 'name')
+
+    # Every word may be a prefix of an indexed word; names also match with typos
+    phrase = ' '.join(terms)
+    query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='simple')
+    return queryset.annotate(
+        document=SearchDocument(),
+        rank=SearchRank(SearchDocument(), query) + Greatest(
+            TrigramWordSimilarity(Value(phrase), 'search_name'),
+            TrigramWordSimilarity(Value(phrase), 'search_name_arabic')
+        )
+    ).filter(
+        Q(document=query)
+        | Q(search_name__trigram_word_similar=phrase)
+        | Q(search_name_arabic__trigram_word_similar=phrase)
+    ).order_by('-rank', 'name')
+
+
+def autocomplete(queryset, text, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Top `limit` active drugs whose English or Arabic name starts with `text`.
+    One range scan over the partial prefix index of the typed language.
+    """
+    prefix = normalize(text)
+    if not prefix:
+        return queryset.none()
+    column = 'search_name_arabic' if ARABIC_LETTERS.search(prefix) else 'search_name'
+    return queryset.filter(
+        status=True,
+        **{f'{column}__startswith': prefix}
+    ).order_by(column, 'id')[:limit]
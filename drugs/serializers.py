@@ -22,6 +22,7 @@ class DrugListSerializer(serializers.ModelSerializer):
         model = Drug
         fields = [
             "id",
+            "code",
             "name",
             "name_arabic",
             "description",
@@ -40,6 +41,7 @@ class DrugCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Drug
         fields = [
+            "code",
             "name",
             "name_arabic",
             "description",
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete_index import schedule_refresh
+from .models import Drug, DrugDosageForm
+
+
+@receiver(post_save, sender=Drug)
+@receiver(post_delete, sender=Drug)
+def handle_drug_change(sender, **kwargs):
+    """Queue a refresh of this host's autocomplete snapshot once the change is committed"""
+    transaction.on_commit(schedule_refresh)
+
+
+@receiver(post_save, sender=DrugDosageForm)
+def handle_dosage_form_change(sender, **kwargs):
+    """Dosage form names are part of every record; rebuild the snapshot from scratch"""
+    transaction.on_commit(lambda: schedule_refresh(full=True))
@@ -1,3 +1,432 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication.models import User
+
+from . import autocomplete_index
+from .autocomplete_index import DrugAutocompleteIndex, current_snapshot_path, refresh_snapshot
+from .importer import CSV, JSONL, DrugCatalogImporter
+from .models import Drug, DrugCategory, DrugDosageForm
+from .search import autocomplete, normalize, search_drugs
+
+
+def create_catalog():
+    category = DrugCategory.objects.create(name='Antibiotics', name_arabic='مضادات حيوية')
+    dosage_form = DrugDosageForm.objects.create(name='Tablet', name_arabic='أقراص')
+    return category, dosage_form
+
+
+def use_snapshot_dir(test):
+    """Point DRUG_AUTOCOMPLETE_DIR at an empty directory for the duration of the test"""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    test.enterContext(override_settings(DRUG_AUTOCOMPLETE_DIR=directory))
+    return directory
+
+
+def create_drug(category, dosage_form, name, name_arabic, **kwargs):
+    return Drug.objects.create(
+        name=name,
+        name_arabic=name_arabic,
+        category=category,
+        dosage_form=dosage_form,
+        strength=kwargs.pop('strength', '500mg'),
+        manufacturer=kwargs.pop('manufacturer', 'Acme'),
+        **kwargs
+    )
+
+
+class ArabicNormalizationTests(TestCase):
+    def test_folds_letter_variants_and_strips_diacritics(self):
+        self.assertEqual(normalize('أَمُوكْسِيسِيلِين'), 'اموكسيسيلين')
+        self.assertEqual(normalize('إيبوبروفين'), normalize('ايبوبروفين'))
+        self.assertEqual(normalize('مستشفى'), 'مستشفي')
+        self.assertEqual(normalize('حبة'), 'حبه')
+        self.assertEqual(normalize('بـاراسيتامول'), 'باراسيتامول')
+
+    def test_lowercases_and_collapses_whitespace(self):
+        self.assertEqual(normalize('  Amoxicillin   500 MG '), 'amoxicillin 500 mg')
+
+
+class DrugSearchTests(APITestCase):
+    def setUp(self):
+        self.category, self.dosage_form = create_catalog()
+        self.amoxicillin = create_drug(self.category, self.dosage_form, 'Amoxicillin', 'أموكسيسيلين')
+        self.paracetamol = create_drug(
+            self.category, self.dosage_form, 'Paracetamol', 'باراسيتامول',
+            description='Pain and fever relief'
+        )
+        self.inactive = create_drug(self.category, self.dosage_form, 'Amoxil', 'اموكسيل', status=False)
+        use_snapshot_dir(self)
+
+        user = User.objects.create_user(email='doctor@test.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+
+    def test_search_fields_follow_saves(self):
+        self.assertEqual(self.amoxicillin.search_name_arabic, 'اموكسيسيلين')
+
+        self.amoxicillin.name = 'Amoxicillin Forte'
+        self.amoxicillin.save(update_fields=['name'])
+
+        self.amoxicillin.refresh_from_db()
+        self.assertEqual(self.amoxicillin.search_name, 'amoxicillin forte')
+
+    def test_search_matches_either_language_and_description(self):
+        self.assertEqual(list(search_drugs(Drug.objects.all(), 'اموكسيسيلين')), [self.amoxicillin])
+        self.assertEqual(list(search_drugs(Drug.objects.all(), 'FEVER')), [self.paracetamol])
+
+    def test_name_prefix_ranks_first(self):
+        description_match = create_drug(
+            self.category, self.dosage_form, 'Co-amoxiclav', 'كو اموكسيكلاف',
+            description='Contains amoxicillin'
+        )
+
+        results = list(search_drugs(Drug.objects.filter(status=True), 'amoxicillin'))
+        self.assertEqual(results, [self.amoxicillin, description_match])
+
+    def test_list_endpoint_uses_search(self):
+        response = self.client.get('/api/v1/drugs/', {'search': 'باراسيتامول'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        drugs = response.data['results']['data']['drugs']
+        self.assertEqual([drug['name'] for drug in drugs], ['Paracetamol'])
+
+    def test_autocomplete_returns_active_prefix_matches(self):
+        self.assertEqual(list(autocomplete(Drug.objects.all(), 'amox')), [self.amoxicillin])
+
+        # No snapshot built yet, so this is answered from the database
+        response = self.client.get('/api/v1/drugs/autocomplete/', {'q': 'إموك', 'limit': 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['drugs'], [{
+            'id': str(self.amoxicillin.id),
+            'name': 'Amoxicillin',
+            'name_arabic': 'أموكسيسيلين',
+            'strength': '500mg',
+            'dosage_form': 'Tablet',
+            'dosage_form_arabic': 'أقراص',
+        }])
+
+    def test_autocomplete_without_query(self):
+        response = self.client.get('/api/v1/drugs/autocomplete/')
+        self.assertEqual(response.data['data']['drugs'], [])
+
+
+class DrugAutocompleteSnapshotTests(APITestCase):
+    def setUp(self):
+        self.directory = use_snapshot_dir(self)
+        self.category, self.dosage_form = create_catalog()
+        self.drugs = [
+            create_drug(self.category, self.dosage_form, name, name_arabic, strength=strength)
+            for name, name_arabic, strength in [
+                ('Amoxicillin', 'أموكسيسيلين', '250mg'),
+                ('Amoxicillin', 'أموكسيسيلين', '500mg'),
+                ('Amlodipine', 'أملوديبين', '5mg'),
+                ('Paracetamol', 'باراسيتامول', '500mg'),
+            ]
+        ]
+        # Last edited well before the snapshot, outside the refresh overlap
+        Drug.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        refresh_snapshot()
+        self.index = self.open()
+
+        user = User.objects.create_user(email='doctor@test.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+
+    def open(self):
+        index = DrugAutocompleteIndex(current_snapshot_path(self.directory))
+        self.addCleanup(index.close)
+        return index
+
+    def names(self, results):
+        return [(result['name'], result['strength']) for result in results]
+
+    def test_prefix_search_in_both_languages(self):
+        self.assertEqual(self.index.record_count, 4)
+        self.assertEqual(
+            self.names(self.index.search('am', 10)),
+            [('Amlodipine', '5mg'), ('Amoxicillin', '250mg'), ('Amoxicillin', '500mg')]
+        )
+        self.assertEqual(self.names(self.index.search('amoxicillin 5', 10)), [('Amoxicillin', '500mg')])
+        self.assertEqual(self.names(self.index.search('اموكسيسيلين 250', 10)), [('Amoxicillin', '250mg')])
+        self.assertEqual(self.names(self.index.search('AM', 1)), [('Amlodipine', '5mg')])
+        self.assertEqual(self.index.search('zz', 10), [])
+
+    def test_endpoint_never_queries_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/drugs/autocomplete/', {'q': 'para'})
+
+        self.assertEqual(response.data['data']['drugs'], [{
+            'id': str(self.drugs[3].id),
+            'name': 'Paracetamol',
+            'name_arabic': 'باراسيتامول',
+            'strength': '500mg',
+            'dosage_form': 'Tablet',
+            'dosage_form_arabic': 'أقراص',
+        }])
+
+    def test_incremental_refresh(self):
+        renamed, deactivated, deleted, _ = self.drugs
+        renamed.name = 'Amoxicillin Forte'
+        renamed.save()
+        deactivated.status = False
+        deactivated.save()
+        deleted.delete()
+        create_drug(self.category, self.dosage_form, 'Ibuprofen', 'إيبوبروفين')
+
+        with patch.object(autocomplete_index, 'drug_record', wraps=autocomplete_index.drug_record) as built:
+            self.assertEqual(refresh_snapshot(), 2)
+        # Only the active rows changed since the previous snapshot were read
+        self.assertEqual(built.call_count, 2)
+
+        index = self.open()
+        self.assertEqual(
+            sorted(self.names(index.records())),
+            [('Amoxicillin Forte', '250mg'), ('Ibuprofen', '500mg'), ('Paracetamol', '500mg')]
+        )
+        self.assertIsNone(refresh_snapshot())
+
+    def test_workers_switch_to_new_versions(self):
+        self.assertEqual(autocomplete_index.get_autocomplete_index().version, 1)
+
+        create_drug(self.category, self.dosage_form, 'Ibuprofen', 'إيبوبروفين')
+        refresh_snapshot()
+
+        with patch.object(autocomplete_index, 'CHECK_INTERVAL', 0):
+            index = autocomplete_index.get_autocomplete_index()
+        self.assertEqual(index.version, 2)
+        self.assertEqual(self.names(index.search('ibu', 10)), [('Ibuprofen', '500mg')])
+
+    def test_old_snapshots_are_pruned(self):
+        for index in range(autocomplete_index.KEEP_SNAPSHOTS + 2):
+            refresh_snapshot(full=True)
+
+        snapshots = [name for name in os.listdir(self.directory) if name.endswith('.idx')]
+        self.assertEqual(len(snapshots), autocomplete_index.KEEP_SNAPSHOTS)
+
+    def test_concurrent_refreshes_run_one_at_a_time(self):
+        running = []
+        overlapped = []
+
+        def slow_refresh(directory, full):
+            running.append(full)
+            overlapped.append(len(running) > 1)
+            time.sleep(0.05)
+            running.pop()
+
+        with patch.object(autocomplete_index, '_refresh', side_effect=slow_refresh):
+            threads = [threading.Thread(target=refresh_snapshot) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(overlapped, [False, False, False])
+
+    def test_saves_queue_one_refresh(self):
+        self.addCleanup(autocomplete_index._refresh_queue._pending.clear)
+        with patch.object(autocomplete_index._refresh_queue._pool, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                for drug in self.drugs:
+                    drug.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.dosage_form.save()
+                self.drugs[0].save()
+
+        # A queued full rebuild covers later incremental refreshes
+        self.assertEqual([call.args[1] for call in submit.call_args_list], [False, True])
+
+    def test_build_command(self):
+        out = StringIO()
+        call_command('build_drug_autocomplete', full=True, stdout=out)
+        self.assertIn('Wrote snapshot 2 with 4 drugs and 8 keys', out.getvalue())
+
+
+FORMULARY = '''code,name,name_arabic,category,category_arabic,dosage_form,dosage_form_arabic,strength,manufacturer,status
+SA-001,Amoxicillin,أموكسيسيلين,Antibiotics,مضادات حيوية,Capsule,كبسولات,500mg,Acme,true
+SA-002,Amoxicillin,أموكسيسيلين,Antibiotics,مضادات حيوية,Suspension,معلق,250mg/5ml,Acme,true
+SA-003,Paracetamol,باراسيتامول,Analgesics,مسكنات,Tablet,أقراص,500mg,Acme,true
+SA-004,,بدون اسم,Analgesics,مسكنات,Tablet,أقراص,10mg,Acme,true
+'''
+
+
+class DrugCatalogImportTests(APITestCase):
+    def setUp(self):
+        use_snapshot_dir(self)
+        # An existing dosage form is matched by name, whatever its case
+        self.tablet = DrugDosageForm.objects.create(name='TABLET', name_arabic='أقراص')
+
+    def run_import(self, text, file_format=CSV, **kwargs):
+        importer = DrugCatalogImporter(**kwargs)
+        importer.run(io.BytesIO(text.encode()), file_format)
+        return importer
+
+    def test_import_creates_drugs_and_lookups(self):
+        importer = self.run_import(FORMULARY, chunk_size=2)
+
+        totals = importer.totals
+        self.assertEqual((totals['rows'], totals['created'], totals['errors']), (4, 3, 1))
+        self.assertEqual((totals['categories_created'], totals['dosage_forms_created']), (2, 2))
+        self.assertEqual(totals['chunks'], 2)
+        self.assertEqual(importer.errors, ['Line 5: Missing name'])
+
+        paracetamol = Drug.objects.get(code='SA-003')
+        self.assertEqual(paracetamol.dosage_form, self.tablet)
+        self.assertEqual(paracetamol.category.name_arabic, 'مسكنات')
+        self.assertEqual(paracetamol.search_name_arabic, 'باراسيتامول')
+        # Imports refresh the autocomplete snapshot themselves
+        self.assertEqual(autocomplete_index.get_autocomplete_index().record_count, 3)
+
+    def test_reimport_updates_in_place(self):
+        self.run_import(FORMULARY)
+        original = Drug.objects.get(code='SA-001')
+
+        importer = self.run_import(FORMULARY)
+        self.assertEqual((importer.totals['created'], importer.totals['updated']), (0, 0))
+        self.assertEqual(importer.totals['unchanged'], 3)
+
+        importer = self.run_import(FORMULARY.replace('Acme,true\nSA-002', 'Acme,false\nSA-002'))
+        self.assertEqual(importer.totals['updated'], 1)
+        updated = Drug.objects.get(code='SA-001')
+        self.assertEqual((updated.id, updated.created_at), (original.id, original.created_at))
+        self.assertFalse(updated.status)
+        self.assertEqual(Drug.objects.count(), 3)
+
+    def test_dry_run_reports_diff_without_writing(self):
+        self.run_import(FORMULARY)
+        edition = FORMULARY.replace('500mg,Acme', '650mg,Acme').replace(
+            'SA-004,,', 'SA-005,Ibuprofen,'
+        )
+
+        importer = self.run_import(edition, dry_run=True)
+
+        self.assertEqual(importer.changes, [
+            '+ SA-005 Ibuprofen 10mg',
+            "~ SA-001 strength: '500mg' -> '650mg'",
+            "~ SA-003 strength: '500mg' -> '650mg'",
+        ])
+        self.assertEqual(Drug.objects.filter(strength='650mg').count(), 0)
+        self.assertFalse(Drug.objects.filter(code='SA-005').exists())
+
+    def test_jsonl_rows_and_errors(self):
+        lines = [
+            json.dumps({
+                'code': 'SA-010', 'name': 'Ibuprofen', 'name_arabic': 'إيبوبروفين', 'category': 'Analgesics',
+                'dosage_form': 'Tablet', 'strength': '400mg', 'status': False
+            }),
+            '{not json',
+            '[1, 2]',
+        ]
+        importer = self.run_import('\n'.join(lines), file_format=JSONL)
+
+        self.assertEqual(importer.totals['created'], 1)
+        self.assertFalse(Drug.objects.get(code='SA-010').status)
+        self.assertEqual(
+            importer.errors,
+            ["Line 2: Invalid JSON: Expecting property name enclosed in double quotes",
+             'Line 3: Expected a JSON object']
+        )
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'formulary.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w', encoding='utf-8') as formulary:
+            formulary.write(FORMULARY)
+
+        out, err = StringIO(), StringIO()
+        call_command('import_drugs', path, dry_run=True, stdout=out, stderr=err)
+        self.assertIn('+ SA-001 Amoxicillin 500mg', out.getvalue())
+        self.assertIn('Dry run, nothing written. Created 3, updated 0', out.getvalue())
+        self.assertIn('Line 5: Missing name', err.getvalue())
+        self.assertEqual(Drug.objects.count(), 0)
+
+        call_command('import_drugs', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Drug.objects.count(), 3)
+
+    def test_admin_endpoint(self):
+        upload = SimpleUploadedFile('formulary.csv', FORMULARY.encode(), content_type='text/csv')
+
+        user = User.objects.create_user(email='doctor@test.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+        response = self.client.post('/api/v1/drugs/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        upload.seek(0)
+        admin = User.objects.create_user(email='admin@test.com', password='testpass123', is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.post(
+            '/api/v1/drugs/import/', {'file': upload, 'dry_run': 'true'}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['data']['dry_run'])
+        self.assertEqual(response.data['data']['totals']['created'], 3)
+        self.assertEqual(response.data['data']['errors'], ['Line 5: Missing name'])
+        self.assertEqual(Drug.objects.count(), 0)
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Search indexes are PostgreSQL specific')
+class DrugSearchQueryPlanTests(TestCase):
+    rows = 100_000
+
+    @classmethod
+    def setUpTestData(cls):
+        category, dosage_form = create_catalog()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Drug._meta.db_table} (
+                    id, name, name_arabic, description, description_arabic, category_id,
+                    dosage_form_id, strength, manufacturer, status, created_at, updated_at,
+                    search_name, search_name_arabic, search_text
+                )
+                SELECT
+                    gen_random_uuid(), 'drug ' || md5(i::text), 'دواء ' || i, '', '', %s, %s,
+                    '10mg', 'Acme', true, now(), now(),
+                    'drug ' || md5(i::text), 'دواء ' || i, 'drug ' || md5(i::text) || ' دواء ' || i
+                FROM generate_series(1, %s) AS i
+                """,
+                [category.id, dosage_form.id, cls.rows]
+            )
+            cursor.execute(f"ANALYZE {Drug._meta.db_table}")
+
+    def plan(self, queryset):
+        root = json.loads(queryset.explain(format='json'))[0]['Plan']
+        return list(plan_nodes(root))
+
+    def assertUsesIndex(self, queryset, index_name):
+        nodes = self.plan(queryset)
+        self.assertIn(index_name, {node.get('Index Name') for node in nodes})
+        self.assertNotIn(Drug._meta.db_table, {
+            node.get('Relation Name') for node in nodes if node['Node Type'] == 'Seq Scan'
+        })
+
+    def test_full_text_search_uses_gin_index(self):
+        self.assertUsesIndex(search_drugs(Drug.objects.all(), 'drug abc'), 'drug_search_document_idx')
+
+    def test_autocomplete_uses_prefix_index(self):
+        self.assertUsesIndex(autocomplete(Drug.objects.all(), 'drug ab'), 'drug_search_name_prefix_idx')
+        self.assertUsesIndex(autocomplete(Drug.objects.all(), 'دواء 12'), 'drug_search_arabic_prefix_idx')
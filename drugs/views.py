@@ -1,12 +1,16 @@
 from django.shortcuts import render
-from django.db.models import Q
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from django.utils.translation import gettext_lazy as _
 
+from config.pagination import KeysetPaginationMixin
+
 from .models import Drug, DrugCategory, DrugDosageForm
+from .autocomplete_index import get_autocomplete_index
+from .importer import CSV, JSONL, DrugCatalogImporter, detect_format
+from .search import AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, autocomplete, search_drugs
 from .serializers import (
     DrugListSerializer,
     DrugCreateSerializer,
@@ -17,7 +21,7 @@ from .serializers import (
 )
 
 
-class DrugViewSet(viewsets.ModelViewSet):
+class DrugViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Drug.objects.all()
     permission_classes = [IsAuthenticated]
     serializer_class = DrugListSerializer
@@ -26,15 +30,10 @@ class DrugViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Search functionality
+        # Ranked full-text search over both languages
         search = self.request.query_params.get("search", "")
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(name_arabic__icontains=search) |
-                Q(description__icontains=search) |
-                Q(description_arabic__icontains=search)
-            )
+            queryset = search_drugs(queryset, search)
 
         # Status filter
         status_param = self.request.query_params.get("status")
@@ -64,11 +63,12 @@ class DrugViewSet(viewsets.ModelViewSet):
         
         if page is not None:
             serializer = self.get_serializer(page, many=True)
+            data = {"drugs": serializer.data}
+            if self.keyset_paginated:
+                data["pagination"] = self.get_pagination_meta()
             return self.get_paginated_response({
                 "status": "success",
-                "data": {
-                    "drugs": serializer.data
-                }
+                "data": data
             })
 
         serializer = self.get_serializer(queryset, many=True)
@@ -131,6 +131,80 @@ class DrugViewSet(viewsets.ModelViewSet):
             "message": _("Drug deleted successfully")
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        Name prefix suggestions for the prescribing UI, in either language.
+        Served from the in-memory snapshot; the database is only queried
+        until the first snapshot has been built.
+        """
+        try:
+            limit = int(request.query_params.get("limit", AUTOCOMPLETE_LIMIT))
+        except (TypeError, ValueError):
+            limit = AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, MAX_AUTOCOMPLETE_LIMIT))
+        query = request.query_params.get("q", "")
+
+        index = get_autocomplete_index()
+        if index is not None:
+            drugs = index.search(query, limit)
+        else:
+            drugs = [
+                {
+                    "id": str(drug["id"]),
+                    "name": drug["name"],
+                    "name_arabic": drug["name_arabic"],
+                    "strength": drug["strength"],
+                    "dosage_form": drug["dosage_form__name"],
+                    "dosage_form_arabic": drug["dosage_form__name_arabic"],
+                }
+                for drug in autocomplete(Drug.objects.all(), query, limit).values(
+                    "id", "name", "name_arabic", "strength", "dosage_form__name", "dosage_form__name_arabic"
+                )
+            ]
+        return Response({
+            "status": "success",
+            "data": {
+                "drugs": drugs
+            }
+        })
+
+    @action(detail=False, methods=["post"], url_path="import", permission_classes=[IsAdminUser])
+    def import_catalog(self, request):
+        """
+        Import an uploaded CSV or JSONL formulary (see drugs.importer).
+        Pass dry_run=true to get the diff without writing. Very large files
+        are better loaded with the import_drugs management command.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({
+                "status": "error",
+                "message": _("Upload the catalog as 'file'")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get("format") or detect_format(upload.name)
+        if file_format not in (CSV, JSONL):
+            return Response({
+                "status": "error",
+                "message": _("Format must be csv or jsonl")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true", "yes")
+        importer = DrugCatalogImporter(dry_run=dry_run)
+        totals = importer.run(upload.file, file_format)
+
+        return Response({
+            "status": "success",
+            "data": {
+                "dry_run": dry_run,
+                "totals": totals,
+                "changes": importer.changes,
+                "changes_omitted": importer.changes_omitted,
+                "errors": importer.errors
+            }
+        })
+
     @action(detail=True, methods=["patch"])
     def update_status(self, request, pk=None):
         instance = self.get_object()
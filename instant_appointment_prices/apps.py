@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InstantAppointmentPricesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'instant_appointment_prices'
+
+    def ready(self):
+        # Register cache invalidation signals
+        from . import signals
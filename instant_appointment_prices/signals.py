@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.response_cache import INSTANT_PRICES, invalidate_on_commit
+from .models import InstantAppointmentPrice
+
+
+@receiver(post_save, sender=InstantAppointmentPrice)
+@receiver(post_delete, sender=InstantAppointmentPrice)
+def handle_price_change(sender, **kwargs):
+    """Invalidate cached instant appointment price lists"""
+    invalidate_on_commit(INSTANT_PRICES)
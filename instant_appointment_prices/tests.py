@@ -1,3 +1,30 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from .models import InstantAppointmentPrice
+
+
+class InstantAppointmentPriceListCacheTests(APITestCase):
+    url = '/api/v1/instant-appointment-prices/'
+
+    def setUp(self):
+        cache.clear()
+        self.price = InstantAppointmentPrice.objects.create(duration=15, price=Decimal('50.00'))
+
+    def prices(self, response):
+        return [item['price'] for item in response.data['data']['prices']]
+
+    def test_repeat_list_skips_database_until_a_price_changes(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+
+        self.price.price = Decimal('75.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.price.save()
+
+        self.assertEqual(self.prices(self.client.get(self.url)), ['75.00'])
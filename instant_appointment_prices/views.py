@@ -5,6 +5,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.exceptions import ValidationError
 from django_filters import rest_framework as django_filters
 from django.core.exceptions import ObjectDoesNotExist
+from config.response_cache import INSTANT_PRICES, cached_list
 from .models import InstantAppointmentPrice
 from .serializers import InstantAppointmentPriceSerializer
 from .pagination import CustomPagination
@@ -57,6 +58,7 @@ class InstantAppointmentPriceViewSet(viewsets.ModelViewSet):
                 "message": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @cached_list(INSTANT_PRICES)
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.filter_queryset(self.get_queryset())
@@ -0,0 +1,105 @@
+"""
+Buffered sink for integration audit events.
+
+Hot paths such as token minting record events in memory. The buffer writes
+them with a single bulk_create once it is full or its oldest event is older
+than the flush interval, and once more when the process exits, so no
+individual event costs a database round trip.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import Integration, IntegrationLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogBuffer:
+    """Thread-safe in-process buffer of IntegrationLog rows"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._errors = {}
+        self._oldest = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, integration_id, level, message, metadata=None):
+        """Queue a log entry; flushes the buffer when it is due"""
+        entry = IntegrationLog(
+            integration_id=integration_id,
+            level=level,
+            message=message,
+            metadata=metadata or {}
+        )
+        with self._lock:
+            self._entries.append(entry)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = (
+                len(self._entries) >= settings.INTEGRATION_AUDIT_BATCH_SIZE
+                or time.monotonic() - self._oldest >= settings.INTEGRATION_AUDIT_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def record_error(self, integration_id, message):
+        """Queue an error log entry and mark the integration as failing on the next flush"""
+        with self._lock:
+            self._errors[integration_id] = (message, timezone.now())
+        self.record(integration_id, 'error', message)
+
+    def flush(self):
+        """Write every buffered entry; returns the number of log rows written"""
+        with self._lock:
+            entries, self._entries = self._entries, []
+            errors, self._errors = self._errors, {}
+            self._oldest = None
+
+        if not entries and not errors:
+            return 0
+
+        try:
+            IntegrationLog.objects.bulk_create(entries)
+            for integration_id, (message, occurred_at) in errors.items():
+                # Same fields as Integration.record_error, without a save() per failure
+                Integration.objects.filter(pk=integration_id).update(
+                    status='error',
+                    last_error=message,
+                    last_error_at=occurred_at
+                )
+        except DatabaseError:
+            logger.exception(f"Dropped {len(entries)} integration audit entries")
+            return 0
+
+        if errors:
+            # update() sends no post_save, so drop the cached integration ourselves
+            from .services import AgoraService
+            AgoraService.clear_cache()
+        return len(entries)
+
+    def clear(self):
+        """Discard buffered entries without writing them"""
+        with self._lock:
+            self._entries = []
+            self._errors = {}
+            self._oldest = None
+
+
+audit_log = AuditLogBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        audit_log.flush()
+    except Exception:
+        logger.exception("Failed to flush integration audit entries on exit")
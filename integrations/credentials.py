@@ -0,0 +1,105 @@
+"""
+Single source of Agora credentials for every token builder.
+
+Each process keeps an immutable snapshot of the active credentials. Token
+requests read the snapshot directly; only every CHECK_INTERVAL seconds does a
+process compare its snapshot version with the shared counter in the cache, and
+only when the counter moved does it reload from the database. The
+integration signals bump the counter, so rotated credentials reach every
+worker within a few seconds without any per-request query or unpickling.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Used when credentials come from settings rather than an AgoraIntegration row
+DEFAULT_TOKEN_EXPIRATION = 3600
+
+
+@dataclass(frozen=True)
+class AgoraCredentials:
+    app_id: str
+    app_certificate: str
+    token_expiration_time: int = DEFAULT_TOKEN_EXPIRATION
+    max_users_per_channel: int = 2
+    recording_enabled: bool = False
+    recording_bucket: str = ''
+    integration_id: int = None
+
+
+class AgoraCredentialResolver:
+    """Resolve the active Agora credentials from a per-process snapshot"""
+
+    VERSION_KEY = 'agora_credentials_version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+        self._checked_at = None
+
+    def get(self):
+        """Return the active AgoraCredentials, or None when Agora is not configured"""
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if checked_at is not None and now - checked_at < settings.AGORA_CREDENTIALS_CHECK_INTERVAL:
+            return self._snapshot
+
+        with self._lock:
+            version = cache.get(self.VERSION_KEY, 0)
+            if self._checked_at is None or version != self._version:
+                self._snapshot = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop this process's snapshot and tell every other process to reload"""
+        with self._lock:
+            self._checked_at = None
+        self._bump()
+        # Bump again once the change is visible, so no worker keeps a stale reload
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, 1, None)
+
+    def _load(self):
+        from .models import AgoraIntegration
+
+        integration = AgoraIntegration.objects.filter(
+            is_enabled=True,
+            status='active'
+        ).order_by('-created_at').first()
+        if integration:
+            logger.debug(f"Loaded Agora credentials from integration {integration.id}")
+            return AgoraCredentials(
+                app_id=str(integration.app_id),
+                app_certificate=str(integration.app_certificate),
+                token_expiration_time=integration.token_expiration_time,
+                max_users_per_channel=integration.max_users_per_channel,
+                recording_enabled=integration.recording_enabled,
+                recording_bucket=integration.recording_bucket or '',
+                integration_id=integration.id
+            )
+
+        if settings.AGORA_APP_ID and settings.AGORA_APP_CERTIFICATE:
+            logger.debug("Loaded Agora credentials from settings")
+            return AgoraCredentials(
+                app_id=settings.AGORA_APP_ID,
+                app_certificate=settings.AGORA_APP_CERTIFICATE
+            )
+        return None
+
+
+agora_credentials = AgoraCredentialResolver()
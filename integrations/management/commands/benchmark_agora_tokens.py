@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from integrations.audit import audit_log
+from integrations.credentials import agora_credentials
+from integrations.services import AgoraService
+from video_calls.views import generate_agora_rtc_token
+
+
+class Command(BaseCommand):
+    help = 'Measures Agora token minting throughput (tokens/sec) for a single worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=5000,
+            help='Number of tokens to mint per benchmark (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+
+        if not agora_credentials.get():
+            self.stdout.write(self.style.ERROR('Agora credentials are not configured'))
+            return
+
+        self.run_benchmark(
+            'video_calls.generate_agora_rtc_token', count,
+            lambda index: generate_agora_rtc_token(f'bench_{index}', index + 1)
+        )
+
+        # Audit rows written by the benchmark are rolled back
+        with transaction.atomic():
+            self.run_benchmark(
+                'AgoraService.generate_token', count,
+                lambda index: AgoraService.generate_token(f'bench_{index}', index + 1)
+            )
+            with CaptureQueriesContext(connection) as flush_queries:
+                audit_log.flush()
+            self.stdout.write(f"  audit flush: {len(flush_queries)} queries")
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, name, count, mint):
+        mint(0)  # Warm up caches outside the measurement
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for index in range(count):
+                mint(index)
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{name}: {count} tokens in {elapsed:.3f}s, "
+            f"{count / elapsed:,.0f} tokens/sec, {len(queries)} queries"
+        ))
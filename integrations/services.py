@@ -4,7 +4,9 @@ from django.core.cache import cache
 from django.utils import timezone
 from datetime import datetime
 from agora_token_builder import RtcTokenBuilder
-from .models import AgoraIntegration, IntegrationLog
+from .audit import audit_log
+from .credentials import agora_credentials
+from .models import AgoraIntegration
 
 logger = logging.getLogger(__name__)
 
@@ -37,39 +39,46 @@ class AgoraService:
         except AgoraIntegration.DoesNotExist:
             return None
 
+    @classmethod
+    def get_credentials(cls):
+        """Get the active Agora credentials snapshot"""
+        credentials = agora_credentials.get()
+        if not credentials:
+            raise ValueError("No active Agora integration found")
+        return credentials
+
     @classmethod
     def generate_token(cls, channel_name, uid, role=1):  # 1 is publisher role
         """Generate an Agora token"""
-        integration = cls.get_integration()
-        if not integration:
-            raise ValueError("No active Agora integration found")
+        credentials = cls.get_credentials()
         
         try:
             # Generate token
-            expiration_time_in_seconds = integration.token_expiration_time
+            expiration_time_in_seconds = credentials.token_expiration_time
             current_timestamp = int(timezone.now().timestamp())
             privilegeExpiredTs = current_timestamp + expiration_time_in_seconds
             
             token = RtcTokenBuilder.buildTokenWithUid(
-                str(integration.app_id),
-                str(integration.app_certificate),
+                credentials.app_id,
+                credentials.app_certificate,
                 channel_name,
                 uid,
                 role,
                 privilegeExpiredTs
             )
             
-            # Log success
-            IntegrationLog.objects.create(
-                integration=integration,
-                level='info',
-                message=f'Generated token for channel: {channel_name}',
-                metadata={
-                    'channel_name': channel_name,
-                    'uid': str(uid),
-                    'expiration': datetime.fromtimestamp(privilegeExpiredTs).isoformat()
-                }
-            )
+            # Buffered, so minting a token never waits on the database
+            if credentials.integration_id:
+                audit_log.record(
+                    credentials.integration_id,
+                    'info',
+                    f'Generated token for channel: {channel_name}',
+                    metadata={
+                        'channel_name': channel_name,
+                        'uid': str(uid),
+                        'expiration': datetime.fromtimestamp(privilegeExpiredTs).isoformat()
+                    }
+                )
             
             return token, privilegeExpiredTs
             
@@ -77,22 +86,15 @@ class AgoraService:
             error_message = f"Failed to generate Agora token: {str(e)}"
             logger.error(error_message, exc_info=True)
             
-            # Log error
-            IntegrationLog.objects.create(
-                integration=integration,
-                level='error',
-                message=error_message
-            )
-            
-            integration.record_error(error_message)
+            # The integration is marked as failing when the buffer flushes
+            if credentials.integration_id:
+                audit_log.record_error(credentials.integration_id, error_message)
             raise
 
     @classmethod
     def validate_channel(cls, channel_name):
         """Validate a channel name"""
-        integration = cls.get_integration()
-        if not integration:
-            raise ValueError("No active Agora integration found")
+        cls.get_credentials()
             
         # Add any channel-specific validation here
         if not channel_name or len(channel_name) > 64:
@@ -103,19 +105,18 @@ class AgoraService:
     @classmethod
     def get_settings(cls):
         """Get Agora settings"""
-        integration = cls.get_integration()
-        if not integration:
-            raise ValueError("No active Agora integration found")
+        credentials = cls.get_credentials()
             
         return {
-            'app_id': integration.app_id,
-            'max_users_per_channel': integration.max_users_per_channel,
-            'token_expiration_time': integration.token_expiration_time,
-            'recording_enabled': integration.recording_enabled,
-            'recording_bucket': integration.recording_bucket if integration.recording_enabled else None
+            'app_id': credentials.app_id,
+            'max_users_per_channel': credentials.max_users_per_channel,
+            'token_expiration_time': credentials.token_expiration_time,
+            'recording_enabled': credentials.recording_enabled,
+            'recording_bucket': credentials.recording_bucket if credentials.recording_enabled else None
         }
 
     @classmethod
     def clear_cache(cls):
-        """Clear the integration cache"""
-        cache.delete(f"{cls.CACHE_KEY_PREFIX}_active") 
\ No newline at end of file
+        """Clear the cached integration and credentials in every process"""
+        cache.delete(f"{cls.CACHE_KEY_PREFIX}_active")
+        agora_credentials.invalidate()
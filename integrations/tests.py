@@ -2,14 +2,20 @@ from django.test import TestCase, override_settings, Client
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.cache import cache
+from django.core.management import call_command
 from rest_framework.test import APITestCase
 from rest_framework import status
 from datetime import timedelta
 import json
+from io import StringIO
+from unittest.mock import patch
 import hmac
 import hashlib
 from .models import Integration, IntegrationCredential, AgoraIntegration, IntegrationLog
+from .audit import audit_log
+from .credentials import AgoraCredentialResolver, agora_credentials
 from .services import AgoraService
+from video_calls.views import generate_agora_rtc_token
 import logging
 from django.conf import settings
 from django.urls import reverse
@@ -146,7 +152,8 @@ class AgoraServiceTests(TestCase):
         self.assertIsInstance(token, str)
         self.assertGreater(expiration, int(timezone.now().timestamp()))
         
-        # Check if log was created
+        # Check if log was created once the audit buffer flushes
+        audit_log.flush()
         log = IntegrationLog.objects.latest('created_at')
         self.assertEqual(log.level, 'info')
         self.assertEqual(log.integration.id, self.agora.id)
@@ -172,6 +179,110 @@ class AgoraServiceTests(TestCase):
         self.assertEqual(settings['token_expiration_time'], self.agora.token_expiration_time)
         self.assertEqual(settings['recording_enabled'], self.agora.recording_enabled)
 
+@override_settings(INTEGRATION_AUDIT_BATCH_SIZE=3, INTEGRATION_AUDIT_FLUSH_INTERVAL=60)
+class AgoraTokenAuditTests(TestCase):
+    """Token minting must not touch the database; audit rows are batched"""
+
+    def setUp(self):
+        self.agora = AgoraIntegration.objects.create(
+            name='Agora Integration',
+            is_enabled=True,
+            status='active',
+            app_id='test_app_id',
+            app_certificate='test_certificate',
+            token_expiration_time=3600
+        )
+        cache.clear()
+        AgoraService.get_credentials()
+        self.addCleanup(audit_log.clear)
+
+    def test_minting_is_free_of_queries_until_the_batch_fills(self):
+        with self.assertNumQueries(0):
+            for uid in (1, 2):
+                AgoraService.generate_token('test_channel', uid)
+
+        # The third token fills the batch and writes every row in one insert
+        with self.assertNumQueries(1):
+            AgoraService.generate_token('test_channel', 3)
+
+        self.assertEqual(len(audit_log), 0)
+        self.assertEqual(
+            sorted(log.metadata['uid'] for log in IntegrationLog.objects.all()),
+            ['1', '2', '3']
+        )
+
+    def test_failures_mark_the_integration_on_flush(self):
+        with patch('integrations.services.RtcTokenBuilder.buildTokenWithUid', side_effect=ValueError('bad')):
+            with self.assertNumQueries(0):
+                with self.assertRaises(ValueError):
+                    AgoraService.generate_token('test_channel', 1)
+
+        self.agora.refresh_from_db()
+        self.assertEqual(self.agora.status, 'active')
+
+        self.assertEqual(audit_log.flush(), 1)
+        self.agora.refresh_from_db()
+        self.assertEqual(self.agora.status, 'error')
+        self.assertIn('bad', self.agora.last_error)
+        self.assertEqual(IntegrationLog.objects.get().level, 'error')
+        self.assertIsNone(cache.get(f"{AgoraService.CACHE_KEY_PREFIX}_active"))
+
+    def test_benchmark_command_reports_throughput(self):
+        out = StringIO()
+        call_command('benchmark_agora_tokens', '--count', '20', stdout=out)
+
+        self.assertIn('AgoraService.generate_token: 20 tokens', out.getvalue())
+        self.assertIn('tokens/sec', out.getvalue())
+        self.assertFalse(IntegrationLog.objects.exists())
+
+
+class AgoraCredentialResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.agora = AgoraIntegration.objects.create(
+            name='Agora Integration',
+            is_enabled=True,
+            status='active',
+            app_id='test_app_id',
+            app_certificate='test_certificate',
+            token_expiration_time=3600
+        )
+
+    def test_tokens_reuse_the_snapshot(self):
+        self.assertEqual(agora_credentials.get().app_id, 'test_app_id')
+
+        with patch('integrations.credentials.cache') as shared_cache:
+            with self.assertNumQueries(0):
+                for uid in range(1, 4):
+                    AgoraService.generate_token('test_channel', uid)
+                    generate_agora_rtc_token('test_channel', uid)
+        shared_cache.get.assert_not_called()
+        audit_log.clear()
+
+    def test_rotation_reaches_other_workers(self):
+        other_worker = AgoraCredentialResolver()
+        self.assertEqual(other_worker.get().app_id, 'test_app_id')
+
+        # What agora_callback does when Agora rotates the credentials
+        self.agora.app_id = 'rotated_app_id'
+        self.agora.save()
+
+        self.assertEqual(agora_credentials.get().app_id, 'rotated_app_id')
+        with self.settings(AGORA_CREDENTIALS_CHECK_INTERVAL=60):
+            self.assertEqual(other_worker.get().app_id, 'test_app_id')
+        with self.settings(AGORA_CREDENTIALS_CHECK_INTERVAL=0):
+            self.assertEqual(other_worker.get().app_id, 'rotated_app_id')
+
+    @override_settings(AGORA_APP_ID='settings_app_id', AGORA_APP_CERTIFICATE='settings_certificate')
+    def test_falls_back_to_settings(self):
+        self.agora.delete()
+
+        credentials = agora_credentials.get()
+
+        self.assertEqual(credentials.app_id, 'settings_app_id')
+        self.assertIsNone(credentials.integration_id)
+
+
 class IntegrationAPITests(APITestCase):
     def setUp(self):
         self.user = User.objects.create_superuser(
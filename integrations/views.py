@@ -13,6 +13,7 @@ from .serializers import (
     IntegrationSerializer, AgoraIntegrationSerializer,
     IntegrationStatusSerializer, IntegrationLogSerializer
 )
+from .audit import audit_log
 from .services import AgoraService
 import logging
 from django.views.decorators.http import require_http_methods
@@ -79,6 +80,8 @@ class AgoraIntegrationViewSet(viewsets.ModelViewSet):
                 channel_name="test_channel",
                 uid=1
             )
+            # Diagnostics run rarely; write the buffered audit rows right away
+            audit_log.flush()
             
             # Log success
             IntegrationLog.objects.create(
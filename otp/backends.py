@@ -0,0 +1,325 @@
+"""
+Storage backends for live OTP codes.
+
+CacheOTPBackend keeps codes, attempt counters and send counters in the shared
+cache with a TTL, so issuing and verifying a code never touches the database.
+Attempts are counted with an atomic increment before the code is compared, so
+parallel guesses can never get more than OTP_MAX_ATTEMPTS comparisons between
+them. On Redis the code is stored as a plain string through a redis-py client
+for the cache's server, and the whole check runs as one script, a single
+round trip.
+
+DatabaseOTPBackend keeps the OTP table as the store, for deployments without a
+shared cache. With OTP_AUDIT_TRAIL the cache backend also writes OTP rows, as
+a record of issued and verified codes only.
+"""
+import logging
+import re
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OTP
+
+logger = logging.getLogger(__name__)
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+NOT_FOUND = 'not_found'
+MAX_ATTEMPTS = 'max_attempts'
+
+# KEYS: code, attempts. ARGV: code, max attempts.
+# Returns {outcome, attempts}; outcome 1 verified, 0 no live code, 2 wrong
+# code, -1 attempts exhausted.
+VERIFY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {0, 0}
+end
+local attempts = redis.call('INCR', KEYS[2])
+if attempts == 1 then
+    redis.call('PEXPIRE', KEYS[2], redis.call('PTTL', KEYS[1]))
+end
+local max_attempts = tonumber(ARGV[2])
+if attempts > max_attempts then
+    redis.call('DEL', KEYS[1])
+    return {-1, attempts}
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return {1, attempts}
+end
+if attempts >= max_attempts then
+    redis.call('DEL', KEYS[1])
+    return {-1, attempts}
+end
+return {2, attempts}
+"""
+SCRIPT_RESULTS = {1: VERIFIED, 0: NOT_FOUND, 2: INVALID, -1: MAX_ATTEMPTS}
+
+
+@dataclass(frozen=True)
+class IssuedOTP:
+    id: str
+    phone_number: str
+    otp_code: str
+
+
+def get_backend():
+    """Return an instance of the configured OTP_BACKEND"""
+    return import_string(settings.OTP_BACKEND)()
+
+
+def attempts_remaining(attempts):
+    return max(settings.OTP_MAX_ATTEMPTS - attempts, 0)
+
+
+@lru_cache(maxsize=4)
+def _redis_client(location):
+    import redis
+
+    # Writes go to the first server, as they do for the cache itself
+    return redis.Redis.from_url(location, decode_responses=True)
+
+
+def redis_client():
+    """
+    A redis-py client for the default cache's server, or None when that
+    cache is not Redis. Built from the public CACHES setting.
+    """
+    if not isinstance(caches[DEFAULT_CACHE_ALIAS], RedisCache):
+        return None
+    location = settings.CACHES[DEFAULT_CACHE_ALIAS]['LOCATION']
+    if isinstance(location, str):
+        location = re.split('[;,]', location)
+    return _redis_client(location[0])
+
+
+class BaseOTPBackend:
+    """Interface of an OTP store; send rate limiting is shared by every backend"""
+
+    def issue(self, phone_number, generate):
+        """
+        Return (otp, created) for the phone's live code.
+
+        A live code is reused; otherwise `generate()` supplies a new one.
+        """
+        raise NotImplementedError
+
+    def get(self, otp_id):
+        """Return the live OTP with this id, or None"""
+        raise NotImplementedError
+
+    def verify(self, phone_number, otp_code):
+        """Count one attempt and return VERIFIED, INVALID, NOT_FOUND or MAX_ATTEMPTS"""
+        return self.verify_attempt(phone_number, otp_code)[0]
+
+    def verify_attempt(self, phone_number, otp_code):
+        """Like verify(), returning (outcome, attempts remaining on the code)"""
+        raise NotImplementedError
+
+    def allow_send(self, phone_number):
+        """Count one send to the phone; False once OTP_SEND_LIMIT is reached in the window"""
+        key = f"otp:sends:{phone_number}"
+        cache.add(key, 0, settings.OTP_SEND_WINDOW)
+        try:
+            sends = cache.incr(key)
+        except ValueError:
+            # The window expired between add() and incr()
+            cache.set(key, 1, settings.OTP_SEND_WINDOW)
+            sends = 1
+        return sends <= settings.OTP_SEND_LIMIT
+
+
+class DatabaseOTPBackend(BaseOTPBackend):
+    """Live codes in the OTP table; attempts are counted with a conditional UPDATE"""
+
+    def _live(self, phone_number):
+        return OTP.objects.filter(
+            phone_number=phone_number,
+            is_verified=False,
+            expires_at__gt=timezone.now()
+        ).order_by('-created_at').first()
+
+    def issue(self, phone_number, generate):
+        otp = self._live(phone_number)
+        if otp and otp.is_valid:
+            return otp, False
+        otp = OTP.objects.create(
+            phone_number=phone_number,
+            otp_code=generate(),
+            expires_at=timezone.now() + timezone.timedelta(seconds=settings.OTP_TTL)
+        )
+        return otp, True
+
+    def get(self, otp_id):
+        try:
+            return OTP.objects.get(id=otp_id)
+        except (OTP.DoesNotExist, ValueError):
+            return None
+
+    def verify_attempt(self, phone_number, otp_code):
+        otp = self._live(phone_number)
+        if not otp:
+            return NOT_FOUND, 0
+
+        counted = OTP.objects.filter(
+            pk=otp.pk,
+            is_verified=False,
+            attempts__lt=settings.OTP_MAX_ATTEMPTS
+        ).update(attempts=F('attempts') + 1)
+        if not counted:
+            return MAX_ATTEMPTS, 0
+
+        remaining = attempts_remaining(otp.attempts + 1)
+        if otp_code == otp.otp_code:
+            # Only one of several parallel correct attempts gets to flip the flag
+            if OTP.objects.filter(pk=otp.pk, is_verified=False).update(is_verified=True):
+                return VERIFIED, remaining
+            return NOT_FOUND, 0
+
+        if not remaining:
+            return MAX_ATTEMPTS, 0
+        return INVALID, remaining
+
+
+class CacheOTPBackend(BaseOTPBackend):
+    """Live codes in the shared cache, expiring after OTP_TTL seconds"""
+
+    def __init__(self):
+        # On Redis the code is a plain string the verify script can compare
+        self.redis = redis_client()
+
+    def _code_key(self, phone_number):
+        return f"otp:code:{phone_number}"
+
+    def _attempts_key(self, phone_number):
+        return f"otp:attempts:{phone_number}"
+
+    def _owner_key(self, phone_number):
+        return f"otp:phone:{phone_number}"
+
+    def _id_key(self, otp_id):
+        return f"otp:id:{otp_id}"
+
+    def _get_code(self, phone_number):
+        if self.redis:
+            return self.redis.get(cache.make_and_validate_key(self._code_key(phone_number)))
+        return cache.get(self._code_key(phone_number))
+
+    def _add_code(self, phone_number, otp_code):
+        """Store the code unless the phone already has one; True if stored"""
+        if self.redis:
+            key = cache.make_and_validate_key(self._code_key(phone_number))
+            return bool(self.redis.set(key, otp_code, nx=True, ex=settings.OTP_TTL))
+        return cache.add(self._code_key(phone_number), otp_code, settings.OTP_TTL)
+
+    def _set_code(self, phone_number, otp_code):
+        if self.redis:
+            key = cache.make_and_validate_key(self._code_key(phone_number))
+            self.redis.set(key, otp_code, ex=settings.OTP_TTL)
+        else:
+            cache.set(self._code_key(phone_number), otp_code, settings.OTP_TTL)
+
+    def issue(self, phone_number, generate):
+        owner_key = self._owner_key(phone_number)
+        otp_code = self._get_code(phone_number)
+        if otp_code is not None:
+            otp_id = cache.get(owner_key)
+            if otp_id is not None:
+                return IssuedOTP(otp_id, phone_number, otp_code), False
+            return self._share(phone_number, otp_code), False
+
+        otp = IssuedOTP(str(uuid.uuid4()), phone_number, generate())
+        if not self._add_code(phone_number, otp.otp_code):
+            # A parallel request issued a code first; hand out that one
+            otp_code = self._get_code(phone_number)
+            if otp_code is not None:
+                return self._share(phone_number, otp_code, otp.id), False
+            self._set_code(phone_number, otp.otp_code)
+
+        cache.set_many({
+            owner_key: otp.id,
+            self._id_key(otp.id): (phone_number, otp.otp_code),
+            self._attempts_key(phone_number): 0
+        }, settings.OTP_TTL)
+
+        if settings.OTP_AUDIT_TRAIL:
+            OTP.objects.create(
+                id=otp.id,
+                phone_number=phone_number,
+                otp_code=otp.otp_code,
+                expires_at=timezone.now() + timezone.timedelta(seconds=settings.OTP_TTL)
+            )
+        return otp, True
+
+    def _share(self, phone_number, otp_code, otp_id=None):
+        """Give a code issued by another request an id of its own"""
+        otp = IssuedOTP(otp_id or str(uuid.uuid4()), phone_number, otp_code)
+        cache.set(self._id_key(otp.id), (phone_number, otp_code), settings.OTP_TTL)
+        return otp
+
+    def get(self, otp_id):
+        stored = cache.get(self._id_key(otp_id))
+        if stored is None:
+            return None
+        phone_number, otp_code = stored
+        return IssuedOTP(str(otp_id), phone_number, otp_code)
+
+    def verify_attempt(self, phone_number, otp_code):
+        if self.redis:
+            result, attempts = self._verify_script(phone_number, otp_code)
+        else:
+            result, attempts = self._verify_atomic_ops(phone_number, otp_code)
+
+        if result == VERIFIED and settings.OTP_AUDIT_TRAIL:
+            otp_id = cache.get(self._owner_key(phone_number))
+            if otp_id:
+                OTP.objects.filter(id=otp_id).update(is_verified=True)
+        return result, attempts_remaining(attempts) if result in (VERIFIED, INVALID) else 0
+
+    def _verify_script(self, phone_number, otp_code):
+        """Run the whole check inside Redis; returns (outcome, attempts counted)"""
+        script = self.redis.register_script(VERIFY_SCRIPT)
+        outcome, attempts = script(
+            keys=[
+                cache.make_and_validate_key(self._code_key(phone_number)),
+                # The cache stores integers as plain numbers, so INCR works on it
+                cache.make_and_validate_key(self._attempts_key(phone_number))
+            ],
+            args=[otp_code, settings.OTP_MAX_ATTEMPTS]
+        )
+        return SCRIPT_RESULTS[int(outcome)], int(attempts)
+
+    def _verify_atomic_ops(self, phone_number, otp_code):
+        """Same checks as VERIFY_SCRIPT for caches without scripting"""
+        code_key = self._code_key(phone_number)
+        attempts_key = self._attempts_key(phone_number)
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:
+            return NOT_FOUND, 0
+        if attempts > settings.OTP_MAX_ATTEMPTS:
+            cache.delete(code_key)
+            return MAX_ATTEMPTS, attempts
+
+        stored_code = cache.get(code_key)
+        if stored_code is None:
+            return NOT_FOUND, attempts
+        if stored_code == otp_code:
+            # delete() reports whether this call removed the key, so exactly
+            # one of several parallel correct attempts wins
+            if cache.delete(code_key):
+                cache.delete(attempts_key)
+                return VERIFIED, attempts
+            return NOT_FOUND, attempts
+        if attempts >= settings.OTP_MAX_ATTEMPTS:
+            cache.delete(code_key)
+            return MAX_ATTEMPTS, attempts
+        return INVALID, attempts
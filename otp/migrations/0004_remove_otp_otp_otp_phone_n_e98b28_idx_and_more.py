@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otp', '0003_remove_otp_otp_otp_created_a97b9c_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='otp',
+            name='otp_otp_phone_n_e98b28_idx',
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['phone_number', '-created_at'], name='otp_active_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expires_at'], name='otp_otp_expires_d5b803_idx'),
+        ),
+    ]
@@ -19,8 +19,15 @@ class OTP(models.Model):
         verbose_name_plural = 'OTPs'
         indexes = [
             models.Index(fields=['phone_number', 'otp_code']),
-            models.Index(fields=['phone_number', 'created_at']),
             models.Index(fields=['otp_code', 'created_at']),
+            # The live code for a phone (DatabaseOTPBackend); only unverified rows
+            models.Index(
+                fields=['phone_number', '-created_at'],
+                condition=models.Q(is_verified=False),
+                name='otp_active_phone_idx'
+            ),
+            # Purging expired rows in batches
+            models.Index(fields=['expires_at']),
         ]
     
     def __str__(self):
@@ -1,10 +1,9 @@
 import random
-import requests
 import logging
-from django.conf import settings
+from .backends import get_backend, VERIFIED, MAX_ATTEMPTS
 from .models import OTP
-from django.utils import timezone
 from services.email_service import EmailService
+from services.sms_gateway import get_sms_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -25,16 +24,31 @@ class OTPService:
 
     @staticmethod
     def get_otp_by_id(otp_id):
-        """Get OTP instance by ID"""
+        """Get the live OTP (exposing id and otp_code) by ID"""
         try:
-            return OTP.objects.get(id=otp_id)
-        except OTP.DoesNotExist:
-            logger.error(f"[OTP_DEBUG] OTP not found with ID: {otp_id}")
-            return None
+            otp = get_backend().get(otp_id)
+            if otp is None:
+                logger.error(f"[OTP_DEBUG] OTP not found with ID: {otp_id}")
+            return otp
         except Exception as e:
             logger.exception(f"[OTP_DEBUG] Error retrieving OTP with ID {otp_id}")
             return None
 
+    @staticmethod
+    def purge_expired(cutoff, batch_size=1000):
+        """
+        Delete OTP rows that expired before `cutoff`, at most `batch_size` per
+        DELETE so no statement holds locks on a large part of the table.
+        Returns the number of rows deleted.
+        """
+        expired = OTP.objects.filter(expires_at__lt=cutoff).order_by()
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += OTP.objects.filter(id__in=ids).delete()[0]
+
     @staticmethod
     def validate_phone_number(phone_number):
         """Validate and format phone number"""
@@ -58,83 +72,7 @@ class OTPService:
     def send_sms(phone_number, message):
         """Send SMS using Dreams API"""
         logger.info(f"[OTP_DEBUG] Attempting to send SMS to {phone_number}")
-        logger.info(f"[OTP_DEBUG] Message content: {message}")
-        
-        # In debug mode, just log the message and return success
-        if settings.DEBUG:
-            logger.info(f"[OTP_DEBUG] Debug mode: Simulating SMS send to {phone_number}")
-            logger.info(f"[OTP_DEBUG] Debug mode: Message would be: {message}")
-            return True, "SMS simulated successfully (Debug Mode)"
-        
-        # Format phone number: remove country code and leading zeros
-        if phone_number.startswith('966'):
-            phone_number = phone_number[3:]  # Remove 966
-        phone_number = phone_number.lstrip('0')  # Remove any leading zeros
-        logger.info(f"[OTP_DEBUG] Formatted number for sending: {phone_number}")
-        
-        # Validate required settings
-        required_settings = [
-            'DREAMS_SMS_API_URL',
-            'DREAMS_SMS_USER',
-            'DREAMS_SMS_SECRET_KEY',
-            'DREAMS_SMS_SENDER'
-        ]
-        
-        for setting in required_settings:
-            if not hasattr(settings, setting) or not getattr(settings, setting):
-                logger.error(f"[OTP_DEBUG] Missing required setting: {setting}")
-                return False, f"SMS configuration error: Missing {setting}"
-            
-        url = settings.DREAMS_SMS_API_URL
-        params = {
-            'user': settings.DREAMS_SMS_USER,
-            'secret_key': settings.DREAMS_SMS_SECRET_KEY,
-            'to': phone_number,
-            'message': message,
-            'sender': settings.DREAMS_SMS_SENDER
-        }
-        
-        try:
-            logger.info(f"[OTP_DEBUG] Sending SMS with params: {params}")
-            logger.info(f"[OTP_DEBUG] API URL: {url}")
-            
-            response = requests.get(url, params=params, timeout=10)
-            response_text = response.text.strip()
-            
-            logger.info(f"[OTP_DEBUG] SMS API Raw Response: {response_text}")
-            logger.info(f"[OTP_DEBUG] SMS API Response Status Code: {response.status_code}")
-            
-            # Clean response text - remove any non-numeric characters except minus sign
-            cleaned_response = ''.join(c for c in response_text if c.isdigit() or c == '-')
-            
-            # Handle different response codes
-            response_codes = {
-                '-124': "Invalid credentials or IP not whitelisted",
-                '-120': "Invalid sender ID",
-                '-110': "Invalid phone number format",
-                '-111': "Insufficient credit",
-                '1': "Success"
-            }
-            
-            if cleaned_response in response_codes:
-                is_success = cleaned_response == '1'
-                message = response_codes[cleaned_response]
-                log_method = logger.info if is_success else logger.error
-                log_method(f"[OTP_DEBUG] SMS API Response: {message}")
-                return is_success, message
-            elif cleaned_response.startswith('-'):
-                logger.error(f"[OTP_DEBUG] SMS API Error Code: {cleaned_response}")
-                return False, f"Failed to send SMS: API error {cleaned_response}"
-            else:
-                logger.info(f"[OTP_DEBUG] SMS sent with response: {cleaned_response}")
-                return True, "SMS sent successfully"
-            
-        except requests.Timeout:
-            logger.error("[OTP_DEBUG] SMS API request timed out")
-            return False, "Failed to send SMS: Request timed out"
-        except requests.RequestException as e:
-            logger.error(f"[OTP_DEBUG] SMS API request failed: {str(e)}")
-            return False, f"Failed to send SMS: {str(e)}"
+        return get_sms_gateway().send(phone_number, message)
 
     @classmethod
     def create_and_send_otp(cls, phone_number):
@@ -152,35 +90,23 @@ class OTPService:
                     'otp_id': None
                 }
                 
-            # Check for existing unverified OTP
-            existing_otp = OTP.objects.filter(
-                phone_number=validated_number,
-                is_verified=False,
-                expires_at__gt=timezone.now()
-            ).first()
-            
-            if existing_otp and existing_otp.is_valid:
-                logger.info(f"[OTP_DEBUG] Valid OTP already exists for {validated_number}")
-                message = f"""ZUWARA: Your verification code is {existing_otp.otp_code}"""
-                success, response = cls.send_sms(validated_number, message)
+            backend = get_backend()
+            if not backend.allow_send(validated_number):
+                logger.warning(f"[OTP_DEBUG] Send limit reached for {validated_number}")
                 return {
-                    'success': success,
-                    'message': response,
-                    'otp_id': str(existing_otp.id) if success else None
+                    'success': False,
+                    'message': "Too many verification codes requested. Please try again later.",
+                    'otp_id': None
                 }
-            
-            # Generate new OTP
-            otp_code = cls.generate_otp()
-            logger.info(f"[OTP_DEBUG] Generated OTP code: {otp_code} for phone: {validated_number}")
-            
-            # Create OTP record with proper expiration time
-            otp = OTP.objects.create(
-                phone_number=validated_number,
-                otp_code=otp_code,
-                expires_at=timezone.now() + timezone.timedelta(days=1)  # Set expiration to 1 day
-            )
-            logger.info(f"[OTP_DEBUG] Created OTP record - ID: {otp.id}, Phone: {validated_number}")
-            
+
+            # Reuses the live code for this phone if there is one
+            otp, created = backend.issue(validated_number, cls.generate_otp)
+            otp_code = otp.otp_code
+            if created:
+                logger.info(f"[OTP_DEBUG] Created OTP - ID: {otp.id}, Phone: {validated_number}")
+            else:
+                logger.info(f"[OTP_DEBUG] Valid OTP already exists for {validated_number}")
+
             # Prepare message
             message = f"""ZUWARA: Your verification code is {otp_code}"""
             logger.info(f"[OTP_DEBUG] Prepared SMS message: {message}")
@@ -210,44 +136,30 @@ class OTPService:
 
     @classmethod
     def verify_otp(cls, phone_number, otp_code):
-        """Verify the OTP code"""
+        """Verify the OTP code; every call counts as one attempt"""
+        verified, message, _ = cls.attempt_otp(phone_number, otp_code)
+        return verified, message
+
+    @classmethod
+    def attempt_otp(cls, phone_number, otp_code):
+        """Like verify_otp, also returning the attempts left on the code"""
         try:
             logger.info(f"Verifying OTP for {phone_number}")
-            otp = OTP.objects.filter(
-                phone_number=phone_number,
-                otp_code=otp_code,
-                is_verified=False
-            ).latest('created_at')
-            
-            if not otp.is_valid:
-                if otp.is_expired:
-                    logger.info(f"OTP expired for {phone_number}")
-                    return False, "OTP has expired"
-                if otp.attempts >= 3:
-                    logger.info(f"Maximum attempts exceeded for {phone_number}")
-                    return False, "Maximum verification attempts exceeded"
-                logger.info(f"Invalid OTP for {phone_number}")
-                return False, "Invalid OTP"
-            
-            # Increment attempts
-            otp.attempts += 1
-            
-            if otp_code == otp.otp_code:
-                otp.is_verified = True
-                otp.save()
+            validated_number, _ = cls.validate_phone_number(phone_number)
+            result, remaining = get_backend().verify_attempt(validated_number or phone_number, otp_code)
+
+            if result == VERIFIED:
                 logger.info(f"OTP verified successfully for {phone_number}")
-                return True, "OTP verified successfully"
-            
-            otp.save()
-            logger.info(f"Invalid OTP code for {phone_number}")
-            return False, "Invalid OTP code"
-            
-        except OTP.DoesNotExist:
-            logger.info(f"No valid OTP found for {phone_number}")
-            return False, "Invalid OTP"
+                return True, "OTP verified successfully", remaining
+            if result == MAX_ATTEMPTS:
+                logger.info(f"Maximum attempts exceeded for {phone_number}")
+                return False, "Maximum verification attempts exceeded", 0
+            logger.info(f"Invalid OTP for {phone_number}")
+            return False, "Invalid OTP", remaining
+
         except Exception as e:
             logger.exception("Error in verify_otp")
-            return False, f"Error verifying OTP: {str(e)}"
+            return False, f"Error verifying OTP: {str(e)}", 0
 
     @classmethod
     def create_and_send_doctor_verification(cls, phone_number, email):
@@ -1,6 +1,10 @@
-from django.test import TestCase
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.conf import settings
 from unittest.mock import patch
+from .backends import CacheOTPBackend, DatabaseOTPBackend, INVALID, VERIFIED
 from .services import OTPService
 from .models import OTP
 
@@ -62,7 +66,7 @@ class OTPServiceTests(TestCase):
         self.assertFalse(otp.is_verified)
         self.assertEqual(otp.attempts, 0)
 
-    @patch('services.email_service.SendGridAPIClient')
+    @patch('services.email_service.get_sendgrid_client')
     def test_create_and_send_doctor_verification(self, mock_sendgrid):
         """Test sending both SMS and email verification"""
         # Test data
@@ -98,3 +102,170 @@ class OTPServiceTests(TestCase):
         # Verify the same OTP code was used for both SMS and email
         self.assertIn(otp.otp_code, result['sms_status']['message'])
         mock_sendgrid.return_value.send.assert_called_once()
+
+
+@patch.object(OTPService, 'send_sms', return_value=(True, "SMS sent successfully"))
+@override_settings(OTP_BACKEND='otp.backends.CacheOTPBackend', OTP_AUDIT_TRAIL=False)
+class CacheOTPBackendTests(TestCase):
+    phone_number = "966555552022"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_issue_and_verify_without_queries(self, mock_send):
+        with self.assertNumQueries(0):
+            result = OTPService.create_and_send_otp(self.phone_number)
+            otp = OTPService.get_otp_by_id(result['otp_id'])
+            self.assertEqual(
+                OTPService.verify_otp(self.phone_number, otp.otp_code),
+                (True, "OTP verified successfully")
+            )
+        self.assertFalse(OTP.objects.exists())
+
+    def test_live_code_is_reused(self, mock_send):
+        first = OTPService.create_and_send_otp(self.phone_number)
+        second = OTPService.create_and_send_otp("0555552022")
+        self.assertEqual(
+            OTPService.get_otp_by_id(first['otp_id']).otp_code,
+            OTPService.get_otp_by_id(second['otp_id']).otp_code
+        )
+
+    def test_code_is_burned_after_max_attempts(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        code = OTPService.get_otp_by_id(result['otp_id']).otp_code
+        wrong = '000000' if code != '000000' else '111111'
+
+        self.assertEqual(OTPService.verify_otp(self.phone_number, wrong), (False, "Invalid OTP"))
+        self.assertEqual(OTPService.verify_otp(self.phone_number, wrong), (False, "Invalid OTP"))
+        self.assertEqual(
+            OTPService.verify_otp(self.phone_number, wrong),
+            (False, "Maximum verification attempts exceeded")
+        )
+        # The right code no longer works, a new send issues a fresh one
+        self.assertFalse(OTPService.verify_otp(self.phone_number, code)[0])
+        result = OTPService.create_and_send_otp(self.phone_number)
+        code = OTPService.get_otp_by_id(result['otp_id']).otp_code
+        self.assertTrue(OTPService.verify_otp(self.phone_number, code)[0])
+
+    def test_attempt_reports_attempts_remaining(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        code = OTPService.get_otp_by_id(result['otp_id']).otp_code
+        wrong = '000000' if code != '000000' else '111111'
+
+        self.assertEqual(
+            OTPService.attempt_otp(self.phone_number, wrong),
+            (False, "Invalid OTP", settings.OTP_MAX_ATTEMPTS - 1)
+        )
+        self.assertEqual(
+            OTPService.attempt_otp(self.phone_number, code),
+            (True, "OTP verified successfully", settings.OTP_MAX_ATTEMPTS - 2)
+        )
+
+    def test_parallel_guesses_are_limited_to_max_attempts(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        code = OTPService.get_otp_by_id(result['otp_id']).otp_code
+        guesses = [f"{n:06d}" for n in range(50) if f"{n:06d}" != code] + [code]
+        backend = CacheOTPBackend()
+        results = []
+        barrier = threading.Barrier(len(guesses))
+
+        def guess(candidate):
+            barrier.wait()
+            results.append(backend.verify(self.phone_number, candidate))
+
+        threads = [threading.Thread(target=guess, args=(candidate,)) for candidate in guesses]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # At most OTP_MAX_ATTEMPTS guesses were ever compared with the code
+        compared = [outcome for outcome in results if outcome in (INVALID, VERIFIED)]
+        self.assertEqual(len(results), len(guesses))
+        self.assertLessEqual(len(compared), settings.OTP_MAX_ATTEMPTS)
+
+    def test_parallel_correct_codes_verify_once(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        code = OTPService.get_otp_by_id(result['otp_id']).otp_code
+        backend = CacheOTPBackend()
+        results = []
+        barrier = threading.Barrier(3)
+
+        def guess():
+            barrier.wait()
+            results.append(backend.verify(self.phone_number, code))
+
+        threads = [threading.Thread(target=guess) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(VERIFIED), 1)
+
+    @override_settings(OTP_SEND_LIMIT=2)
+    def test_send_rate_limit(self, mock_send):
+        self.assertTrue(OTPService.create_and_send_otp(self.phone_number)['success'])
+        self.assertTrue(OTPService.create_and_send_otp(self.phone_number)['success'])
+        result = OTPService.create_and_send_otp(self.phone_number)
+        self.assertFalse(result['success'])
+        self.assertIsNone(result['otp_id'])
+        self.assertEqual(mock_send.call_count, 2)
+
+    @override_settings(OTP_AUDIT_TRAIL=True)
+    def test_audit_trail(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        code = OTPService.get_otp_by_id(result['otp_id']).otp_code
+        self.assertTrue(OTPService.verify_otp(self.phone_number, code)[0])
+
+        otp = OTP.objects.get(id=result['otp_id'])
+        self.assertEqual(otp.otp_code, code)
+        self.assertTrue(otp.is_verified)
+
+
+@patch.object(OTPService, 'send_sms', return_value=(True, "SMS sent successfully"))
+@override_settings(OTP_BACKEND='otp.backends.DatabaseOTPBackend')
+class DatabaseOTPBackendTests(TestCase):
+    phone_number = "966555552022"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_verify_counts_wrong_codes(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        otp = OTP.objects.get(id=result['otp_id'])
+        wrong = '000000' if otp.otp_code != '000000' else '111111'
+
+        for _ in range(settings.OTP_MAX_ATTEMPTS):
+            self.assertFalse(OTPService.verify_otp(self.phone_number, wrong)[0])
+        self.assertEqual(
+            OTPService.verify_otp(self.phone_number, otp.otp_code),
+            (False, "Maximum verification attempts exceeded")
+        )
+        otp.refresh_from_db()
+        self.assertEqual(otp.attempts, settings.OTP_MAX_ATTEMPTS)
+        self.assertFalse(otp.is_verified)
+
+    def test_attempt_reports_attempts_remaining(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        otp = OTP.objects.get(id=result['otp_id'])
+        wrong = '000000' if otp.otp_code != '000000' else '111111'
+
+        for remaining in range(settings.OTP_MAX_ATTEMPTS - 1, 0, -1):
+            self.assertEqual(
+                OTPService.attempt_otp(self.phone_number, wrong),
+                (False, "Invalid OTP", remaining)
+            )
+        self.assertEqual(
+            OTPService.attempt_otp(self.phone_number, wrong),
+            (False, "Maximum verification attempts exceeded", 0)
+        )
+
+    def test_verify_marks_otp_verified_once(self, mock_send):
+        result = OTPService.create_and_send_otp(self.phone_number)
+        otp = OTP.objects.get(id=result['otp_id'])
+
+        self.assertTrue(OTPService.verify_otp(self.phone_number, otp.otp_code)[0])
+        self.assertNotEqual(DatabaseOTPBackend().verify(self.phone_number, otp.otp_code), VERIFIED)
+        otp.refresh_from_db()
+        self.assertTrue(otp.is_verified)
@@ -30,6 +30,10 @@ class Patient(models.Model):
         verbose_name = 'Patient'
         verbose_name_plural = 'Patients'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the patient list
+            models.Index(fields=['created_at', 'id'], name='patient_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -1,12 +1,16 @@
 from rest_framework import serializers
+from services.images import ImageDerivativesField
 from .models import Patient
 
 class PatientSerializer(serializers.ModelSerializer):
+    photo_derivatives = ImageDerivativesField(source='photo')
+
     class Meta:
         model = Patient
         fields = [
             'id', 'name_arabic', 'name', 'sex', 'email', 'phone',
-            'date_of_birth', 'status', 'photo', 'created_at', 'updated_at'
+            'date_of_birth', 'status', 'photo', 'photo_derivatives',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -8,6 +8,7 @@ from .models import Patient
 from .serializers import PatientSerializer, PatientStatusSerializer
 from services.email_service import EmailService
 from otp.services import OTPService
+from config.pagination import KeysetPaginationMixin
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,7 +28,7 @@ class PatientFilter(filters.FilterSet):
         model = Patient
         fields = ['status', 'search']
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
     filterset_class = PatientFilter
@@ -43,12 +44,7 @@ class PatientViewSet(viewsets.ModelViewSet):
                 "status": "success",
                 "data": {
                     "patients": serializer.data,
-                    "pagination": {
-                        "total": self.paginator.page.paginator.count,
-                        "pages": self.paginator.page.paginator.num_pages,
-                        "page": self.paginator.page.number,
-                        "limit": self.paginator.page_size
-                    }
+                    "pagination": self.get_pagination_meta()
                 }
             })
 
@@ -0,0 +1,328 @@
+"""
+Prescription PDFs, rendered once per prescription version.
+
+Everything printed on a prescription, its updated_at included, is collected
+into a document and hashed. The hash names the cached file under
+MEDIA_ROOT/prescriptions/pdf/<prescription id>/, doubles as the download's
+ETag and changes whenever the prescription or one of its drugs or tests does.
+Downloading an unchanged prescription again only streams the file back.
+Saves pre-render the new version in the background (see signals.py) so even
+the first download rarely waits for it.
+
+The PDF is written directly (PDF 1.4 with the standard Helvetica fonts, no
+extra dependency). The standard fonts only cover Latin script, so the English
+names are printed.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import textwrap
+import uuid
+import zipfile
+import zlib
+
+from django.conf import settings
+
+from config.background import BackgroundQueue
+from .serializers import prescription_prefetches
+
+# Bump when the layout changes so every cached PDF is rendered again
+RENDER_VERSION = 1
+PDF_DIR = os.path.join('prescriptions', 'pdf')
+COPY_CHUNK_SIZE = 64 * 1024
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+REGULAR, BOLD = 'F1', 'F2'
+
+
+def with_pdf_relations(queryset):
+    """Load everything prescription_document reads in a fixed number of queries"""
+    return queryset.select_related('appointment__doctor').prefetch_related(*prescription_prefetches())
+
+
+def patients_by_id(prescriptions):
+    from patients.models import Patient
+
+    patient_ids = set()
+    for prescription in prescriptions:
+        try:
+            patient_ids.add(uuid.UUID(str(prescription.appointment.patient_id)))
+        except ValueError:
+            continue
+    if not patient_ids:
+        return {}
+    return {str(patient.id): patient for patient in Patient.objects.filter(id__in=patient_ids)}
+
+
+def prescription_document(prescription, patient=None):
+    """Everything printed on the prescription, as plain JSON-able values"""
+    appointment = prescription.appointment
+    return {
+        'render_version': RENDER_VERSION,
+        'id': prescription.id,
+        'updated_at': prescription.updated_at.isoformat(),
+        'date': appointment.slot_time.date().isoformat(),
+        'doctor': appointment.doctor.name,
+        'patient': patient.name if patient else '',
+        'diagnosis': prescription.diagnosis,
+        'notes': prescription.notes,
+        'follow_up_date': prescription.follow_up_date.isoformat() if prescription.follow_up_date else '',
+        'drugs': [
+            {
+                'name': item.drug.name,
+                'strength': item.drug.strength,
+                'dosage_form': item.drug.dosage_form.name,
+                'dosage': item.dosage,
+                'frequency': item.get_frequency_display(),
+                'duration': f"{item.duration} {item.get_duration_unit_display().lower()}",
+                'route': item.get_route_display(),
+                'instructions': item.instructions,
+            }
+            for item in prescription.prescribed_drugs.all()
+        ],
+        'tests': [
+            {
+                'test_name': test.test_name,
+                'urgency': test.get_urgency_display(),
+                'description': test.description,
+                'notes': test.notes,
+            }
+            for test in prescription.test_recommendations.all()
+        ],
+    }
+
+
+def document_key(document):
+    encoded = json.dumps(document, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _lines(document):
+    """(font, size, text) for every printed line, in order"""
+    lines = [
+        (BOLD, 18, 'Prescription'),
+        (REGULAR, 10, f"Date: {document['date']}"),
+        (REGULAR, 10, f"Doctor: Dr. {document['doctor']}"),
+    ]
+    if document['patient']:
+        lines.append((REGULAR, 10, f"Patient: {document['patient']}"))
+    lines += [(REGULAR, 10, ''), (BOLD, 12, 'Diagnosis'), (REGULAR, 10, document['diagnosis'])]
+
+    if document['drugs']:
+        lines += [(REGULAR, 10, ''), (BOLD, 12, 'Medications')]
+        for number, drug in enumerate(document['drugs'], start=1):
+            lines.append((BOLD, 10, f"{number}. {drug['name']} {drug['strength']} ({drug['dosage_form']})"))
+            lines.append((REGULAR, 10, (
+                f"{drug['dosage']}, {drug['frequency']}, for {drug['duration']}, {drug['route']}"
+            )))
+            if drug['instructions']:
+                lines.append((REGULAR, 10, drug['instructions']))
+
+    if document['tests']:
+        lines += [(REGULAR, 10, ''), (BOLD, 12, 'Recommended Tests')]
+        for test in document['tests']:
+            lines.append((BOLD, 10, f"{test['test_name']} ({test['urgency']})"))
+            for text in (test['description'], test['notes']):
+                if text:
+                    lines.append((REGULAR, 10, text))
+
+    if document['notes']:
+        lines += [(REGULAR, 10, ''), (BOLD, 12, 'Notes'), (REGULAR, 10, document['notes'])]
+    if document['follow_up_date']:
+        lines += [(REGULAR, 10, ''), (REGULAR, 10, f"Follow-up: {document['follow_up_date']}")]
+    return lines
+
+
+def _pdf_string(text):
+    encoded = text.encode('cp1252', errors='replace')
+    return b'(' + encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _pages(document):
+    """Content stream of each page, wrapping long lines and breaking pages as needed"""
+    pages, commands = [], []
+    y = PAGE_HEIGHT - MARGIN
+    for font, size, text in _lines(document):
+        # Helvetica averages about half an em per character
+        width = int((PAGE_WIDTH - 2 * MARGIN) / (size * 0.5))
+        for paragraph in (text.splitlines() or ['']):
+            for line in textwrap.wrap(paragraph, width) or ['']:
+                y -= size * 1.4
+                if y < MARGIN:
+                    pages.append(b'\n'.join(commands))
+                    commands = []
+                    y = PAGE_HEIGHT - MARGIN - size * 1.4
+                if line:
+                    commands.append(
+                        b'BT /%s %d Tf %d %.1f Td %s Tj ET' % (font.encode(), size, MARGIN, y, _pdf_string(line))
+                    )
+    pages.append(b'\n'.join(commands))
+    return pages
+
+
+def render_pdf(document):
+    pages = _pages(document)
+    # 1 catalog, 2 page tree, 3 and 4 fonts, then a page and its content per page
+    page_ids = [5 + 2 * index for index in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(pages)
+        ),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    for page_id, content in zip(page_ids, pages):
+        stream = zlib.compress(content)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, page_id + 1)
+        )
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def pdf_directory(prescription_id):
+    return os.path.join(settings.MEDIA_ROOT, PDF_DIR, str(prescription_id))
+
+
+def cached_pdf(prescription, patient=None, document=None):
+    """
+    Path of the prescription's current PDF, rendering it only when this
+    version has not been rendered yet. Returns (path, key).
+    """
+    document = document or prescription_document(prescription, patient)
+    key = document_key(document)
+    directory = pdf_directory(prescription.id)
+    path = os.path.join(directory, f'{key}.pdf')
+    if os.path.exists(path):
+        return path, key
+
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(render_pdf(document))
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+    # Older versions are never served again
+    for name in os.listdir(directory):
+        if name.endswith('.pdf') and name != f'{key}.pdf':
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                # Removed by a concurrent render
+                pass
+    return path, key
+
+
+def open_cached_pdf(prescription, patient=None, document=None):
+    """
+    cached_pdf(), opened for reading. Returns (file, key).
+
+    A concurrent render of another version can remove the file between
+    cached_pdf() returning and the open; it is rendered again once then.
+    An open file stays readable after it is removed.
+    """
+    document = document or prescription_document(prescription, patient)
+    path, key = cached_pdf(prescription, document=document)
+    try:
+        return open(path, 'rb'), key
+    except FileNotFoundError:
+        path, key = cached_pdf(prescription, document=document)
+        return open(path, 'rb'), key
+
+
+def remove_cached_pdfs(prescription_id):
+    shutil.rmtree(pdf_directory(prescription_id), ignore_errors=True)
+
+
+def prerender(prescription_id):
+    """Render the prescription's current version if it is not cached yet"""
+    from .models import Prescription
+
+    prescription = with_pdf_relations(Prescription.objects.filter(id=prescription_id)).first()
+    if prescription is None:
+        return None
+    patient = patients_by_id([prescription]).get(str(prescription.appointment.patient_id))
+    return cached_pdf(prescription, patient)[0]
+
+
+# A failed pre-render is left to the download
+_prerender_queue = BackgroundQueue('prescription-pdf', prerender)
+
+
+def schedule_prerender(prescription_id):
+    # One save can touch a prescription and many of its drugs; queue it once
+    _prerender_queue.schedule(prescription_id)
+
+
+def export_filename(document):
+    return f"prescription-{document['date']}-{document['id']}.pdf"
+
+
+class _ZipStream:
+    """Write-only file object collecting what ZipFile writes until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(prescriptions):
+    """
+    Yield a zip of the prescriptions' PDFs piece by piece, rendering the ones
+    not cached yet. `prescriptions` should come from with_pdf_relations().
+    """
+    sink = _ZipStream()
+    # PDF streams are already compressed; storing them keeps the export cheap
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        batch = []
+        for prescription in prescriptions:
+            batch.append(prescription)
+            if len(batch) == 100:
+                yield from _zip_batch(archive, sink, batch)
+                batch = []
+        yield from _zip_batch(archive, sink, batch)
+    yield sink.drain()
+
+
+def _zip_batch(archive, sink, prescriptions):
+    patients = patients_by_id(prescriptions)
+    for prescription in prescriptions:
+        document = prescription_document(prescription, patients.get(str(prescription.appointment.patient_id)))
+        source, _ = open_cached_pdf(prescription, document=document)
+        with source, archive.open(export_filename(document), 'w') as target:
+            for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+                target.write(chunk)
+                yield sink.drain()
+        yield sink.drain()
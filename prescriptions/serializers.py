@@ -1,7 +1,65 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
 from rest_framework import serializers
+from drugs.models import Drug
 from drugs.serializers import DrugSerializer
 from .models import Prescription, PrescribedDrug, TestRecommendation
 
+# Fields a prescription's drugs and tests are written with; an update only
+# rewrites children whose values changed
+PRESCRIBED_DRUG_FIELDS = (
+    'drug', 'dosage', 'frequency', 'duration', 'duration_unit', 'route', 'instructions'
+)
+TEST_RECOMMENDATION_FIELDS = ('test_name', 'description', 'urgency', 'notes')
+
+
+def prescription_prefetches():
+    """Everything PrescriptionSerializer renders, loaded in one query per relation"""
+    return [
+        Prefetch(
+            'prescribed_drugs',
+            queryset=PrescribedDrug.objects.select_related('drug__category', 'drug__dosage_form')
+        ),
+        'test_recommendations',
+    ]
+
+
+def sync_children(model, existing, values, fields, key):
+    """
+    Make a prescription's drugs or tests match `values` (unsaved instances)
+    with at most one DELETE, one INSERT and one UPDATE. Existing rows are
+    matched on `key`, in order when it repeats.
+    """
+    unmatched = defaultdict(list)
+    for child in existing:
+        unmatched[key(child)].append(child)
+
+    attnames = [model._meta.get_field(field).attname for field in fields]
+    created, changed = [], []
+    for child in values:
+        matches = unmatched.get(key(child))
+        if not matches:
+            created.append(child)
+            continue
+        current = matches.pop(0)
+        if any(getattr(current, name) != getattr(child, name) for name in attnames):
+            for name in attnames:
+                setattr(current, name, getattr(child, name))
+            current.updated_at = timezone.now()
+            changed.append(current)
+
+    stale = [child.pk for children in unmatched.values() for child in children]
+    if stale:
+        model.objects.filter(pk__in=stale).delete()
+    if created:
+        model.objects.bulk_create(created)
+    if changed:
+        model.objects.bulk_update(changed, [*fields, 'updated_at'])
+
 class TestRecommendationSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestRecommendation
@@ -11,11 +69,45 @@ class TestRecommendationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves from `prefetched` (pk string -> instance) before querying"""
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched and str(data) in self.prefetched:
+            return self.prefetched[str(data)]
+        return super().to_internal_value(data)
+
+
+class PrescribedDrugListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # Look every drug up in one query rather than one per item
+        drug_field = self.child.fields['drug']
+        if isinstance(data, list):
+            pks = {str(item.get('drug')) for item in data if isinstance(item, dict) and item.get('drug')}
+            queryset = drug_field.get_queryset()
+            pk_field = queryset.model._meta.pk
+            valid = []
+            for pk in pks:
+                try:
+                    valid.append(pk_field.to_python(pk))
+                except ValidationError:
+                    # Left for the field to reject with its usual message
+                    continue
+            drug_field.prefetched = {str(pk): drug for pk, drug in queryset.in_bulk(valid).items()}
+        try:
+            return super().to_internal_value(data)
+        finally:
+            drug_field.prefetched = None
+
+
 class PrescribedDrugSerializer(serializers.ModelSerializer):
+    drug = PrefetchedPrimaryKeyRelatedField(queryset=Drug.objects.all())
     drug_details = DrugSerializer(source='drug', read_only=True)
     
     class Meta:
         model = PrescribedDrug
+        list_serializer_class = PrescribedDrugListSerializer
         fields = [
             'id', 'drug', 'drug_details', 'dosage', 'frequency',
             'duration', 'duration_unit', 'route', 'instructions',
@@ -47,39 +139,57 @@ class PrescriptionCreateSerializer(serializers.ModelSerializer):
             'prescribed_drugs', 'test_recommendations'
         ]
     
+    @transaction.atomic
     def create(self, validated_data):
         prescribed_drugs_data = validated_data.pop('prescribed_drugs')
         test_recommendations_data = validated_data.pop('test_recommendations', [])
         
         prescription = Prescription.objects.create(**validated_data)
         
-        # Create prescribed drugs
-        for drug_data in prescribed_drugs_data:
-            PrescribedDrug.objects.create(prescription=prescription, **drug_data)
-        
-        # Create test recommendations
-        for test_data in test_recommendations_data:
-            TestRecommendation.objects.create(prescription=prescription, **test_data)
+        # One INSERT each for all the drugs and all the tests
+        PrescribedDrug.objects.bulk_create([
+            PrescribedDrug(prescription=prescription, **drug_data)
+            for drug_data in prescribed_drugs_data
+        ])
+        TestRecommendation.objects.bulk_create([
+            TestRecommendation(prescription=prescription, **test_data)
+            for test_data in test_recommendations_data
+        ])
         
         return prescription
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        prescribed_drugs_data = validated_data.pop('prescribed_drugs', [])
-        test_recommendations_data = validated_data.pop('test_recommendations', [])
+        prescribed_drugs_data = validated_data.pop('prescribed_drugs', None)
+        test_recommendations_data = validated_data.pop('test_recommendations', None)
         
         # Update prescription fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         
-        # Update prescribed drugs
-        instance.prescribed_drugs.all().delete()
-        for drug_data in prescribed_drugs_data:
-            PrescribedDrug.objects.create(prescription=instance, **drug_data)
+        # Drugs and tests left out of a partial update are kept as they are
+        if prescribed_drugs_data is not None:
+            sync_children(
+                PrescribedDrug,
+                PrescribedDrug.objects.filter(prescription=instance).order_by('id'),
+                [PrescribedDrug(prescription=instance, **drug_data) for drug_data in prescribed_drugs_data],
+                PRESCRIBED_DRUG_FIELDS,
+                key=lambda child: child.drug_id
+            )
+        if test_recommendations_data is not None:
+            sync_children(
+                TestRecommendation,
+                TestRecommendation.objects.filter(prescription=instance).order_by('id'),
+                [TestRecommendation(prescription=instance, **test_data) for test_data in test_recommendations_data],
+                TEST_RECOMMENDATION_FIELDS,
+                key=lambda child: child.test_name
+            )
         
-        # Update test recommendations
-        instance.test_recommendations.all().delete()
-        for test_data in test_recommendations_data:
-            TestRecommendation.objects.create(prescription=instance, **test_data)
-        
-        return instance 
\ No newline at end of file
+        return instance
+
+    def to_representation(self, instance):
+        # The response nests every drug; DRF also drops the prefetch cache
+        # after an update, so load it here rather than per drug
+        prefetch_related_objects([instance], *prescription_prefetches())
+        return super().to_representation(instance)
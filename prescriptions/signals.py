@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PrescribedDrug, Prescription, TestRecommendation
+from .pdf import remove_cached_pdfs, schedule_prerender
+
+
+@receiver(post_save, sender=Prescription)
+def handle_prescription_saved(sender, instance, **kwargs):
+    """Render the new version's PDF once the save is committed"""
+    transaction.on_commit(lambda: schedule_prerender(instance.pk))
+
+
+@receiver(post_save, sender=PrescribedDrug)
+@receiver(post_delete, sender=PrescribedDrug)
+@receiver(post_save, sender=TestRecommendation)
+@receiver(post_delete, sender=TestRecommendation)
+def handle_prescription_item_changed(sender, instance, **kwargs):
+    """
+    Drugs and tests added or edited on their own also change what is printed.
+    Bulk writes from PrescriptionCreateSerializer send no signals; the
+    prescription's own save covers them.
+    """
+    prescription_id = instance.prescription_id
+    transaction.on_commit(lambda: schedule_prerender(prescription_id))
+
+
+@receiver(post_delete, sender=Prescription)
+def handle_prescription_deleted(sender, instance, **kwargs):
+    prescription_id = instance.pk
+    transaction.on_commit(lambda: remove_cached_pdfs(prescription_id))
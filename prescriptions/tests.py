@@ -0,0 +1,261 @@
+from datetime import timedelta
+
+import io
+import os
+import zipfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from appointments.models import Appointment
+from appointments.tests.test_booking import create_doctor, create_specialty
+from config.testing import use_media_root
+from drugs.tests import create_catalog, create_drug
+
+from prescriptions import pdf
+from prescriptions.models import PrescribedDrug, Prescription, TestRecommendation
+
+User = get_user_model()
+
+PRESCRIPTIONS_URL = '/api/v1/prescriptions/prescriptions/'
+
+
+class PrescriptionAPITestCase(APITestCase):
+    def setUp(self):
+        self.doctor = create_doctor(create_specialty())
+        user = User.objects.create_user(
+            email=self.doctor.email,
+            password='testpass123',
+            first_name='Booking',
+            last_name='Doctor'
+        )
+        self.client.force_authenticate(user=user)
+        category, dosage_form = create_catalog()
+        self.drugs = [
+            create_drug(category, dosage_form, f'Drug {index}', f'دواء {index}')
+            for index in range(8)
+        ]
+
+    def create_appointment(self, hours=1):
+        return Appointment.objects.create(
+            doctor=self.doctor,
+            specialist_category='General',
+            gender='F',
+            duration='30',
+            language='arabic',
+            phone_number='966500000000',
+            slot_time=timezone.now() + timedelta(hours=hours)
+        )
+
+    def payload(self, appointment, drugs, tests=0, dosage='500mg'):
+        return {
+            'appointment': appointment.id,
+            'diagnosis': 'Sinusitis',
+            'prescribed_drugs': [
+                {
+                    'drug': str(drug.id),
+                    'dosage': dosage,
+                    'frequency': 'BD',
+                    'duration': 7
+                }
+                for drug in drugs
+            ],
+            'test_recommendations': [
+                {'test_name': f'Test {index}'}
+                for index in range(tests)
+            ]
+        }
+
+    def create(self, drugs, tests=0, hours=1):
+        appointment = self.create_appointment(hours)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(PRESCRIPTIONS_URL, self.payload(appointment, drugs, tests), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Prescription.objects.get(appointment=appointment), len(queries)
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response, len(queries)
+
+
+class PrescriptionQueryTests(PrescriptionAPITestCase):
+    def test_create_query_count_does_not_grow_with_drugs(self):
+        small, small_queries = self.create(self.drugs[:1], tests=1, hours=1)
+        large, large_queries = self.create(self.drugs, tests=5, hours=2)
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(large.prescribed_drugs.count(), 8)
+        self.assertEqual(large.test_recommendations.count(), 5)
+
+    def test_reads_query_count_does_not_grow_with_drugs(self):
+        small, _ = self.create(self.drugs[:1], hours=1)
+        _, small_queries = self.count_queries('get', f'{PRESCRIPTIONS_URL}{small.id}/')
+        _, small_list_queries = self.count_queries('get', PRESCRIPTIONS_URL)
+
+        large, _ = self.create(self.drugs, tests=3, hours=2)
+        response, large_queries = self.count_queries('get', f'{PRESCRIPTIONS_URL}{large.id}/')
+        _, large_list_queries = self.count_queries('get', PRESCRIPTIONS_URL)
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(small_list_queries, large_list_queries)
+        self.assertEqual(len(response.data['prescribed_drugs']), 8)
+
+    def test_update_only_rewrites_what_changed(self):
+        prescription, _ = self.create(self.drugs[:3], tests=2)
+        kept = PrescribedDrug.objects.get(prescription=prescription, drug=self.drugs[0])
+        removed = PrescribedDrug.objects.get(prescription=prescription, drug=self.drugs[2])
+
+        payload = self.payload(prescription.appointment, [self.drugs[0], self.drugs[1], self.drugs[3]], tests=1)
+        payload['prescribed_drugs'][1]['dosage'] = '250mg'
+        response, _ = self.count_queries('put', f'{PRESCRIPTIONS_URL}{prescription.id}/', payload)
+
+        drugs = {item.drug_id: item for item in prescription.prescribed_drugs.all()}
+        self.assertEqual(set(drugs), {self.drugs[0].id, self.drugs[1].id, self.drugs[3].id})
+        self.assertEqual(drugs[self.drugs[0].id].pk, kept.pk)
+        self.assertEqual(drugs[self.drugs[0].id].updated_at, kept.updated_at)
+        self.assertEqual(drugs[self.drugs[1].id].dosage, '250mg')
+        self.assertFalse(PrescribedDrug.objects.filter(pk=removed.pk).exists())
+        self.assertEqual(list(prescription.test_recommendations.values_list('test_name', flat=True)), ['Test 0'])
+        self.assertEqual(len(response.data['prescribed_drugs']), 3)
+
+    def test_update_query_count_does_not_grow_with_drugs(self):
+        small, _ = self.create(self.drugs[:2], hours=1)
+        large, _ = self.create(self.drugs[:6], hours=2)
+
+        def replace(prescription, drugs):
+            payload = self.payload(prescription.appointment, drugs, dosage='1g')
+            return self.count_queries('put', f'{PRESCRIPTIONS_URL}{prescription.id}/', payload)[1]
+
+        self.assertEqual(replace(small, self.drugs[1:3]), replace(large, self.drugs[1:7]))
+
+    def test_partial_update_keeps_lists_it_leaves_out(self):
+        prescription, _ = self.create(self.drugs[:2], tests=1)
+
+        self.count_queries('patch', f'{PRESCRIPTIONS_URL}{prescription.id}/', {'diagnosis': 'Otitis'})
+
+        prescription.refresh_from_db()
+        self.assertEqual(prescription.diagnosis, 'Otitis')
+        self.assertEqual(prescription.prescribed_drugs.count(), 2)
+        self.assertEqual(TestRecommendation.objects.filter(prescription=prescription).count(), 1)
+
+    def test_unknown_drug_is_rejected(self):
+        appointment = self.create_appointment()
+        payload = self.payload(appointment, self.drugs[:1])
+        payload['prescribed_drugs'].append({
+            'drug': '00000000-0000-0000-0000-000000000000', 'dosage': '1', 'frequency': 'OD', 'duration': 1
+        })
+        payload['prescribed_drugs'].append({'drug': 'not-a-uuid', 'dosage': '1', 'frequency': 'OD', 'duration': 1})
+
+        response = self.client.post(PRESCRIPTIONS_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Prescription.objects.filter(appointment=appointment).exists())
+
+
+class PrescriptionPdfTests(PrescriptionAPITestCase):
+    def setUp(self):
+        super().setUp()
+        use_media_root(self)
+        # Pre-rendering is exercised directly in its own test
+        self.schedule_prerender = self.enterContext(patch('prescriptions.signals.schedule_prerender'))
+
+    def download(self, prescription, **headers):
+        return self.client.get(f'{PRESCRIPTIONS_URL}{prescription.id}/download_pdf/', headers=headers)
+
+    def test_download_renders_each_version_once(self):
+        prescription, _ = self.create(self.drugs[:3], tests=1)
+
+        with patch('prescriptions.pdf.render_pdf', wraps=pdf.render_pdf) as render:
+            first = self.download(prescription)
+            body = b''.join(first.streaming_content)
+            second = self.download(prescription)
+            b''.join(second.streaming_content)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['Content-Type'], 'application/pdf')
+        self.assertTrue(body.startswith(b'%PDF-1.4'))
+        self.assertTrue(body.rstrip().endswith(b'%%EOF'))
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(render.call_count, 1)
+
+    def test_unchanged_version_is_not_modified(self):
+        prescription, _ = self.create(self.drugs[:1])
+        etag = self.download(prescription)['ETag']
+
+        response = self.download(prescription, if_none_match=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_edit_renders_a_new_version_and_drops_the_old_one(self):
+        prescription, _ = self.create(self.drugs[:2])
+        etag = self.download(prescription)['ETag']
+
+        payload = self.payload(prescription.appointment, self.drugs[:2], dosage='1g')
+        self.count_queries('put', f'{PRESCRIPTIONS_URL}{prescription.id}/', payload)
+        response = self.download(prescription, if_none_match=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        key = response['ETag'].strip('"')
+        self.assertEqual(os.listdir(pdf.pdf_directory(prescription.id)), [f'{key}.pdf'])
+
+    def test_download_survives_a_concurrent_cleanup(self):
+        prescription, _ = self.create(self.drugs[:2])
+        cached_pdf = pdf.cached_pdf
+        removed = []
+
+        def removed_after_render(*args, **kwargs):
+            # Another render drops the file before this request opens it
+            path, key = cached_pdf(*args, **kwargs)
+            if not removed:
+                removed.append(path)
+                os.unlink(path)
+            return path, key
+
+        with patch('prescriptions.pdf.cached_pdf', side_effect=removed_after_render):
+            response = self.download(prescription)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF-1.4'))
+        self.assertEqual(len(removed), 1)
+
+    def test_prerender_fills_the_cache(self):
+        prescription, _ = self.create(self.drugs[:2])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            prescription.save()
+        path = pdf.prerender(prescription.id)
+
+        self.schedule_prerender.assert_called_with(prescription.id)
+        with patch('prescriptions.pdf.render_pdf') as render:
+            self.assertEqual(self.download(prescription).status_code, status.HTTP_200_OK)
+        render.assert_not_called()
+        self.assertTrue(os.path.exists(path))
+
+    def test_export_streams_a_zip_of_every_prescription(self):
+        first, _ = self.create(self.drugs[:1], hours=1)
+        second, _ = self.create(self.drugs[:4], tests=2, hours=2)
+
+        response = self.client.get(f'{PRESCRIPTIONS_URL}export/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        names = archive.namelist()
+        self.assertEqual(len(names), 2)
+        self.assertTrue(names[0].endswith(f'-{first.id}.pdf'))
+        self.assertTrue(names[1].endswith(f'-{second.id}.pdf'))
+        self.assertTrue(all(archive.read(name).startswith(b'%PDF-') for name in names))
+
+    def test_export_without_prescriptions(self):
+        response = self.client.get(f'{PRESCRIPTIONS_URL}export/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,4 +1,6 @@
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -7,11 +9,21 @@ from appointments.models import Appointment
 from doctors.models import Doctor
 from patients.models import Patient
 from .models import Prescription, PrescribedDrug, TestRecommendation
+from .pdf import (
+    document_key,
+    export_filename,
+    open_cached_pdf,
+    patients_by_id,
+    prescription_document,
+    stream_zip,
+    with_pdf_relations
+)
 from .serializers import (
     PrescriptionSerializer,
     PrescriptionCreateSerializer,
     PrescribedDrugSerializer,
-    TestRecommendationSerializer
+    TestRecommendationSerializer,
+    prescription_prefetches
 )
 
 class PrescriptionViewSet(viewsets.ModelViewSet):
@@ -24,6 +36,17 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         return PrescriptionSerializer
 
     def get_queryset(self):
+        queryset = self.get_role_queryset()
+
+        # Load the drugs and tests PrescriptionSerializer nests up front so a
+        # prescription costs the same number of queries however many it holds
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.prefetch_related(*prescription_prefetches())
+        elif self.action in ['download_pdf', 'export']:
+            queryset = with_pdf_relations(queryset)
+        return queryset
+
+    def get_role_queryset(self):
         user = self.request.user
         
         # Filter based on user role
@@ -33,7 +56,7 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         except Doctor.DoesNotExist:
             try:
                 patient = Patient.objects.get(email=user.email)
-                return Prescription.objects.filter(appointment__patient=patient)
+                return Prescription.objects.filter(appointment__patient_id=str(patient.id))
             except Patient.DoesNotExist:
                 return Prescription.objects.none()
 
@@ -48,7 +71,7 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         except Doctor.DoesNotExist:
             try:
                 patient = Patient.objects.get(email=user.email)
-                if appointment.patient == patient:
+                if appointment.patient_id == str(patient.id):
                     return 'patient'
             except Patient.DoesNotExist:
                 pass
@@ -83,14 +106,53 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def download_pdf(self, request, pk=None):
-        """Generate and download prescription as PDF"""
+        """
+        Download the prescription as PDF. Each version is rendered once and
+        served from the PDF cache after that; the ETag is the version's hash.
+        """
         prescription = self.get_object()
-        
-        # TODO: Implement PDF generation
-        # For now, return a message
-        return Response({
-            "message": "PDF download will be implemented soon"
-        })
+        patient = patients_by_id([prescription]).get(str(prescription.appointment.patient_id))
+        document = prescription_document(prescription, patient)
+        etag = f'"{document_key(document)}"'
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            pdf_file, _ = open_cached_pdf(prescription, document=document)
+            response = FileResponse(
+                pdf_file,
+                as_attachment=True,
+                filename=export_filename(document),
+                content_type='application/pdf'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Download every prescription the user can see as one zip of PDFs,
+        streamed as it is built. Doctors can narrow it to one patient with
+        `patient_id`.
+        """
+        queryset = self.get_queryset()
+        patient_id = request.query_params.get('patient_id')
+        if patient_id:
+            queryset = queryset.filter(appointment__patient_id=patient_id)
+
+        if not queryset.exists():
+            return Response({
+                "status": "error",
+                "message": "No prescriptions to export"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(
+            stream_zip(queryset.order_by('created_at', 'id').iterator(chunk_size=100)),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = 'attachment; filename="prescriptions.zip"'
+        return response
 
 class PrescribedDrugViewSet(viewsets.ModelViewSet):
     serializer_class = PrescribedDrugSerializer
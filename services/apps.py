@@ -5,3 +5,8 @@ class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
     verbose_name = 'Services'
+
+    def ready(self):
+        # Generate WebP derivatives of uploaded photos and icons
+        from .images import connect_signals
+        connect_signals()
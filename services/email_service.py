@@ -1,21 +1,40 @@
 import logging
-from typing import List, Optional, Union
+import string
+from typing import Iterable, List, Optional, Tuple, Union
 from django.conf import settings
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization
+from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization, Substitution
 import json
+from .sendgrid_client import AsyncSendGridClient, get_sendgrid_client
 
 logger = logging.getLogger(__name__)
 
+class CompiledTemplate:
+    """
+    A str.format template parsed once into static chunks and named slots.
+
+    Rendering only joins the chunks with the slot values, so the markup
+    around the slots is never rebuilt per email.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if spec or conversion:
+                raise ValueError(f"Unsupported format in template slot {field!r}")
+            self.parts.append((literal, field))
+
+    def render(self, **values) -> str:
+        return ''.join(
+            literal if field is None else literal + str(values[field])
+            for literal, field in self.parts
+        )
+
+
 class EmailTemplates:
     """Class containing enterprise-level email templates"""
-    
-    @staticmethod
-    def get_base_template(content: str) -> str:
-        """
-        Base template with enterprise styling and responsive design
-        """
-        return f"""
+
+    BASE = CompiledTemplate("""
         <!DOCTYPE html>
         <html lang="en">
         <head>
@@ -224,21 +243,9 @@ class EmailTemplates:
             </div>
         </body>
         </html>
-        """
+        """)
 
-    @staticmethod
-    def get_appointment_notification_template(
-        doctor_name: str,
-        doctor_name_arabic: str,
-        slot_time: str,
-        duration: int,
-        phone_number: str,
-        language: str
-    ) -> str:
-        """
-        Enterprise template for appointment notifications
-        """
-        return f"""
+    APPOINTMENT_NOTIFICATION = CompiledTemplate("""
         <!-- English Content -->
         <div class="content-section">
             <h1>New Appointment Scheduled</h1>
@@ -274,14 +281,39 @@ class EmailTemplates:
             
             <a href="https://doctor.zuwara.net/appointments" class="button">عرض الموعد</a>
         </div>
-        """
+        """)
 
-    @staticmethod
-    def get_verification_template(verification_code: str) -> str:
-        """
-        Enterprise template for verification emails
-        """
-        return f"""
+    APPOINTMENT_REMINDER = CompiledTemplate("""
+        <!-- English Content -->
+        <div class="content-section">
+            <h1>Appointment Reminder</h1>
+            <p>Dear {name},</p>
+            <p>This is a reminder that your appointment starts in {lead_time}.</p>
+            
+            <div class="data-box">
+                <ul>
+                    <li><strong>📅 Date and Time:</strong> {slot_time}</li>
+                </ul>
+            </div>
+        </div>
+        
+        <hr style="border: none; border-top: 1px solid #e2e8f0; margin: 32px 0;">
+        
+        <!-- Arabic Content -->
+        <div class="content-section rtl">
+            <h1>تذكير بالموعد</h1>
+            <p>عزيزي {name_arabic}،</p>
+            <p>نذكرك بأن موعدك يبدأ خلال {lead_time_arabic}.</p>
+            
+            <div class="data-box">
+                <ul>
+                    <li><strong>📅 التاريخ والوقت:</strong> {slot_time}</li>
+                </ul>
+            </div>
+        </div>
+        """)
+
+    VERIFICATION = CompiledTemplate("""
         <!-- English Content -->
         <div class="content-section">
             <h1>Verify Your Email</h1>
@@ -327,18 +359,213 @@ class EmailTemplates:
                 </ul>
             </div>
         </div>
+        """)
+
+    PASSWORD_RESET = CompiledTemplate("""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h2 style="color: #333;">Password Reset Request</h2>
+            <p>We received a request to reset your password. Use the following code to reset your password:</p>
+            <div style="background-color: #f5f5f5; padding: 15px; text-align: center; margin: 20px 0;">
+                <h1 style="color: #4a90e2; margin: 0; font-size: 32px;">{reset_code}</h1>
+            </div>
+            <p>This code will expire in 24 hours.</p>
+            <p>If you didn't request a password reset, please ignore this email.</p>
+            <hr style="border: 1px solid #eee; margin: 20px 0;">
+            <p style="color: #666; font-size: 12px;">This is an automated message, please do not reply.</p>
+        </div>
+        """)
+
+    OTP = CompiledTemplate("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <link href="https://fonts.googleapis.com/css2?family=Vibrawy:wght@400;700&display=swap" rel="stylesheet">
+            <style>
+                @font-face {{
+                    font-family: 'Vibrawy';
+                    src: url('https://fonts.googleapis.com/css2?family=Vibrawy:wght@400;700&display=swap');
+                }}
+                .arabic {{
+                    font-family: 'Vibrawy', Arial, sans-serif;
+                    direction: rtl;
+                    text-align: right;
+                    line-height: 1.6;
+                }}
+            </style>
+        </head>
+        <body style="margin: 0; padding: 0; font-family: Arial, sans-serif; background-color: #f4f4f4;">
+            <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 8px; overflow: hidden; margin-top: 20px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+                <!-- Header -->
+                <tr>
+                    <td style="background-color: #00796B; padding: 30px 40px; text-align: center;">
+                        <img src="https://alaqa.net/logo.png" alt="Alaqa Healthcare" style="max-width: 150px; height: auto;" />
+                    </td>
+                </tr>
+                
+                <!-- Content -->
+                <tr>
+                    <td style="padding: 40px;">
+                        <!-- Arabic Content -->
+                        <div class="arabic" style="margin-bottom: 30px;">
+                            <h1 style="color: #333333; font-size: 24px; margin: 0 0 20px 0;">تحقق من حسابك</h1>
+                            <p style="color: #666666; font-size: 16px; margin: 0 0 20px 0;">
+                                شكراً لاختيارك علاقة للرعاية الصحية. للتحقق من أمان حسابك، يرجى استخدام رمز التحقق التالي:
+                            </p>
+                        </div>
+                        
+                        <!-- English Content -->
+                        <h1 style="color: #333333; font-size: 24px; margin: 0 0 20px 0;">Verify Your Account</h1>
+                        <p style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
+                            Thank you for choosing Alaqa Healthcare. To ensure the security of your account, please use the following verification code:
+                        </p>
+                        
+                        <!-- OTP Code Box -->
+                        <div style="background-color: #f8f9fa; border: 2px solid #e9ecef; border-radius: 8px; padding: 20px; margin: 30px 0; text-align: center;">
+                            <span style="font-family: 'Courier New', monospace; font-size: 32px; font-weight: bold; color: #00796B; letter-spacing: 4px;">
+                                {otp_code}
+                            </span>
+                        </div>
+                        
+                        <!-- Arabic Security Notes -->
+                        <div class="arabic" style="margin-bottom: 20px;">
+                            <p style="color: #666666; font-size: 16px; margin: 0 0 20px 0;">
+                                سينتهي هذا الرمز خلال <strong>24 ساعة</strong>. إذا لم تطلب رمز التحقق هذا، يرجى تجاهل هذا البريد الإلكتروني.
+                            </p>
+                            <p style="color: #666666; font-size: 16px; margin: 0 0 10px 0;">
+                                لحماية أمان حسابك:
+                            </p>
+                            <ul style="color: #666666; font-size: 16px; margin: 0 0 20px 0;">
+                                <li>لا تشارك هذا الرمز مع أي شخص</li>
+                                <li>لن يطلب فريقنا هذا الرمز أبداً</li>
+                                <li>أدخل هذا الرمز فقط على الموقع الرسمي لعلاقة</li>
+                            </ul>
+                        </div>
+                        
+                        <!-- English Security Notes -->
+                        <p style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
+                            This code will expire in <strong>24 hours</strong>. If you didn't request this verification code, please ignore this email.
+                        </p>
+                        <p style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
+                            For your security:
+                        </p>
+                        <ul style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
+                            <li>Never share this code with anyone</li>
+                            <li>Our team will never ask for this code</li>
+                            <li>Only enter this code on the official Alaqa website</li>
+                        </ul>
+                    </td>
+                </tr>
+                
+                <!-- Footer -->
+                <tr>
+                    <td style="background-color: #f8f9fa; padding: 30px 40px; border-top: 1px solid #e9ecef;">
+                        <!-- Arabic Footer -->
+                        <div class="arabic" style="margin-bottom: 20px;">
+                            <p style="color: #999999; font-size: 14px; line-height: 20px; margin: 0; text-align: center;">
+                                هذه رسالة آلية، يرجى عدم الرد عليها.<br>
+                                إذا كنت بحاجة إلى مساعدة، يرجى التواصل مع فريق الدعم على support@alaqa.net
+                            </p>
+                        </div>
+                        
+                        <!-- English Footer -->
+                        <p style="color: #999999; font-size: 14px; line-height: 20px; margin: 0; text-align: center;">
+                            This is an automated message, please do not reply.<br>
+                            If you need assistance, please contact our support team at support@alaqa.net
+                        </p>
+                        
+                        <!-- Links -->
+                        <div style="text-align: center; margin-top: 20px;">
+                            <a href="https://alaqa.net" style="color: #00796B; text-decoration: none; margin: 0 10px;">الموقع | Website</a> |
+                            <a href="https://alaqa.net/privacy" style="color: #00796B; text-decoration: none; margin: 0 10px;">سياسة الخصوصية | Privacy Policy</a> |
+                            <a href="https://alaqa.net/terms" style="color: #00796B; text-decoration: none; margin: 0 10px;">الشروط والأحكام | Terms of Service</a>
+                        </div>
+                    </td>
+                </tr>
+            </table>
+        </body>
+        </html>
+        """)
+    
+    @staticmethod
+    def get_base_template(content: str) -> str:
+        """
+        Base template with enterprise styling and responsive design
+        """
+        return EmailTemplates.BASE.render(content=content)
+
+    @staticmethod
+    def get_appointment_notification_template(
+        doctor_name: str,
+        doctor_name_arabic: str,
+        slot_time: str,
+        duration: int,
+        phone_number: str,
+        language: str
+    ) -> str:
+        """
+        Enterprise template for appointment notifications
+        """
+        return EmailTemplates.APPOINTMENT_NOTIFICATION.render(
+            doctor_name=doctor_name,
+            doctor_name_arabic=doctor_name_arabic,
+            slot_time=slot_time,
+            duration=duration,
+            language=language
+        )
+
+    @staticmethod
+    def get_appointment_reminder_template(
+        name: str,
+        name_arabic: str,
+        slot_time: str,
+        lead_time: str,
+        lead_time_arabic: str
+    ) -> str:
+        """
+        Bilingual template for appointment reminders
+        """
+        return EmailTemplates.APPOINTMENT_REMINDER.render(
+            name=name,
+            name_arabic=name_arabic,
+            slot_time=slot_time,
+            lead_time=lead_time,
+            lead_time_arabic=lead_time_arabic
+        )
+
+    @staticmethod
+    def get_verification_template(verification_code: str) -> str:
+        """
+        Enterprise template for verification emails
+        """
+        return EmailTemplates.VERIFICATION.render(verification_code=verification_code)
+
+    @staticmethod
+    def get_password_reset_template(reset_code: str) -> str:
+        """
+        Template for password reset emails
+        """
+        return EmailTemplates.PASSWORD_RESET.render(reset_code=reset_code)
+
+    @staticmethod
+    def get_otp_template(otp_code: str) -> str:
+        """
+        Bilingual template for OTP emails
         """
+        return EmailTemplates.OTP.render(otp_code=otp_code)
 
 class EmailService:
     """Service for sending emails using SendGrid with enterprise-level templates"""
     
+    # SendGrid accepts at most this many personalizations per mail/send call
+    BULK_BATCH_SIZE = 1000
+
     def __init__(self):
-        """Initialize SendGrid client with API key"""
+        """Use the process-wide pooled SendGrid client"""
         self.api_key = settings.SENDGRID_API_KEY
         self.default_from_email = settings.DEFAULT_FROM_EMAIL
-        logger.info(f"Initializing SendGrid client with API key ending in: ...{self.api_key[-4:]}")
-        logger.info(f"Default from email: {self.default_from_email}")
-        self.client = SendGridAPIClient(self.api_key)
+        self.client = get_sendgrid_client()
 
     def send_email(
         self,
@@ -356,9 +583,9 @@ class EmailService:
             if isinstance(to_emails, str):
                 to_emails = [to_emails]
                 
-            logger.info(f"Preparing to send email to: {to_emails}")
-            logger.info(f"Subject: {subject}")
-            logger.info(f"From email: {from_email or self.default_from_email}")
+            logger.debug(f"Preparing to send email to: {to_emails}")
+            logger.debug(f"Subject: {subject}")
+            logger.debug(f"From email: {from_email or self.default_from_email}")
             
             # Create mail object with base template
             mail = Mail(
@@ -371,7 +598,7 @@ class EmailService:
             # Add reply-to if provided
             if reply_to:
                 mail.reply_to = Email(reply_to)
-                logger.info(f"Added reply-to: {reply_to}")
+                logger.debug(f"Added reply-to: {reply_to}")
             
             # Log the full mail object for debugging
             logger.debug(f"Mail object: {mail.get()}")
@@ -380,9 +607,9 @@ class EmailService:
             response = self.client.send(mail)
             
             # Log detailed response
-            logger.info(f"SendGrid Response Status Code: {response.status_code}")
-            logger.info(f"SendGrid Response Headers: {json.dumps(dict(response.headers), indent=2)}")
-            logger.info(f"SendGrid Response Body: {response.body.decode() if response.body else 'No body'}")
+            logger.debug(f"SendGrid Response Status Code: {response.status_code}")
+            logger.debug(f"SendGrid Response Headers: {json.dumps(dict(response.headers), indent=2)}")
+            logger.debug(f"SendGrid Response Body: {response.body.decode() if response.body else 'No body'}")
             
             if response.status_code >= 400:
                 logger.error(f"SendGrid API Error - Status: {response.status_code}")
@@ -416,6 +643,102 @@ class EmailService:
                 'message': f"Failed to send email: {str(e)}"
             }
 
+    def build_bulk_mails(
+        self,
+        recipients: Iterable[Union[str, Tuple[str, dict]]],
+        subject: str,
+        html_content: str,
+        from_email: Optional[str] = None,
+    ) -> List[Mail]:
+        """
+        Build the mail/send requests for a bulk send, BULK_BATCH_SIZE recipients each
+
+        Every recipient gets its own personalization, so no one sees the other
+        addresses. A recipient is an email address or an (email, substitutions)
+        pair; each substitution key (e.g. "-name-") is replaced in the subject
+        and content for that recipient only.
+        """
+        # The shared markup is wrapped once for the whole send
+        html_content = EmailTemplates.get_base_template(html_content)
+        mails = []
+        mail = None
+        for recipient in recipients:
+            email, substitutions = (recipient, {}) if isinstance(recipient, str) else recipient
+            if mail is None or len(mail.personalizations) >= self.BULK_BATCH_SIZE:
+                mail = Mail(from_email=from_email or self.default_from_email, subject=subject)
+                mail.add_content(Content("text/html", html_content))
+                mails.append(mail)
+            personalization = Personalization()
+            personalization.add_to(To(email))
+            for key, value in substitutions.items():
+                personalization.add_substitution(Substitution(key, str(value)))
+            mail.add_personalization(personalization, index=len(mail.personalizations))
+        return mails
+
+    def _bulk_result(self, mails, responses) -> dict:
+        sent = failed = 0
+        errors = []
+        batches = []
+        for mail, response in zip(mails, responses):
+            count = len(mail.personalizations)
+            if isinstance(response, Exception) or response.status_code >= 400:
+                failed += count
+                error = response if isinstance(response, Exception) else (
+                    response.body.decode() if response.body else f"HTTP {response.status_code}"
+                )
+                errors.append(str(error))
+                batches.append({'recipients': count, 'success': False, 'message': f"Failed to send email: {error}"})
+            else:
+                sent += count
+                batches.append({'recipients': count, 'success': True, 'message': 'Email sent successfully'})
+        if errors:
+            logger.error(f"Bulk email: {failed} recipients failed in {len(errors)} requests: {errors[0]}")
+        logger.info(f"Bulk email sent to {sent} recipients in {len(mails)} requests")
+        return {
+            'success': failed == 0,
+            'sent': sent,
+            'failed': failed,
+            'requests': len(mails),
+            'message': 'Email sent successfully' if not errors else f"Failed to send email: {errors[0]}",
+            # Per request, in recipient order, so callers can tell which recipients failed
+            'batches': batches
+        }
+
+    def send_bulk_email(
+        self,
+        recipients: Iterable[Union[str, Tuple[str, dict]]],
+        subject: str,
+        html_content: str,
+        from_email: Optional[str] = None,
+    ) -> dict:
+        """
+        Send one email to many recipients with one API call per BULK_BATCH_SIZE of them
+
+        See build_bulk_mails for the recipient format.
+        """
+        mails = self.build_bulk_mails(recipients, subject, html_content, from_email)
+        responses = []
+        for mail in mails:
+            try:
+                responses.append(self.client.send(mail))
+            except Exception as e:
+                responses.append(e)
+        return self._bulk_result(mails, responses)
+
+    async def send_bulk_email_async(
+        self,
+        recipients: Iterable[Union[str, Tuple[str, dict]]],
+        subject: str,
+        html_content: str,
+        from_email: Optional[str] = None,
+        concurrency: Optional[int] = None,
+    ) -> dict:
+        """send_bulk_email for asyncio workers; the batches are sent concurrently"""
+        mails = self.build_bulk_mails(recipients, subject, html_content, from_email)
+        async_client = AsyncSendGridClient(self.client, concurrency)
+        responses = await async_client.send_many(mails)
+        return self._bulk_result(mails, responses)
+
     def send_verification_email(self, to_email: str, verification_code: str) -> dict:
         """
         Send a verification email with enterprise template
@@ -503,6 +826,16 @@ class EmailService:
             
             # Send email
             response = self.client.send(mail)
+
+            # The pooled client returns error responses instead of raising
+            if response.status_code >= 400:
+                logger.error(f"SendGrid API Error - Status: {response.status_code}")
+                logger.error(f"Response Body: {response.body.decode() if response.body else 'No body'}")
+                return {
+                    'success': False,
+                    'status_code': response.status_code,
+                    'message': f"Failed to send email: {response.body.decode() if response.body else 'Unknown error'}"
+                }
             
             logger.info(
                 f"Template email sent successfully to {to_emails}. "
@@ -534,19 +867,7 @@ class EmailService:
             dict: Response from SendGrid API
         """
         subject = "Reset Your Password - Alaqa"
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h2 style="color: #333;">Password Reset Request</h2>
-            <p>We received a request to reset your password. Use the following code to reset your password:</p>
-            <div style="background-color: #f5f5f5; padding: 15px; text-align: center; margin: 20px 0;">
-                <h1 style="color: #4a90e2; margin: 0; font-size: 32px;">{reset_code}</h1>
-            </div>
-            <p>This code will expire in 24 hours.</p>
-            <p>If you didn't request a password reset, please ignore this email.</p>
-            <hr style="border: 1px solid #eee; margin: 20px 0;">
-            <p style="color: #666; font-size: 12px;">This is an automated message, please do not reply.</p>
-        </div>
-        """
+        html_content = EmailTemplates.get_password_reset_template(reset_code)
         
         return self.send_email(
             to_email,
@@ -566,118 +887,7 @@ class EmailService:
             dict: Response from SendGrid API
         """
         subject = "Your Verification Code - رمز التحقق الخاص بك"
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <link href="https://fonts.googleapis.com/css2?family=Vibrawy:wght@400;700&display=swap" rel="stylesheet">
-            <style>
-                @font-face {{
-                    font-family: 'Vibrawy';
-                    src: url('https://fonts.googleapis.com/css2?family=Vibrawy:wght@400;700&display=swap');
-                }}
-                .arabic {{
-                    font-family: 'Vibrawy', Arial, sans-serif;
-                    direction: rtl;
-                    text-align: right;
-                    line-height: 1.6;
-                }}
-            </style>
-        </head>
-        <body style="margin: 0; padding: 0; font-family: Arial, sans-serif; background-color: #f4f4f4;">
-            <table role="presentation" width="100%" cellspacing="0" cellpadding="0" style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 8px; overflow: hidden; margin-top: 20px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                <!-- Header -->
-                <tr>
-                    <td style="background-color: #00796B; padding: 30px 40px; text-align: center;">
-                        <img src="https://alaqa.net/logo.png" alt="Alaqa Healthcare" style="max-width: 150px; height: auto;" />
-                    </td>
-                </tr>
-                
-                <!-- Content -->
-                <tr>
-                    <td style="padding: 40px;">
-                        <!-- Arabic Content -->
-                        <div class="arabic" style="margin-bottom: 30px;">
-                            <h1 style="color: #333333; font-size: 24px; margin: 0 0 20px 0;">تحقق من حسابك</h1>
-                            <p style="color: #666666; font-size: 16px; margin: 0 0 20px 0;">
-                                شكراً لاختيارك علاقة للرعاية الصحية. للتحقق من أمان حسابك، يرجى استخدام رمز التحقق التالي:
-                            </p>
-                        </div>
-                        
-                        <!-- English Content -->
-                        <h1 style="color: #333333; font-size: 24px; margin: 0 0 20px 0;">Verify Your Account</h1>
-                        <p style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
-                            Thank you for choosing Alaqa Healthcare. To ensure the security of your account, please use the following verification code:
-                        </p>
-                        
-                        <!-- OTP Code Box -->
-                        <div style="background-color: #f8f9fa; border: 2px solid #e9ecef; border-radius: 8px; padding: 20px; margin: 30px 0; text-align: center;">
-                            <span style="font-family: 'Courier New', monospace; font-size: 32px; font-weight: bold; color: #00796B; letter-spacing: 4px;">
-                                {otp_code}
-                            </span>
-                        </div>
-                        
-                        <!-- Arabic Security Notes -->
-                        <div class="arabic" style="margin-bottom: 20px;">
-                            <p style="color: #666666; font-size: 16px; margin: 0 0 20px 0;">
-                                سينتهي هذا الرمز خلال <strong>24 ساعة</strong>. إذا لم تطلب رمز التحقق هذا، يرجى تجاهل هذا البريد الإلكتروني.
-                            </p>
-                            <p style="color: #666666; font-size: 16px; margin: 0 0 10px 0;">
-                                لحماية أمان حسابك:
-                            </p>
-                            <ul style="color: #666666; font-size: 16px; margin: 0 0 20px 0;">
-                                <li>لا تشارك هذا الرمز مع أي شخص</li>
-                                <li>لن يطلب فريقنا هذا الرمز أبداً</li>
-                                <li>أدخل هذا الرمز فقط على الموقع الرسمي لعلاقة</li>
-                            </ul>
-                        </div>
-                        
-                        <!-- English Security Notes -->
-                        <p style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
-                            This code will expire in <strong>24 hours</strong>. If you didn't request this verification code, please ignore this email.
-                        </p>
-                        <p style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
-                            For your security:
-                        </p>
-                        <ul style="color: #666666; font-size: 16px; line-height: 24px; margin: 0 0 20px 0;">
-                            <li>Never share this code with anyone</li>
-                            <li>Our team will never ask for this code</li>
-                            <li>Only enter this code on the official Alaqa website</li>
-                        </ul>
-                    </td>
-                </tr>
-                
-                <!-- Footer -->
-                <tr>
-                    <td style="background-color: #f8f9fa; padding: 30px 40px; border-top: 1px solid #e9ecef;">
-                        <!-- Arabic Footer -->
-                        <div class="arabic" style="margin-bottom: 20px;">
-                            <p style="color: #999999; font-size: 14px; line-height: 20px; margin: 0; text-align: center;">
-                                هذه رسالة آلية، يرجى عدم الرد عليها.<br>
-                                إذا كنت بحاجة إلى مساعدة، يرجى التواصل مع فريق الدعم على support@alaqa.net
-                            </p>
-                        </div>
-                        
-                        <!-- English Footer -->
-                        <p style="color: #999999; font-size: 14px; line-height: 20px; margin: 0; text-align: center;">
-                            This is an automated message, please do not reply.<br>
-                            If you need assistance, please contact our support team at support@alaqa.net
-                        </p>
-                        
-                        <!-- Links -->
-                        <div style="text-align: center; margin-top: 20px;">
-                            <a href="https://alaqa.net" style="color: #00796B; text-decoration: none; margin: 0 10px;">الموقع | Website</a> |
-                            <a href="https://alaqa.net/privacy" style="color: #00796B; text-decoration: none; margin: 0 10px;">سياسة الخصوصية | Privacy Policy</a> |
-                            <a href="https://alaqa.net/terms" style="color: #00796B; text-decoration: none; margin: 0 10px;">الشروط والأحكام | Terms of Service</a>
-                        </div>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        """
+        html_content = EmailTemplates.get_otp_template(otp_code)
         
         return self.send_email(
             to_email,
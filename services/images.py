@@ -0,0 +1,161 @@
+"""
+WebP derivatives of uploaded photos and icons.
+
+Every image in IMAGE_FIELDS gets smaller WebP copies (see DERIVATIVES) stored
+next to it, e.g. doctors/derivatives/photo.thumbnail.webp for doctors/photo.jpg.
+The names follow from the original's name, so serializers can link to them
+without extra columns, and a replaced photo gets new derivatives rather than
+stale ones. Derivatives are generated in a background thread once the upload
+is committed. generate_image_derivatives backfills existing media with a
+process pool.
+
+Serializers link to the derivatives of every raster image by name alone, so
+rendering one checks no storage. For the moment between an upload and its
+derivatives being written, clients fall back to the original, which is
+rendered alongside.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+from config.background import BackgroundQueue
+
+logger = logging.getLogger(__name__)
+
+# name: longest side in pixels
+DERIVATIVES = {
+    'thumbnail': 160,
+    'medium': 640,
+}
+WEBP_QUALITY = 80
+DERIVATIVE_DIR = 'derivatives'
+
+# Originals with other extensions (e.g. SVG icons) get no derivatives
+RASTER_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+# (app label, model, image field)
+IMAGE_FIELDS = [
+    ('doctors', 'Doctor', 'photo'),
+    ('patients', 'Patient', 'photo'),
+    ('services', 'Service', 'icon'),
+]
+
+
+def derivative_name(name, derivative):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, DERIVATIVE_DIR, f'{stem}.{derivative}.webp')
+
+
+def render_derivative(image, size):
+    """WebP bytes of `image` scaled down to fit in size x size"""
+    copy = image.copy()
+    copy.thumbnail((size, size), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    copy.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return output.getvalue()
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """
+    Write the missing derivatives of the stored image `name`.
+    Returns how many were written; 0 when there was nothing to do or the file
+    is not a raster image (e.g. an SVG icon).
+    """
+    missing = [
+        (derivative, size) for derivative, size in DERIVATIVES.items()
+        if force or not storage.exists(derivative_name(name, derivative))
+    ]
+    if not missing:
+        return 0
+
+    try:
+        with storage.open(name, 'rb') as original:
+            image = Image.open(original)
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    except (UnidentifiedImageError, FileNotFoundError) as e:
+        logger.info(f"No derivatives for {name}: {str(e)}")
+        return 0
+
+    for derivative, size in missing:
+        target = derivative_name(name, derivative)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(render_derivative(image, size)))
+    return len(missing)
+
+
+# A failed run is left to the backfill command
+_queue = BackgroundQueue('image-derivatives', generate_derivatives)
+
+
+def schedule_derivatives(name):
+    _queue.schedule(name)
+
+
+def _image_saved_handler(field_name):
+    def handle_image_saved(sender, instance, **kwargs):
+        image = getattr(instance, field_name)
+        if image:
+            name = image.name
+            transaction.on_commit(lambda: schedule_derivatives(name))
+    return handle_image_saved
+
+
+def connect_signals():
+    for app_label, model_name, field_name in IMAGE_FIELDS:
+        post_save.connect(
+            _image_saved_handler(field_name),
+            sender=apps.get_model(app_label, model_name),
+            weak=False,
+            dispatch_uid=f'image_derivatives_{app_label}_{model_name}'
+        )
+
+
+class ImageDerivativesField(serializers.ReadOnlyField):
+    """
+    URLs of an image's derivatives, {'thumbnail': url, 'medium': url}, with
+    the original's URL standing in for images that get none. None without an
+    image.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        raster = os.path.splitext(value.name)[1].lower() in RASTER_EXTENSIONS
+        urls = {}
+        for derivative in DERIVATIVES:
+            url = value.storage.url(derivative_name(value.name, derivative)) if raster else value.url
+            urls[derivative] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+def stored_image_names():
+    """Names of every stored image in IMAGE_FIELDS"""
+    for app_label, model_name, field_name in IMAGE_FIELDS:
+        model = apps.get_model(app_label, model_name)
+        names = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        yield from names.values_list(field_name, flat=True).iterator(chunk_size=2000)
+
+
+def backfill_one(name, force=False):
+    """Process pool task; returns (name, derivatives written, error)"""
+    try:
+        return name, generate_derivatives(name, force=force), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+def init_backfill_worker():
+    import django
+    django.setup()
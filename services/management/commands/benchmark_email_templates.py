@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.email_service import EmailTemplates
+
+SAMPLES = {
+    'appointment': (EmailTemplates.APPOINTMENT_NOTIFICATION, {
+        'doctor_name': 'Sara Ahmed',
+        'doctor_name_arabic': 'سارة أحمد',
+        'slot_time': '2024-05-01 10:30',
+        'duration': 30,
+        'language': 'ar'
+    }),
+    'verification': (EmailTemplates.VERIFICATION, {'verification_code': '483920'}),
+    'otp': (EmailTemplates.OTP, {'otp_code': '483920'}),
+    'password_reset': (EmailTemplates.PASSWORD_RESET, {'reset_code': '483920'}),
+}
+
+
+class Command(BaseCommand):
+    help = 'Measures email template render throughput (renders/sec), base template included'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=20000,
+            help='Number of renders per template (default: 20000)'
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+
+        for name, (template, values) in SAMPLES.items():
+            compiled = self.run_benchmark(count, lambda: EmailTemplates.BASE.render(
+                content=template.render(**values)
+            ))
+            # What every email used to cost: formatting both full sources from scratch
+            formatted = self.run_benchmark(count, lambda: EmailTemplates.BASE.source.format(
+                content=template.source.format(**values)
+            ))
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {compiled:,.0f} renders/sec compiled, "
+                f"{formatted:,.0f} renders/sec formatted per call ({compiled / formatted:.1f}x)"
+            ))
+
+    def run_benchmark(self, count, render):
+        render()  # Warm up outside the measurement
+        started = time.perf_counter()
+        for _ in range(count):
+            render()
+        return count / (time.perf_counter() - started)
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from services.images import backfill_one, init_backfill_worker, stored_image_names
+
+
+class Command(BaseCommand):
+    help = 'Generates missing WebP derivatives of doctor and patient photos and service icons'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (default: one per CPU); 1 runs in this process'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate derivatives that already exist'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        names = list(dict.fromkeys(stored_image_names()))
+
+        totals = {'images': len(names), 'derivatives': 0, 'skipped': 0, 'failed': 0}
+        if options['workers'] <= 1:
+            results = (backfill_one(name, options['force']) for name in names)
+            self.collect(results, totals)
+        else:
+            # Spawned rather than forked: workers only need settings and media
+            # storage, not this process's database connection or threads
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_backfill_worker
+            ) as pool:
+                results = pool.map(backfill_one, names, [options['force']] * len(names), chunksize=16)
+                self.collect(results, totals)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {totals['derivatives']} derivatives for {totals['images']} images "
+            f"({totals['skipped']} already done or not raster images, {totals['failed']} failed) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+
+    def collect(self, results, totals):
+        for name, written, error in results:
+            if error:
+                totals['failed'] += 1
+                self.stderr.write(f"{name}: {error}")
+            elif written:
+                totals['derivatives'] += written
+            else:
+                totals['skipped'] += 1
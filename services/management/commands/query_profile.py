@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.query_profiler import ORDERINGS, collect, report
+
+
+class Command(BaseCommand):
+    help = 'Prints the views with the heaviest SQL load sampled by QueryProfilerMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order-by',
+            choices=list(ORDERINGS),
+            default='queries',
+            help='Rank views by average queries, SQL time, wall time or repeated queries, or by requests'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of views to print (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        rows = report(collect(), options['order_by'], options['limit'])
+        if not rows:
+            self.stdout.write(
+                f"No samples (QUERY_PROFILER_SAMPLE_RATE is {settings.QUERY_PROFILER_SAMPLE_RATE}; "
+                f"servers publish to the shared cache, so CACHE_URL must be set)"
+            )
+            return
+
+        self.stdout.write(
+            f"{'requests':>8} {'queries':>8} {'max':>5} {'sql ms':>9} {'wall ms':>9} {'repeated':>8}  view"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['requests']:>8} {row['avg_queries']:>8} {row['max_queries']:>5} "
+                f"{row['avg_sql_ms']:>9} {row['avg_wall_ms']:>9} {row['avg_duplicates']:>8}  {row['view']}"
+            )
+            for duplicate in row['top_duplicates']:
+                self.stdout.write(f"{'':>54}+{duplicate['count']}x {duplicate['sql'][:160]}")
@@ -0,0 +1,88 @@
+"""
+Process-wide SendGrid client.
+
+SendGridAPIClient opens a new HTTPS connection for every API call. The
+pooled client keeps one keep-alive session per process instead, and
+AsyncSendGridClient lets an asyncio background worker have several mail
+sends in flight over that same pool.
+"""
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from sendgrid import SendGridAPIClient
+
+logger = logging.getLogger(__name__)
+
+# Same attributes EmailService reads from a python_http_client response
+SendGridResponse = namedtuple('SendGridResponse', ['status_code', 'body', 'headers'])
+
+
+class PooledSendGridClient(SendGridAPIClient):
+    """SendGridAPIClient whose mail sends reuse pooled keep-alive connections"""
+
+    def __init__(self, api_key, host='https://api.sendgrid.com', pool_size=10, timeout=10):
+        super().__init__(api_key, host=host)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, message):
+        if not isinstance(message, dict):
+            message = message.get()
+        response = self.session.post(
+            f"{self.host}/v3/mail/send",
+            json=message,
+            headers=self._default_headers,
+            timeout=self.timeout
+        )
+        return SendGridResponse(response.status_code, response.content, response.headers)
+
+
+class AsyncSendGridClient:
+    """asyncio interface to the pooled client, with at most `concurrency` sends in flight"""
+
+    def __init__(self, client=None, concurrency=None):
+        self.client = client or get_sendgrid_client()
+        self.concurrency = concurrency or settings.SENDGRID_POOL_SIZE
+        self._semaphore = None
+
+    async def send(self, message):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if not isinstance(message, dict):
+            message = message.get()
+        async with self._semaphore:
+            return await asyncio.to_thread(self.client.send, message)
+
+    async def send_many(self, messages):
+        """Send every message concurrently; results (or exceptions) come back in order"""
+        return await asyncio.gather(*(self.send(message) for message in messages), return_exceptions=True)
+
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def get_sendgrid_client():
+    """Return the process-wide pooled client, rebuilt if the API key setting changes"""
+    global _client, _client_key
+    api_key = settings.SENDGRID_API_KEY
+    if _client is None or _client_key != api_key:
+        with _client_lock:
+            if _client is None or _client_key != api_key:
+                _client = PooledSendGridClient(
+                    api_key,
+                    pool_size=settings.SENDGRID_POOL_SIZE,
+                    timeout=settings.SENDGRID_TIMEOUT
+                )
+                _client_key = api_key
+                logger.debug("Created pooled SendGrid client")
+    return _client
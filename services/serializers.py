@@ -1,7 +1,10 @@
 from rest_framework import serializers
+from .images import ImageDerivativesField
 from .models import Service
 
 class ServiceSerializer(serializers.ModelSerializer):
+    icon_derivatives = ImageDerivativesField(source='icon')
+
     class Meta:
         model = Service
         fields = [
@@ -11,6 +14,7 @@ class ServiceSerializer(serializers.ModelSerializer):
             'description_en',
             'description_ar',
             'icon',
+            'icon_derivatives',
             'is_active',
             'created_at',
             'updated_at'
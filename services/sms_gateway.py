@@ -0,0 +1,259 @@
+"""
+Client for the Dreams SMS API.
+
+One SmsGateway per process keeps a pooled HTTP session, so messages reuse
+open connections instead of doing a TLS handshake each. Only requests the
+provider certainly did not act on are retried, a bounded number of times with
+jittered backoff: failures to connect, and 429 and 503 replies. Read timeouts,
+connections dropped after the request was sent and other 5xx replies are not,
+since the message may have been sent. Consecutive outages open a circuit breaker,
+after which sends fail immediately until the provider gets a trial request
+again, so callers such as the notification outbox back off instead of
+blocking workers on a provider that is down.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CODES = {
+    '-124': "Invalid credentials or IP not whitelisted",
+    '-120': "Invalid sender ID",
+    '-110': "Invalid phone number format",
+    '-111': "Insufficient credit",
+    '1': "Success"
+}
+# Replies that say the request was turned away before it was processed
+RETRY_STATUSES = {429, 503}
+
+
+class ProviderUnavailable(Exception):
+    """The provider failed in a way that counts against the circuit breaker"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    it opens and rejects calls for `reset_timeout` seconds; then one trial
+    call is let through (half-open), which closes it again on success.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return self.CLOSED
+        if now - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.error(f"SMS circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class SmsGateway:
+    """Pooled, retrying, circuit-broken client for the Dreams SMS API"""
+
+    def __init__(self, api_url, user, secret_key, sender, connect_timeout=3.05, read_timeout=5,
+                 max_retries=2, backoff=0.5, pool_size=10, failure_threshold=5, reset_timeout=30):
+        self.api_url = api_url
+        self.user = user
+        self.secret_key = secret_key
+        self.sender = sender
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            api_url=settings.DREAMS_SMS_API_URL,
+            user=settings.DREAMS_SMS_USER,
+            secret_key=settings.DREAMS_SMS_SECRET_KEY,
+            sender=settings.DREAMS_SMS_SENDER,
+            connect_timeout=settings.SMS_GATEWAY_CONNECT_TIMEOUT,
+            read_timeout=settings.SMS_GATEWAY_READ_TIMEOUT,
+            max_retries=settings.SMS_GATEWAY_MAX_RETRIES,
+            backoff=settings.SMS_GATEWAY_BACKOFF,
+            pool_size=settings.SMS_GATEWAY_POOL_SIZE,
+            failure_threshold=settings.SMS_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.SMS_CIRCUIT_RESET_TIMEOUT
+        )
+
+    @staticmethod
+    def format_number(phone_number):
+        """The API expects the local number: no country code, no leading zeros"""
+        if phone_number.startswith('966'):
+            phone_number = phone_number[3:]
+        return phone_number.lstrip('0')
+
+    def send(self, phone_number, message):
+        """Send one message; returns (success, message) like OTPService.send_sms"""
+        if settings.DEBUG:
+            logger.info(f"Debug mode: Simulating SMS send to {phone_number}")
+            return True, "SMS simulated successfully (Debug Mode)"
+
+        required = {
+            'DREAMS_SMS_API_URL': self.api_url,
+            'DREAMS_SMS_USER': self.user,
+            'DREAMS_SMS_SECRET_KEY': self.secret_key,
+            'DREAMS_SMS_SENDER': self.sender
+        }
+        for setting, value in required.items():
+            if not value:
+                logger.error(f"Missing required setting: {setting}")
+                return False, f"SMS configuration error: Missing {setting}"
+
+        if not self.breaker.allow():
+            logger.warning(f"SMS circuit open, not sending to {phone_number}")
+            return False, "Failed to send SMS: provider unavailable"
+
+        try:
+            response_text = self._request(self.format_number(phone_number), message)
+        except ProviderUnavailable as e:
+            self.breaker.record_failure()
+            logger.error(f"SMS to {phone_number} failed: {e}")
+            return False, f"Failed to send SMS: {e}"
+        self.breaker.record_success()
+        return self._parse(response_text)
+
+    def send_bulk(self, messages, max_workers=None):
+        """
+        Send many (phone_number, message) pairs over the pooled session.
+
+        Returns one (success, message) result per pair, in order. Once the
+        circuit opens the remaining messages fail fast.
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        workers = min(max_workers or self.pool_size, self.pool_size, len(messages))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda pair: self.send(*pair), messages))
+
+    def _request(self, phone_number, message):
+        params = {
+            'user': self.user,
+            'secret_key': self.secret_key,
+            'to': phone_number,
+            'message': message,
+            'sender': self.sender
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+            except requests.ConnectTimeout:
+                error = "Connection timed out"
+            except requests.Timeout:
+                # The provider may have sent the message; do not send it twice
+                raise ProviderUnavailable("Request timed out")
+            except requests.ConnectionError as e:
+                if not self._connect_failed(e):
+                    # Dropped after the request went out, e.g. RemoteDisconnected
+                    raise ProviderUnavailable(f"Connection failed: {e}")
+                error = f"Connection failed: {e}"
+            else:
+                if response.status_code in RETRY_STATUSES:
+                    error = f"HTTP {response.status_code}"
+                elif response.status_code >= 500:
+                    raise ProviderUnavailable(f"HTTP {response.status_code}")
+                else:
+                    return response.text.strip()
+
+            if attempt < self.max_retries:
+                # Full jitter keeps retries from many workers from lining up
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                logger.warning(f"SMS request failed ({error}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+        raise ProviderUnavailable(error)
+
+    @staticmethod
+    def _connect_failed(error):
+        """Whether a ConnectionError happened before the request was sent"""
+        reason = error.args[0] if error.args else None
+        return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+
+    @staticmethod
+    def _parse(response_text):
+        # Clean response text - remove any non-numeric characters except minus sign
+        cleaned_response = ''.join(c for c in response_text if c.isdigit() or c == '-')
+
+        if cleaned_response in RESPONSE_CODES:
+            is_success = cleaned_response == '1'
+            message = RESPONSE_CODES[cleaned_response]
+            log_method = logger.info if is_success else logger.error
+            log_method(f"SMS API Response: {message}")
+            return is_success, message
+        if cleaned_response.startswith('-'):
+            logger.error(f"SMS API Error Code: {cleaned_response}")
+            return False, f"Failed to send SMS: API error {cleaned_response}"
+        logger.info(f"SMS sent with response: {cleaned_response}")
+        return True, "SMS sent successfully"
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_sms_gateway():
+    """Return the process-wide SmsGateway, built from settings on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = SmsGateway.from_settings()
+    return _gateway
@@ -1,3 +1,431 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from io import BytesIO, StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from config import query_profiler
+from config.testing import use_media_root
+from .email_service import CompiledTemplate, EmailService, EmailTemplates
+from .images import DERIVATIVES, ImageDerivativesField, derivative_name, generate_derivatives
+from .models import Service
+from .sendgrid_client import PooledSendGridClient
+from .sms_gateway import CircuitBreaker, SmsGateway
+
+
+def start_stub_server(test, handler):
+    """Serve `handler` on a free local port for the duration of the test"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    test.addCleanup(thread.join)
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return server
+
+
+class StubSmsHandler(BaseHTTPRequestHandler):
+    """Answers like the Dreams API with the next scripted (status, body) reply"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(parse_qs(urlparse(self.path).query))
+            server.client_ports.add(self.client_address[1])
+            status, body = server.replies.pop(0) if server.replies else server.default_reply
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(DEBUG=False)
+class SmsGatewayTests(SimpleTestCase):
+    """Runs the gateway against a local stub of the Dreams API"""
+
+    def setUp(self):
+        self.server = start_stub_server(self, StubSmsHandler)
+        self.server.replies = []
+        self.server.default_reply = (200, '1')
+
+        self.gateway = self.make_gateway()
+        self.addCleanup(self.gateway.session.close)
+
+    def make_gateway(self, **kwargs):
+        options = {
+            'api_url': f"http://127.0.0.1:{self.server.server_port}/api/sendsms/",
+            'backoff': 0, 'failure_threshold': 3, 'reset_timeout': 60, **kwargs
+        }
+        return SmsGateway(
+            user='alaqa',
+            secret_key='secret',
+            sender='zuwara',
+            **options
+        )
+
+    def test_send_formats_number_and_parses_success(self):
+        self.assertEqual(self.gateway.send('966555552022', 'hello'), (True, "Success"))
+
+        params = self.server.requests[0]
+        self.assertEqual(params['to'], ['555552022'])
+        self.assertEqual(params['message'], ['hello'])
+        self.assertEqual(params['sender'], ['zuwara'])
+
+    def test_provider_error_code_is_not_retried(self):
+        self.server.replies = [(200, '-110')]
+
+        self.assertEqual(self.gateway.send('966555552022', 'hello'), (False, "Invalid phone number format"))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.gateway.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_rejected_requests_are_retried(self):
+        self.server.replies = [(503, ''), (429, '')]
+
+        self.assertEqual(self.gateway.send('966555552022', 'hello'), (True, "Success"))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_other_server_errors_are_not_retried(self):
+        self.server.replies = [(502, '')]
+
+        success, message = self.gateway.send('966555552022', 'hello')
+        self.assertFalse(success)
+        self.assertIn('HTTP 502', message)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_connect_failures_are_retried(self):
+        gateway = self.make_gateway(api_url='http://127.0.0.1:1/api/sendsms/')
+        self.addCleanup(gateway.session.close)
+
+        with patch.object(gateway.session, 'get', wraps=gateway.session.get) as get:
+            self.assertFalse(gateway.send('966555552022', 'hello')[0])
+        self.assertEqual(get.call_count, gateway.max_retries + 1)
+
+    def test_dropped_connection_is_not_retried(self):
+        class DroppingHandler(StubSmsHandler):
+            def do_GET(self):
+                self.server.requests.append(self.path)
+                self.close_connection = True
+
+        self.server = start_stub_server(self, DroppingHandler)
+        gateway = self.make_gateway(api_url=f"http://127.0.0.1:{self.server.server_port}/api/sendsms/")
+        self.addCleanup(gateway.session.close)
+
+        self.assertFalse(gateway.send('966555552022', 'hello')[0])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_retries_are_bounded(self):
+        self.server.default_reply = (503, '')
+
+        success, message = self.gateway.send('966555552022', 'hello')
+        self.assertFalse(success)
+        self.assertIn('HTTP 503', message)
+        self.assertEqual(len(self.server.requests), self.gateway.max_retries + 1)
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.server.default_reply = (503, '')
+        gateway = self.make_gateway(max_retries=0)
+        self.addCleanup(gateway.session.close)
+
+        for _ in range(3):
+            self.assertFalse(gateway.send('966555552022', 'hello')[0])
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.OPEN)
+
+        self.assertEqual(gateway.send('966555552022', 'hello'), (False, "Failed to send SMS: provider unavailable"))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_half_open_trial_closes_circuit(self):
+        self.server.replies = [(503, '')] * 3
+        gateway = self.make_gateway(max_retries=0, reset_timeout=0)
+        self.addCleanup(gateway.session.close)
+
+        for _ in range(3):
+            gateway.send('966555552022', 'hello')
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.HALF_OPEN)
+
+        self.assertTrue(gateway.send('966555552022', 'hello')[0])
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_send_bulk_reuses_pooled_connections(self):
+        messages = [(f'9665555520{index:02d}', f'reminder {index}') for index in range(40)]
+
+        results = self.gateway.send_bulk(messages, max_workers=4)
+
+        self.assertEqual(results, [(True, "Success")] * 40)
+        self.assertEqual(len(self.server.requests), 40)
+        # Keep-alive: at most one connection per worker
+        self.assertLessEqual(len(self.server.client_ports), 4)
+
+
+class StubSendGridHandler(BaseHTTPRequestHandler):
+    """Accepts mail/send calls like the SendGrid v3 API"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests.append((self.path, self.headers['Authorization'], body))
+            self.server.client_ports.add(self.client_address[1])
+            status, reply = getattr(self.server, 'reply', (202, b''))
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BulkEmailTests(SimpleTestCase):
+    """Bulk sends through the pooled client against a local SendGrid stub"""
+
+    def setUp(self):
+        self.server = start_stub_server(self, StubSendGridHandler)
+        self.client = PooledSendGridClient('test-key', host=f"http://127.0.0.1:{self.server.server_port}")
+        self.addCleanup(self.client.session.close)
+        with patch('services.email_service.get_sendgrid_client', return_value=self.client):
+            self.email_service = EmailService()
+        self.recipients = [
+            (f'doctor{index}@example.com', {'-name-': f'Doctor {index}'})
+            for index in range(2500)
+        ]
+
+    def test_send_email_uses_pooled_client(self):
+        for _ in range(3):
+            result = self.email_service.send_email('patient@example.com', 'Hello', '<p>Hi</p>')
+            self.assertTrue(result['success'])
+
+        path, authorization, body = self.server.requests[0]
+        self.assertEqual(path, '/v3/mail/send')
+        self.assertEqual(authorization, 'Bearer test-key')
+        self.assertEqual(body['personalizations'][0]['to'], [{'email': 'patient@example.com'}])
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_bulk_send_batches_personalizations(self):
+        result = self.email_service.send_bulk_email(self.recipients, 'Your day, -name-', '<p>Hi -name-</p>')
+
+        self.assertEqual(result, {
+            'success': True, 'sent': 2500, 'failed': 0, 'requests': 3, 'message': 'Email sent successfully',
+            'batches': [
+                {'recipients': count, 'success': True, 'message': 'Email sent successfully'}
+                for count in (1000, 1000, 500)
+            ]
+        })
+        bodies = [body for _, _, body in self.server.requests]
+        self.assertEqual([len(body['personalizations']) for body in bodies], [1000, 1000, 500])
+        self.assertEqual(bodies[0]['personalizations'][0], {
+            'to': [{'email': 'doctor0@example.com'}],
+            'substitutions': {'-name-': 'Doctor 0'}
+        })
+        self.assertEqual(bodies[0]['subject'], 'Your day, -name-')
+        self.assertIn('<p>Hi -name-</p>', bodies[0]['content'][0]['value'])
+
+    def test_async_bulk_send(self):
+        result = asyncio.run(
+            self.email_service.send_bulk_email_async(self.recipients, 'Reminder', '<p>Hi -name-</p>', concurrency=2)
+        )
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['requests'], 3)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_bulk_send_reports_failed_batches(self):
+        self.client.send = lambda message: (_ for _ in ()).throw(ConnectionError('down'))
+
+        result = self.email_service.send_bulk_email(self.recipients[:10], 'Reminder', '<p>Hi</p>')
+
+        self.assertFalse(result['success'])
+        self.assertEqual((result['sent'], result['failed']), (0, 10))
+
+
+    def test_template_email_reports_error_status(self):
+        self.server.reply = (400, b'{"errors": [{"message": "Invalid template"}]}')
+
+        result = self.email_service.send_template_email('patient@example.com', 'd-missing', {'name': 'Sara'})
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['status_code'], 400)
+        self.assertIn('Invalid template', result['message'])
+
+
+class EmailTemplateTests(SimpleTestCase):
+    def test_compiled_templates_render_like_format(self):
+        values = {
+            'doctor_name': 'Sara',
+            'doctor_name_arabic': 'سارة',
+            'slot_time': '2024-05-01 10:30',
+            'duration': 30,
+            'language': 'ar'
+        }
+        template = EmailTemplates.APPOINTMENT_NOTIFICATION
+        self.assertEqual(template.render(**values), template.source.format(**values))
+
+        page = EmailTemplates.get_base_template('<p>{literal braces}</p>')
+        self.assertEqual(page, EmailTemplates.BASE.source.format(content='<p>{literal braces}</p>'))
+
+    def test_slot_values_are_not_reinterpreted(self):
+        self.assertIn('{0}', EmailTemplates.get_otp_template('{0}'))
+
+    def test_format_specs_are_rejected(self):
+        with self.assertRaises(ValueError):
+            CompiledTemplate('<p>{code:>6}</p>')
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_email_templates', count=10, stdout=out)
+        for name in ('appointment', 'verification', 'otp', 'password_reset'):
+            self.assertIn(f"{name}: ", out.getvalue())
+
+
+def jpeg_bytes(width=1200, height=800):
+    output = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        use_media_root(self)
+        self.schedule = self.enterContext(patch('services.images.schedule_derivatives'))
+
+    def create_service(self, filename='icon.jpg', content=None):
+        service = Service(name_en='Lab', name_ar='مختبر', description_en='Lab', description_ar='مختبر')
+        service.icon.save(filename, ContentFile(content or jpeg_bytes()), save=False)
+        service.save()
+        return service
+
+    def test_derivatives_fit_their_size(self):
+        name = default_storage.save('doctors/photo.jpg', ContentFile(jpeg_bytes()))
+
+        self.assertEqual(generate_derivatives(name), len(DERIVATIVES))
+        self.assertEqual(generate_derivatives(name), 0)
+
+        for derivative, size in DERIVATIVES.items():
+            target = derivative_name(name, derivative)
+            self.assertEqual(target, f'doctors/derivatives/photo.{derivative}.webp')
+            with default_storage.open(target, 'rb') as stored:
+                image = Image.open(stored)
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(max(image.size), size)
+
+    def test_non_raster_images_are_skipped(self):
+        name = default_storage.save('services/icons/icon.svg', ContentFile(b'<svg xmlns="http://www.w3.org/2000/svg"/>'))
+
+        self.assertEqual(generate_derivatives(name), 0)
+        self.assertFalse(default_storage.exists(derivative_name(name, 'thumbnail')))
+
+    def test_field_links_derivatives_by_name(self):
+        service = self.create_service()
+        field = ImageDerivativesField()
+
+        with patch('django.core.files.storage.FileSystemStorage.exists') as exists:
+            urls = field.to_representation(service.icon)
+        exists.assert_not_called()
+        self.assertTrue(urls['thumbnail'].endswith('.thumbnail.webp'))
+        self.assertTrue(urls['medium'].endswith('.medium.webp'))
+
+    def test_field_falls_back_to_non_raster_originals(self):
+        service = self.create_service('icon.svg', content=b'<svg/>')
+
+        self.assertEqual(ImageDerivativesField().to_representation(service.icon), {
+            derivative: service.icon.url for derivative in DERIVATIVES
+        })
+
+    def test_save_schedules_derivatives_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = self.create_service()
+
+        self.schedule.assert_called_once_with(service.icon.name)
+
+    def test_backfill_command(self):
+        first = self.create_service('first.jpg')
+        self.create_service('second.png', content=jpeg_bytes(100, 50))
+        self.create_service('third.svg', content=b'<svg/>')
+
+        out = StringIO()
+        call_command('generate_image_derivatives', workers=1, stdout=out)
+        self.assertIn(f"Wrote {2 * len(DERIVATIVES)} derivatives for 3 images", out.getvalue())
+        self.assertTrue(default_storage.exists(derivative_name(first.icon.name, 'medium')))
+
+        out = StringIO()
+        call_command('generate_image_derivatives', workers=1, stdout=out)
+        self.assertIn("Wrote 0 derivatives for 3 images (3 already done", out.getvalue())
+
+
+@override_settings(QUERY_PROFILER_SAMPLE_RATE=1.0)
+class QueryProfilerTests(APITestCase):
+    url = '/api/v1/services/'
+
+    def setUp(self):
+        cache.clear()
+        query_profiler._samples.clear()
+        self.addCleanup(query_profiler._samples.clear)
+
+    def test_removed_when_sampling_is_off(self):
+        with override_settings(QUERY_PROFILER_SAMPLE_RATE=0):
+            with self.assertRaises(MiddlewareNotUsed):
+                query_profiler.QueryProfilerMiddleware(lambda request: None)
+
+    def test_repeated_queries_are_folded_together(self):
+        recorder = query_profiler.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            Service.objects.filter(id__in=[1, 2]).exists()
+            Service.objects.filter(id__in=[1, 2, 3]).exists()
+            Service.objects.count()
+
+        self.assertEqual(recorder.count, 3)
+        (sql, repeats), = recorder.duplicates().items()
+        self.assertIn('IN (...)', sql)
+        self.assertEqual(repeats, 1)
+
+    def test_requests_are_reported_per_view(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        rows = query_profiler.report(query_profiler.summarize(query_profiler._samples))
+
+        self.assertEqual(rows[0]['view'], 'services.views.ServiceViewSet.list')
+        self.assertEqual(rows[0]['requests'], 2)
+        self.assertGreaterEqual(rows[0]['avg_queries'], 1)
+
+    def test_admin_endpoint_and_command(self):
+        self.client.get(self.url)
+        User = get_user_model()
+        user = User.objects.create_user(email='staff@test.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+
+        self.assertEqual(self.client.get('/api/v1/query-profile/').status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get('/api/v1/query-profile/', {'order_by': 'sql'})
+        self.assertEqual(response.status_code, 200)
+        views = [row['view'] for row in response.data['data']['views']]
+        self.assertIn('services.views.ServiceViewSet.list', views)
+
+        out = StringIO()
+        call_command('query_profile', order_by='wall', stdout=out)
+        self.assertIn('services.views.ServiceViewSet.list', out.getvalue())
@@ -5,10 +5,14 @@ from ..email_service import EmailService
 
 class EmailServiceTests(TestCase):
     def setUp(self):
-        self.email_service = EmailService()
         self.test_email = "test@example.com"
+
+    @property
+    def email_service(self):
+        # Built inside each test so it picks up the patched SendGrid client
+        return EmailService()
         
-    @patch('services.email_service.SendGridAPIClient')
+    @patch('services.email_service.get_sendgrid_client')
     def test_send_email(self, mock_sendgrid):
         # Mock the SendGrid client response
         mock_response = MagicMock()
@@ -29,7 +33,7 @@ class EmailServiceTests(TestCase):
         # Verify SendGrid was called with correct parameters
         mock_sendgrid.return_value.send.assert_called_once()
         
-    @patch('services.email_service.SendGridAPIClient')
+    @patch('services.email_service.get_sendgrid_client')
     def test_send_template_email(self, mock_sendgrid):
         # Mock the SendGrid client response
         mock_response = MagicMock()
@@ -54,7 +58,7 @@ class EmailServiceTests(TestCase):
         # Verify SendGrid was called
         mock_sendgrid.return_value.send.assert_called_once()
         
-    @patch('services.email_service.SendGridAPIClient')
+    @patch('services.email_service.get_sendgrid_client')
     def test_send_verification_email(self, mock_sendgrid):
         # Mock the SendGrid client response
         mock_response = MagicMock()
@@ -74,7 +78,7 @@ class EmailServiceTests(TestCase):
         # Verify SendGrid was called
         mock_sendgrid.return_value.send.assert_called_once()
         
-    @patch('services.email_service.SendGridAPIClient')
+    @patch('services.email_service.get_sendgrid_client')
     def test_send_password_reset_email(self, mock_sendgrid):
         # Mock the SendGrid client response
         mock_response = MagicMock()
@@ -94,7 +98,7 @@ class EmailServiceTests(TestCase):
         # Verify SendGrid was called
         mock_sendgrid.return_value.send.assert_called_once()
         
-    @patch('services.email_service.SendGridAPIClient')
+    @patch('services.email_service.get_sendgrid_client')
     def test_error_handling(self, mock_sendgrid):
         # Mock SendGrid to raise an exception
         mock_sendgrid.return_value.send.side_effect = Exception("API Error")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SpecialtiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'specialties'
+
+    def ready(self):
+        # Register cache invalidation signals
+        from . import signals
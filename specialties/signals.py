@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.response_cache import DOCTOR_DIRECTORY, SPECIALTIES, invalidate_on_commit
+from .models import Specialty
+
+
+@receiver(post_save, sender=Specialty)
+@receiver(post_delete, sender=Specialty)
+def handle_specialty_change(sender, **kwargs):
+    """Invalidate cached specialty lists and the directory that nests them"""
+    invalidate_on_commit(SPECIALTIES, DOCTOR_DIRECTORY)
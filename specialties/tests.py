@@ -1,3 +1,67 @@
-from django.test import TestCase
+from django.core.cache import cache
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .models import Specialty
+
+
+class SpecialtyListCacheTests(APITestCase):
+    url = '/api/v1/specialties/'
+
+    def setUp(self):
+        cache.clear()
+        self.specialty = Specialty.objects.create(
+            title='Cardiology',
+            title_ar='أمراض القلب',
+            icon='heart',
+            background_color='#ffffff',
+            color_class='bg-primary',
+            description='Heart care',
+            description_ar='رعاية القلب',
+            total_time_call=30,
+            warning_time_call=5,
+            alert_time_call=2
+        )
+
+    def titles(self, response):
+        return [item['title'] for item in response.data['data']['specialties']]
+
+    def test_repeat_list_skips_database(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.titles(second), ['Cardiology'])
+
+    def test_query_parameters_are_cached_separately(self):
+        self.client.get(self.url)
+
+        response = self.client.get(self.url, {'search': 'missing'})
+
+        self.assertEqual(self.titles(response), [])
+
+    def test_uncommitted_change_keeps_cached_list(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.specialty.title = 'Cardiac Surgery'
+            self.specialty.save()
+            # A request during the transaction must not cache it under a new version
+            self.assertEqual(self.titles(self.client.get(self.url)), ['Cardiology'])
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.titles(self.client.get(self.url)), ['Cardiac Surgery'])
+
+    def test_save_and_delete_invalidate_cached_list(self):
+        self.client.get(self.url)
+
+        self.specialty.title = 'Cardiac Surgery'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.specialty.save()
+        self.assertEqual(self.titles(self.client.get(self.url)), ['Cardiac Surgery'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.specialty.delete()
+        self.assertEqual(self.titles(self.client.get(self.url)), [])
@@ -5,6 +5,7 @@ from rest_framework.exceptions import ValidationError
 from django_filters import rest_framework as django_filters
 from django.db import models
 from django.core.exceptions import ObjectDoesNotExist
+from config.response_cache import SPECIALTIES, cached_list
 from .models import Specialty
 from .serializers import SpecialtySerializer
 from .pagination import CustomPagination
@@ -67,6 +68,7 @@ class SpecialtyViewSet(viewsets.ModelViewSet):
             return queryset.filter(status=True)
         return queryset
 
+    @cached_list(SPECIALTIES)
     def list(self, request, *args, **kwargs):
         """
         List specialties with pagination and filtering
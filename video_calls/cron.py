@@ -0,0 +1,20 @@
+from django_cron import CronJobBase, Schedule
+
+from .tokens import premint_upcoming
+
+
+class PremintVideoTokensCronJob(CronJobBase):
+    """
+    Cron job that mints doctor and patient tokens for calls starting soon,
+    so joins at the top of the hour are served from the cache.
+    """
+
+    # Run every five minutes; the pre-mint window is wider than that
+    schedule = Schedule(run_every_mins=5)
+
+    code = 'video_calls.premint_tokens'  # Unique code
+
+    def do(self):
+        """Execute the cron job."""
+        minted = premint_upcoming()
+        return f"Pre-minted {minted} video call tokens."
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from video_calls.tokens import PREMINT_WINDOW, premint_upcoming
+
+
+class Command(BaseCommand):
+    help = 'Mints and stores doctor and patient tokens for video calls starting soon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=int(PREMINT_WINDOW.total_seconds() // 60),
+            help='Pre-mint for calls starting within this many minutes (default: %(default)s)'
+        )
+
+    def handle(self, *args, **options):
+        minted = premint_upcoming(window=timedelta(minutes=options['window']))
+        self.stdout.write(self.style.SUCCESS(f"Pre-minted {minted} video call tokens"))
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from integrations.services.agora import AgoraService
+from integrations.services import AgoraService
 
 class Command(BaseCommand):
     help = 'Test Agora token generation'
@@ -11,8 +11,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         try:
-            agora_service = AgoraService()
-            token = agora_service.generate_rtc_token(
+            token, _ = AgoraService.generate_token(
                 channel_name=options['channel_name'],
                 uid=options['uid'],
                 role=options['role']
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import VideoCall
+from .tokens import MAX_BATCH_SIZE
 from doctors.serializers import DoctorSerializer
 from patients.serializers import PatientSerializer
 
@@ -94,7 +95,7 @@ class VideoCallSerializer(serializers.ModelSerializer):
 
 class TokenSerializer(serializers.Serializer):
     token = serializers.CharField()
-    channel = serializers.CharField()
+    channel_name = serializers.CharField()
     uid = serializers.IntegerField()
     app_id = serializers.CharField()
     expiration_time = serializers.DateTimeField()
@@ -113,4 +114,14 @@ class TokenRequestSerializer(serializers.Serializer):
         """Validate the role"""
         if value not in [1, 2]:  # 1=publisher, 2=subscriber
             raise serializers.ValidationError("Role must be either 1 (publisher) or 2 (subscriber)")
-        return value 
\ No newline at end of file
+        return value
+
+class TokenBatchItemSerializer(TokenRequestSerializer):
+    uid = serializers.IntegerField(min_value=1)
+
+class TokenBatchRequestSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=TokenBatchItemSerializer(),
+        min_length=1,
+        max_length=MAX_BATCH_SIZE
+    )
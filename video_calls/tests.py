@@ -1,3 +1,7 @@
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APITestCase
@@ -7,8 +11,12 @@ from datetime import datetime, timedelta
 from authentication.models import User
 from doctors.models import Doctor
 from patients.models import Patient
+from integrations.credentials import agora_credentials
 from integrations.models import AgoraIntegration
+from integrations.services import AgoraService
+from .cron import PremintVideoTokensCronJob
 from .models import VideoCall
+from .tokens import DOCTOR_UID, MAX_BATCH_SIZE, _key, credentials_tag, issue
 
 @override_settings(
     AGORA_APP_ID='test_app_id',
@@ -311,3 +319,140 @@ class VideoCallTests(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VideoCallTokenIssuanceTests(APITestCase):
+    """Batch issuance and pre-minted tokens for joins"""
+
+    def setUp(self):
+        cache.clear()
+        AgoraIntegration.objects.create(
+            name='Agora Integration',
+            app_id='test_app_id',
+            app_certificate='test_certificate',
+            is_enabled=True,
+            status='active',
+            token_expiration_time=3600
+        )
+        self.doctor_user = User.objects.create_user(email='doctor@test.com', password='testpass123')
+        self.doctor = Doctor.objects.create(
+            name='Dr. Test Doctor',
+            name_arabic='د. طبيب اختبار',
+            sex='male',
+            email=self.doctor_user.email,
+            phone='+1234567890',
+            experience='10 years',
+            category='consultant',
+            language_in_sessions='english',
+            license_number='TEST123',
+            profile_arabic='نبذة عن الطبيب',
+            profile_english='Doctor profile',
+            status='approved'
+        )
+        self.patient = Patient.objects.create(
+            name='Test Patient',
+            name_arabic='مريض اختبار',
+            sex='male',
+            email='patient@test.com',
+            phone='+1234567890',
+            date_of_birth=timezone.now().date() - timedelta(days=365 * 25),
+            status='active'
+        )
+        self.video_call = VideoCall.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            scheduled_time=timezone.now() + timedelta(minutes=10),
+            channel_name='upcoming_call'
+        )
+        self.client.force_authenticate(user=self.doctor_user)
+
+    def test_batch_mints_every_tuple_in_one_request(self):
+        payload = {'tokens': [
+            {'channel_name': 'channel_a', 'uid': 1},
+            {'channel_name': 'channel_a', 'uid': 2, 'role': 2},
+            {'channel_name': 'channel_b', 'uid': 1},
+        ]}
+
+        AgoraService.get_credentials()
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/v1/video-calls/token/batch/', payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tokens = response.data['data']['tokens']
+        self.assertEqual(
+            [(item['channel_name'], item['uid'], item['role']) for item in tokens],
+            [('channel_a', 1, 1), ('channel_a', 2, 2), ('channel_b', 1, 1)]
+        )
+        self.assertEqual(len({item['token'] for item in tokens}), 3)
+
+        # The same tuple is served from the store on the next call
+        again = self.client.post('/api/v1/video-calls/token/batch/', payload, format='json')
+        self.assertEqual(again.data['data']['tokens'], tokens)
+
+    def test_batch_is_validated(self):
+        too_many = {'tokens': [
+            {'channel_name': 'channel_a', 'uid': index + 1} for index in range(MAX_BATCH_SIZE + 1)
+        ]}
+        response = self.client.post('/api/v1/video-calls/token/batch/', too_many, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        bad_role = {'tokens': [{'channel_name': 'channel_a', 'uid': 1, 'role': 3}]}
+        response = self.client.post('/api/v1/video-calls/token/batch/', bad_role, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.post('/api/v1/video-calls/token/batch/', bad_role, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_join_uses_pre_minted_token(self):
+        later_call = VideoCall.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            scheduled_time=timezone.now() + timedelta(hours=3),
+            channel_name='later_call'
+        )
+
+        out = StringIO()
+        call_command('premint_video_tokens', stdout=out)
+        self.assertIn('Pre-minted 2 video call tokens', out.getvalue())
+
+        # Already stored tokens are not minted again
+        self.assertEqual(PremintVideoTokensCronJob().do(), 'Pre-minted 0 video call tokens.')
+
+        with patch('video_calls.views.generate_agora_rtc_token') as mint:
+            response = self.client.post(f'/api/v1/video-calls/video-calls/{self.video_call.id}/join/')
+            mint.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['uid'], DOCTOR_UID)
+        self.assertEqual(response.data['channel_name'], 'upcoming_call')
+        token, _ = cache.get(_key('upcoming_call', DOCTOR_UID, 1, credentials_tag()))
+        self.assertEqual(response.data['token'], token)
+        self.assertIsNone(cache.get(_key(later_call.channel_name, DOCTOR_UID, 1, credentials_tag())))
+
+    def test_rotated_credentials_are_not_served_stored_tokens(self):
+        token, _ = issue('upcoming_call', DOCTOR_UID)
+        self.assertEqual(issue('upcoming_call', DOCTOR_UID)[0], token)
+
+        AgoraIntegration.objects.update(app_certificate='rotated_certificate')
+        agora_credentials.invalidate()
+
+        self.assertNotEqual(issue('upcoming_call', DOCTOR_UID)[0], token)
+
+
+class AgoraServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        agora_credentials.invalidate()
+
+    @override_settings(AGORA_APP_ID='test_app_id', AGORA_APP_CERTIFICATE='test_certificate')
+    def test_token_generation(self):
+        token, expires_at = AgoraService.generate_token(channel_name='test_channel', uid=12345, role=1)
+
+        self.assertTrue(token.startswith('006test_app_id'))
+        self.assertGreater(expires_at, timezone.now().timestamp())
+
+    @override_settings(AGORA_APP_ID='', AGORA_APP_CERTIFICATE='')
+    def test_missing_credentials(self):
+        with self.assertRaises(ValueError):
+            AgoraService.generate_token(channel_name='test_channel', uid=12345, role=1)
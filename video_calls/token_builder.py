@@ -62,7 +62,7 @@ class RtcTokenBuilder:
                 token_expire
             )
 
-            logger.info(f"Generated Agora token for channel: {channel_name}, uid: {uid}, expiry: {token_expire}")
+            logger.debug(f"Generated Agora token for channel: {channel_name}, uid: {uid}, expiry: {token_expire}")
             return token
 
         except Exception as e:
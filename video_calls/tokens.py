@@ -0,0 +1,148 @@
+"""
+Bulk issuance and storage of Agora tokens for video calls.
+
+Issued tokens are kept in the shared cache under (credentials, channel, uid,
+role) until shortly before they expire; rotated Agora credentials start a
+fresh set of keys, so tokens signed with the old certificate are never
+handed out again. Pre-minting fills the cache for every call that
+starts within the next window, so joining at the top of the hour is a cache
+lookup instead of a signing operation.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from integrations.credentials import agora_credentials
+from .models import VideoCall
+from .token_builder import Role_Publisher
+
+logger = logging.getLogger(__name__)
+
+DOCTOR_UID = 1
+PATIENT_UID = 2
+PARTICIPANT_UIDS = {'doctor': DOCTOR_UID, 'patient': PATIENT_UID}
+
+MAX_BATCH_SIZE = 100
+PREMINT_WINDOW = timedelta(minutes=30)
+# A scheduled call can still be joined this long after its start time
+JOIN_GRACE = timedelta(minutes=30)
+# Stored tokens are not handed out when they have less than this left
+MIN_REMAINING_SECONDS = 300
+
+
+@lru_cache(maxsize=8)
+def _credentials_tag(credentials):
+    """Short fingerprint of the credentials tokens are signed with"""
+    if credentials is None:
+        return 'none'
+    signing_key = f'{credentials.app_id}:{credentials.app_certificate}'
+    return hashlib.sha256(signing_key.encode()).hexdigest()[:16]
+
+
+def credentials_tag():
+    return _credentials_tag(agora_credentials.get())
+
+
+def _key(channel_name, uid, role, tag):
+    return f"video_token:{tag}:{channel_name}:{uid}:{role}"
+
+
+def _mint(channel_name, uid, role):
+    # views imports this module, so resolve the builder at call time
+    from .views import generate_agora_rtc_token
+    token, expires_at = generate_agora_rtc_token(channel_name, uid, role)
+    return {
+        'channel_name': channel_name,
+        'uid': uid,
+        'role': role,
+        'token': token,
+        'expires_at': expires_at
+    }
+
+
+def store_many(issued, tag=None):
+    """Store minted tokens with one cache round trip"""
+    if not issued:
+        return
+    tag = tag or credentials_tag()
+    # Tokens minted together expire together; keep them until the earliest
+    # one gets too close to its expiry
+    timeout = min(item['expires_at'] for item in issued) - int(time.time()) - MIN_REMAINING_SECONDS
+    if timeout <= 0:
+        return
+    cache.set_many({
+        _key(item['channel_name'], item['uid'], item['role'], tag): (item['token'], item['expires_at'])
+        for item in issued
+    }, timeout)
+
+
+def issue_many(requests, valid_until=None):
+    """
+    Return a token for every (channel_name, uid, role) request.
+
+    Stored tokens valid until at least `valid_until` (a unix timestamp,
+    default now plus MIN_REMAINING_SECONDS) are reused; the rest are minted
+    and stored. Returns (issued, minted_count) with issued in request order.
+    """
+    if valid_until is None:
+        valid_until = int(time.time()) + MIN_REMAINING_SECONDS
+    tag = credentials_tag()
+    keys = [_key(*request, tag) for request in requests]
+    stored = cache.get_many(keys)
+
+    issued = []
+    minted = []
+    for key, (channel_name, uid, role) in zip(keys, requests):
+        value = stored.get(key)
+        if value and value[1] >= valid_until:
+            token, expires_at = value
+            issued.append({
+                'channel_name': channel_name,
+                'uid': uid,
+                'role': role,
+                'token': token,
+                'expires_at': expires_at
+            })
+        else:
+            item = _mint(channel_name, uid, role)
+            issued.append(item)
+            minted.append(item)
+
+    store_many(minted, tag)
+    return issued, len(minted)
+
+
+def issue(channel_name, uid, role=Role_Publisher):
+    """Return (token, expires_at) for one participant, minting only on a cache miss"""
+    issued, _ = issue_many([(channel_name, uid, role)])
+    return issued[0]['token'], issued[0]['expires_at']
+
+
+def premint_upcoming(window=PREMINT_WINDOW, now=None):
+    """
+    Mint doctor and patient tokens for every call starting within `window`.
+
+    Tokens already stored that outlive the window are kept. Returns the
+    number of tokens minted.
+    """
+    now = now or timezone.now()
+    channels = VideoCall.objects.filter(
+        status__in=['scheduled', 'ongoing'],
+        scheduled_time__gte=now - JOIN_GRACE,
+        scheduled_time__lt=now + window
+    ).values_list('channel_name', flat=True)
+
+    requests = [
+        (channel_name, uid, Role_Publisher)
+        for channel_name in channels
+        for uid in PARTICIPANT_UIDS.values()
+    ]
+    valid_until = int((now + window).timestamp()) + MIN_REMAINING_SECONDS
+    _, minted = issue_many(requests, valid_until=valid_until)
+    logger.info(f"Pre-minted {minted} video call tokens for {len(requests) // 2} calls")
+    return minted
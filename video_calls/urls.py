@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import VideoCallViewSet, generate_agora_token, refresh_agora_token
+from .views import (
+    VideoCallViewSet, generate_agora_token, generate_agora_tokens_batch, refresh_agora_token
+)
 
 router = DefaultRouter()
 router.register(r'video-calls', VideoCallViewSet, basename='video-calls')
@@ -9,4 +11,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('token/', generate_agora_token, name='generate-token'),
     path('token/refresh/', refresh_agora_token, name='refresh-token'),
+    path('token/batch/', generate_agora_tokens_batch, name='generate-token-batch'),
 ] 
\ No newline at end of file
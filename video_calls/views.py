@@ -3,7 +3,6 @@ import time
 import random
 import logging
 from datetime import datetime, timedelta
-from django.conf import settings
 from django.utils import timezone
 from django.http import Http404
 from rest_framework import viewsets, status, permissions
@@ -12,15 +11,18 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, PermissionDenied, NotFound
 from doctors.models import Doctor
+from integrations.services import AgoraService
 from patients.models import Patient
 from .token_builder import RtcTokenBuilder
 from .models import VideoCall
-from .serializers import VideoCallSerializer, TokenSerializer, TokenRequestSerializer
+from .serializers import (
+    VideoCallSerializer, TokenSerializer, TokenRequestSerializer, TokenBatchRequestSerializer
+)
+from .tokens import PARTICIPANT_UIDS, issue as issue_token, issue_many as issue_tokens
 
 logger = logging.getLogger(__name__)
 
 # Constants for token expiration (in seconds)
-TOKEN_EXPIRATION_IN_SECONDS = 3600  # 1 hour
 JOIN_CHANNEL_PRIVILEGE_EXPIRATION_IN_SECONDS = 3600  # 1 hour
 PUB_AUDIO_PRIVILEGE_EXPIRATION_IN_SECONDS = 3600  # 1 hour
 PUB_VIDEO_PRIVILEGE_EXPIRATION_IN_SECONDS = 3600  # 1 hour
@@ -30,13 +32,14 @@ PUB_DATA_STREAM_PRIVILEGE_EXPIRATION_IN_SECONDS = 3600  # 1 hour
 Role_Publisher = 1  # Host
 Role_Subscriber = 2
 
-def generate_agora_rtc_token(channel_name, uid):
+def generate_agora_rtc_token(channel_name, uid, role=Role_Publisher):
     """
     Generate an Agora RTC token using our custom token builder.
     
     Args:
         channel_name (str): The name of the channel to join
         uid (int): The user ID for the token
+        role (int): 1 for publisher (default), 2 for subscriber
         
     Returns:
         tuple: (token string, expiration timestamp)
@@ -50,23 +53,26 @@ def generate_agora_rtc_token(channel_name, uid):
         if not isinstance(uid, int) or uid < 1:
             raise ValueError("UID must be a positive integer")
             
+        # Shared per-process snapshot, so no query or cache read per token
+        credentials = AgoraService.get_credentials()
+        
         # Get current timestamp
         current_timestamp = int(time.time())
         
-        # Calculate privilege expire time (24 hours from now)
-        privilegeExpiredTs = current_timestamp + TOKEN_EXPIRATION_IN_SECONDS
+        # Calculate privilege expire time
+        privilegeExpiredTs = current_timestamp + credentials.token_expiration_time
         
         # Build token using our custom token builder
         token = RtcTokenBuilder.build_token_with_uid(
-            settings.AGORA_APP_ID,
-            settings.AGORA_APP_CERTIFICATE,
+            credentials.app_id,
+            credentials.app_certificate,
             channel_name,
             uid,
-            Role_Publisher,  # Always use publisher role for video calls
-            privilegeExpiredTs
+            role,
+            credentials.token_expiration_time
         )
         
-        logger.info(f"Generated Agora token for channel: {channel_name}, uid: {uid}, expiry: {privilegeExpiredTs}")
+        logger.debug(f"Generated Agora token for channel: {channel_name}, uid: {uid}, expiry: {privilegeExpiredTs}")
         return token, privilegeExpiredTs
         
     except Exception as e:
@@ -109,12 +115,12 @@ def generate_agora_token(request):
             'token': token,
             'channel_name': channel_name,
             'uid': uid,
-            'app_id': settings.AGORA_APP_ID,
+            'app_id': AgoraService.get_credentials().app_id,
             'expiration_time': datetime.fromtimestamp(expiration_time),
             'role': Role_Publisher
         }
 
-        logger.info(f"Generated token response: {response_data}")
+        logger.debug(f"Generated token for channel: {channel_name}, uid: {uid}")
         return Response(response_data)
 
     except Exception as e:
@@ -146,7 +152,7 @@ def refresh_agora_token(request):
                 'channel': channel_name,
                 'uid': uid,
                 'role': Role_Publisher,
-                'app_id': settings.AGORA_APP_ID,
+                'app_id': AgoraService.get_credentials().app_id,
                 'expiration_time': datetime.fromtimestamp(expiration_time)
             }
         }, status=status.HTTP_200_OK)
@@ -158,6 +164,50 @@ def refresh_agora_token(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_agora_tokens_batch(request):
+    """
+    Mint tokens for several (channel_name, uid, role) tuples in one request.
+    Tokens already issued for a tuple are reused while they stay valid.
+    """
+    serializer = TokenBatchRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(
+            {'status': 'error', 'errors': serializer.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        issued, _ = issue_tokens([
+            (item['channel_name'], item['uid'], item['role'])
+            for item in serializer.validated_data['tokens']
+        ])
+
+        return Response({
+            'status': 'success',
+            'data': {
+                'app_id': AgoraService.get_credentials().app_id,
+                'tokens': [
+                    {
+                        'channel_name': item['channel_name'],
+                        'uid': item['uid'],
+                        'role': item['role'],
+                        'token': item['token'],
+                        'expiration_time': datetime.fromtimestamp(item['expires_at'])
+                    }
+                    for item in issued
+                ]
+            }
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Failed to generate Agora tokens: {str(e)}", exc_info=True)
+        return Response(
+            {'status': 'error', 'message': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 class VideoCallViewSet(viewsets.ModelViewSet):
     queryset = VideoCall.objects.all()
     serializer_class = VideoCallSerializer
@@ -270,14 +320,10 @@ class VideoCallViewSet(viewsets.ModelViewSet):
             if not can_join:
                 raise ValidationError(error_message)
             
-            # Generate Agora token
+            # Reuse the pre-minted token for this participant when there is one
             try:
-                # Generate a unique user ID for this session
-                uid = random.randint(1, 230)
-                token, expiration_time = generate_agora_rtc_token(
-                    video_call.channel_name,
-                    uid
-                )
+                uid = PARTICIPANT_UIDS[role]
+                token, expiration_time = issue_token(video_call.channel_name, uid)
             except Exception as e:
                 logger.error(f"Failed to generate Agora token: {str(e)}")
                 raise ValidationError(f"Failed to generate video call token: {str(e)}")
@@ -293,7 +339,7 @@ class VideoCallViewSet(viewsets.ModelViewSet):
                 'uid': uid,
                 'expiration_time': datetime.fromtimestamp(expiration_time),
                 'call_duration': video_call.get_duration(),
-                'app_id': settings.AGORA_APP_ID
+                'app_id': AgoraService.get_credentials().app_id
             }
             
             return Response(